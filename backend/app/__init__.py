@@ -1,4 +1,5 @@
 import os
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -6,7 +7,7 @@ from flask_jwt_extended import JWTManager
 from flask_socketio import SocketIO
 from flask_mail import Mail
 from flask_bcrypt import Bcrypt
-from .config import Config
+from .config import Config, configure_database, install_database_profile
 
 from flask_marshmallow import Marshmallow
 
@@ -19,12 +20,27 @@ mail = Mail()
 bcrypt = Bcrypt()
 ma = Marshmallow()
 
+def is_cli_command():
+    """
+    Indica se o app está sendo criado por um comando do `flask` (ex.: `flask db upgrade`)
+    e não para servir requisições (gunicorn, `python run.py` ou `flask run`).
+    """
+    ctx = click.get_current_context(silent=True)
+    return ctx is not None and ctx.command.name != 'run'
+
 def create_app(config_class=Config):
-    app = Flask(__name__)
+    # Sem a rota /static padrão: todo o build do frontend passa pelo manifesto (ver static_assets)
+    app = Flask(__name__, static_folder=None)
     app.config.from_object(config_class)
 
+    # Serialização JSON rápida (orjson), com datas em ISO 8601
+    from .json_provider import init_json_provider
+    init_json_provider(app)
+
     # Inicializar extensões com o app
+    configure_database(app)
     db.init_app(app)
+    install_database_profile(app, db)
     migrate.init_app(app, db)
     jwt.init_app(app)
     socketio.init_app(app, cors_allowed_origins="*", manage_session=False)
@@ -40,4 +56,28 @@ def create_app(config_class=Config):
         from .routes import main_bp
         app.register_blueprint(main_bp)
 
+    # Manifesto em memória do build do frontend
+    from .static_assets import init_static_assets
+    init_static_assets(app)
+
+    # Compressão gzip/brotli das respostas dinâmicas
+    from .http_compression import init_response_compression
+    init_response_compression(app)
+
+    # Comando de benchmark do hash de senhas
+    from .services.password_service import init_password_hashing
+    init_password_hashing(app)
+
+    # Aquece o cliente do modelo e inicia os health checks (por worker)
+    from .services.ai_service import init_model_lifecycle
+    init_model_lifecycle(app)
+
+    # Encerra jobs de geração deixados pendentes por workers anteriores
+    from .services.job_service import init_job_queue
+    init_job_queue(app)
+
+    # Compressão e arquivamento do histórico em background
+    from .services.history_service import init_history_maintenance
+    init_history_maintenance(app)
+
     return app
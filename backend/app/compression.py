@@ -0,0 +1,54 @@
+import sqlite3
+import zlib
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# --- Compressão de Textos Grandes ---
+#
+# Textos longos do histórico são gravados comprimidos (zlib) em uma coluna
+# binária. No SQLite a função `zlib_text(blob)` é registrada em cada conexão
+# para que views e triggers (ex.: índice de busca) leiam o texto original.
+# No PostgreSQL a compressão fica a cargo do próprio banco (TOAST), que já
+# comprime valores grandes e mantém o texto indexável pelo to_tsvector.
+
+COMPRESSION_LEVEL = 6
+
+
+def compress_text(text):
+    return zlib.compress(text.encode('utf-8'), COMPRESSION_LEVEL)
+
+
+def decompress_text(blob):
+    if blob is None:
+        return None
+    return zlib.decompress(blob).decode('utf-8')
+
+
+def get_compression_threshold():
+    """Tamanho mínimo (caracteres) para comprimir; 0 quando a compressão não se aplica."""
+    if not has_app_context():
+        return 0
+    from . import db
+    if db.engine.dialect.name != 'sqlite':
+        return 0
+    return max(0, current_app.config.get('HISTORY_COMPRESSION_MIN_SIZE', 0))
+
+
+def should_compress(text):
+    """Indica se o texto deve ser gravado comprimido."""
+    threshold = get_compression_threshold()
+    return text is not None and threshold > 0 and len(text) >= threshold
+
+
+def _sqlite_zlib_text(blob):
+    try:
+        return decompress_text(blob)
+    except (zlib.error, UnicodeDecodeError, TypeError):
+        return None
+
+
+@event.listens_for(Engine, 'connect')
+def register_sqlite_functions(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('zlib_text', 1, _sqlite_zlib_text, deterministic=True)
@@ -0,0 +1,39 @@
+import hashlib
+from flask import current_app, request
+
+# --- GET Condicional (ETag / Last-Modified) ---
+#
+# As rotas calculam uma "versão" barata do recurso (ex.: updated_at) antes de
+# montar a resposta. Se o cliente já tem essa versão, devolvemos 304 sem
+# consultar nem serializar o restante.
+
+
+def make_etag(*parts):
+    """ETag forte derivado das partes que identificam a versão do recurso."""
+    raw = ':'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def is_not_modified(etag, last_modified=None):
+    """Indica se a requisição condicional já corresponde à versão atual."""
+    if request.if_none_match:
+        # If-None-Match tem precedência sobre If-Modified-Since (RFC 9110) e usa
+        # comparação fraca: a ETag vira W/ quando a resposta é comprimida
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def set_validators(response, etag, last_modified=None):
+    """Adiciona ETag/Last-Modified e obriga o cliente a revalidar a cada uso."""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def not_modified_response(etag, last_modified=None):
+    response = current_app.response_class(status=304)
+    return set_validators(response, etag, last_modified)
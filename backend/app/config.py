@@ -1,4 +1,7 @@
 import os
+import sqlite3
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
 # Define o diretório base do projeto (a pasta que contém 'run.py')
 basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -9,9 +12,218 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Perfil do banco (ver configure_database): PRAGMAs aplicados a cada conexão SQLite
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),  # leitores não bloqueiam o escritor
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),  # seguro com WAL, sem fsync por commit
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # ms aguardando o lock de escrita
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024)),  # negativo = KiB (64 MiB)
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON',  # necessário para o ON DELETE CASCADE
+    }
+    # Pool de conexões: acompanhe o número de threads por worker do gunicorn
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # segundos
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # segundos
+
+    # Provedor de IA: 'gemini' (produção) ou 'stub' (local, para testes de carga)
+    AI_PROVIDER = os.environ.get('AI_PROVIDER', 'gemini')
+    AI_MODEL_NAME = os.environ.get('AI_MODEL_NAME', 'gemini-pro')
+    GOOGLE_API_KEY = os.environ.get('GOOGLE_API_KEY')
+    # Ciclo de vida do cliente do modelo (intervalos em segundos)
+    MODEL_WARMUP_ENABLED = os.environ.get('MODEL_WARMUP_ENABLED', 'True').lower() in ['true', '1']
+    MODEL_LIFECYCLE_ENABLED = os.environ.get('MODEL_LIFECYCLE_ENABLED', 'True').lower() in ['true', '1']
+    MODEL_HEALTH_CHECK_INTERVAL = int(os.environ.get('MODEL_HEALTH_CHECK_INTERVAL', 300))
+    MODEL_REFRESH_INTERVAL = int(os.environ.get('MODEL_REFRESH_INTERVAL', 7200))
+    # Perfil de latência do provedor stub (tempos em segundos)
+    STUB_TIME_TO_FIRST_TOKEN = float(os.environ.get('STUB_TIME_TO_FIRST_TOKEN', 0.5))
+    STUB_INTER_CHUNK_DELAY = float(os.environ.get('STUB_INTER_CHUNK_DELAY', 0.05))
+    STUB_CHUNK_SIZE = int(os.environ.get('STUB_CHUNK_SIZE', 32))
+    STUB_RESPONSE_LENGTH = int(os.environ.get('STUB_RESPONSE_LENGTH', 2000))
+    STUB_ERROR_RATE = float(os.environ.get('STUB_ERROR_RATE', 0.0))
+    STUB_SEED = int(os.environ.get('STUB_SEED', 0))
+
+    # Tamanho da prévia de textos longos nas listagens (histórico e conteúdos)
+    PREVIEW_LENGTH = int(os.environ.get('PREVIEW_LENGTH', 200))
+
+    # Paginação do histórico (keyset)
+    HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', 20))
+    HISTORY_MAX_PAGE_SIZE = int(os.environ.get('HISTORY_MAX_PAGE_SIZE', 100))
+
+    # Histórico: textos a partir deste tamanho são gravados comprimidos (0 desativa; só SQLite)
+    HISTORY_COMPRESSION_MIN_SIZE = int(os.environ.get('HISTORY_COMPRESSION_MIN_SIZE', 1024))
+    # Entradas mais antigas que N dias vão para generation_history_archive (0, o padrão, desativa).
+    # Atenção: entradas arquivadas saem de GET /api/history e da busca
+    HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS', 0))
+    HISTORY_MAINTENANCE_ENABLED = os.environ.get('HISTORY_MAINTENANCE_ENABLED', 'True').lower() in ['true', '1']
+    HISTORY_MAINTENANCE_INTERVAL = int(os.environ.get('HISTORY_MAINTENANCE_INTERVAL', 3600))  # segundos
+    HISTORY_MAINTENANCE_BATCH_SIZE = int(os.environ.get('HISTORY_MAINTENANCE_BATCH_SIZE', 500))
+
+    # Build do frontend servido pela rota catch-all (indexado ao iniciar; ver app/static_assets.py)
+    FRONTEND_BUILD_DIR = os.environ.get('FRONTEND_BUILD_DIR') or \
+        os.path.join(basedir, 'frontend', 'react-app', 'build')
+    # Nomes com hash de conteúdo (main.3f2a9c1b.js, index-B7x9kQ2a.js) recebem cache imutável
+    FRONTEND_HASHED_ASSET_PATTERN = r'[.-](?=[A-Za-z_-]*\d)[A-Za-z0-9_-]{8,}(\.chunk)?\.\w+$'
+
+    # Compressão de respostas (gzip/brotli negociado pelo Accept-Encoding)
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'True').lower() in ['true', '1']
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # bytes
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))  # 11 só no build
+
+    # Hash de senhas: formato do werkzeug ("scrypt:N:r:p", "pbkdf2:sha256:iterações") ou "bcrypt:rounds".
+    # Hashes com outros parâmetros são refeitos no próximo login. Meça com `flask password-benchmark`.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+    # Cache do principal autenticado (por worker)
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 60))  # segundos
+    PRINCIPAL_CACHE_MAX_ENTRIES = int(os.environ.get('PRINCIPAL_CACHE_MAX_ENTRIES', 1024))
+
+    # Listagem de usuários do painel administrativo
+    ADMIN_USERS_PAGE_SIZE = int(os.environ.get('ADMIN_USERS_PAGE_SIZE', 25))
+    ADMIN_USERS_MAX_PAGE_SIZE = int(os.environ.get('ADMIN_USERS_MAX_PAGE_SIZE', 100))
+
+    # Exportação/importação NDJSON de coleções
+    COLLECTION_EXPORT_BATCH_SIZE = int(os.environ.get('COLLECTION_EXPORT_BATCH_SIZE', 500))
+    COLLECTION_IMPORT_BATCH_SIZE = int(os.environ.get('COLLECTION_IMPORT_BATCH_SIZE', 1000))
+    COLLECTION_IMPORT_MAX_ERRORS = int(os.environ.get('COLLECTION_IMPORT_MAX_ERRORS', 100))  # erros listados na resposta
+
+    # Busca textual (/api/search)
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 20))
+    SEARCH_MAX_PAGE_SIZE = int(os.environ.get('SEARCH_MAX_PAGE_SIZE', 50))
+
+    # Cache de respostas do modelo (memória + SQLite compartilhado entre workers)
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'True').lower() in ['true', '1']
+    RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH') or \
+        os.path.join(basedir, 'response_cache.db')
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 86400))  # segundos
+    RESPONSE_CACHE_MEMORY_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MEMORY_MAX_ENTRIES', 256))
+    RESPONSE_CACHE_DISK_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_DISK_MAX_ENTRIES', 10000))
+    # Orçamento em bytes (texto em UTF-8) de cada camada: gerações grandes não crescem o cache sem limite
+    RESPONSE_CACHE_MEMORY_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MEMORY_MAX_BYTES', 32 * 1024 * 1024))
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    RESPONSE_CACHE_REPLAY_CHUNK_SIZE = int(os.environ.get('RESPONSE_CACHE_REPLAY_CHUNK_SIZE', 256))
+    # Agrupamento de trechos do streaming: envia ao atingir N caracteres ou após X segundos
+    STREAM_FLUSH_CHARS = int(os.environ.get('STREAM_FLUSH_CHARS', 256))
+    STREAM_FLUSH_INTERVAL = float(os.environ.get('STREAM_FLUSH_INTERVAL', 0.05))
+    # Geração em lote
+    BATCH_MAX_PROMPTS = int(os.environ.get('BATCH_MAX_PROMPTS', 50))
+    BATCH_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', 4))
+    # Limitação de taxa da geração: token bucket (req/s + rajada) e streams simultâneos por papel
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True').lower() in ['true', '1']
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'sqlite')  # 'memory' ou 'sqlite'
+    RATE_LIMIT_SQLITE_PATH = os.environ.get('RATE_LIMIT_SQLITE_PATH') or \
+        os.path.join(basedir, 'rate_limit.db')
+    RATE_LIMIT_LEASE_TTL = int(os.environ.get('RATE_LIMIT_LEASE_TTL', 300))  # expira vagas de workers mortos
+    RATE_LIMITS = {
+        'user': {
+            'rate': float(os.environ.get('RATE_LIMIT_USER_RATE', 1.0)),
+            'burst': int(os.environ.get('RATE_LIMIT_USER_BURST', 5)),
+            'max_concurrent': int(os.environ.get('RATE_LIMIT_USER_MAX_CONCURRENT', 2)),
+        },
+        'admin': {
+            'rate': float(os.environ.get('RATE_LIMIT_ADMIN_RATE', 5.0)),
+            'burst': int(os.environ.get('RATE_LIMIT_ADMIN_BURST', 20)),
+            'max_concurrent': int(os.environ.get('RATE_LIMIT_ADMIN_MAX_CONCURRENT', 8)),
+        },
+    }
+    RATE_LIMIT_USER_OVERRIDES = {}  # {user_id: {'rate': ..., 'burst': ..., 'max_concurrent': ...}}
+    # Tempo máximo que uma requisição duplicada aguarda o stream em andamento
+    SINGLEFLIGHT_WAIT_TIMEOUT = int(os.environ.get('SINGLEFLIGHT_WAIT_TIMEOUT', 120))
+
+    # Fila de jobs de geração assíncrona
+    GENERATION_JOB_WORKERS = int(os.environ.get('GENERATION_JOB_WORKERS', 4))
+    GENERATION_JOB_QUEUE_SIZE = int(os.environ.get('GENERATION_JOB_QUEUE_SIZE', 32))
+    # Jobs 'pending'/'running' há mais tempo que isso (segundos) são considerados órfãos
+    GENERATION_JOB_STALE_AFTER = int(os.environ.get('GENERATION_JOB_STALE_AFTER', 900))
+    # Jobs terminados são removidos após N segundos (o texto continua no histórico)
+    GENERATION_JOB_RETENTION = int(os.environ.get('GENERATION_JOB_RETENTION', 86400))
     # Adicione outras configurações gerais aqui
 
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'  # Banco de dados em memória
     WTF_CSRF_ENABLED = False  # Desabilita CSRF para testes
+    RESPONSE_CACHE_PATH = None  # Apenas a camada em memória durante os testes
+    AI_PROVIDER = 'stub'  # Nunca chama a API real nos testes
+    AI_MODEL_NAME = 'stub'
+    STUB_TIME_TO_FIRST_TOKEN = 0
+    STUB_INTER_CHUNK_DELAY = 0
+    STUB_RESPONSE_LENGTH = 200
+    MODEL_WARMUP_ENABLED = False
+    MODEL_LIFECYCLE_ENABLED = False
+    RATE_LIMIT_BACKEND = 'memory'
+    HISTORY_MAINTENANCE_ENABLED = False
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'  # Barato: os testes não medem custo de hash
+
+
+# --- Perfil do Banco de Dados ---
+
+def _is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+def _is_sqlite_memory(uri):
+    url = make_url(uri)
+    return url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+
+def build_engine_options(config):
+    """Opções do create_engine para o banco configurado (sobrescritas por SQLALCHEMY_ENGINE_OPTIONS)."""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if _is_sqlite(uri):
+        if _is_sqlite_memory(uri):
+            # Banco em memória: mantém o pool padrão do SQLAlchemy (uma conexão por thread)
+            return {}
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'connect_args': {
+                'timeout': config['SQLITE_PRAGMAS']['busy_timeout'] / 1000,
+                'check_same_thread': False,
+            },
+        }
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def configure_database(app):
+    """Define as opções do engine. Chamado por create_app() antes de db.init_app()."""
+    options = build_engine_options(app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+def install_database_profile(app, db):
+    """Registra os PRAGMAs do SQLite no engine do app e registra as configurações efetivas no log."""
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == 'sqlite':
+            pragmas = dict(app.config['SQLITE_PRAGMAS'])
+
+            @event.listens_for(engine, 'connect')
+            def _set_sqlite_pragmas(dbapi_connection, connection_record):
+                if isinstance(dbapi_connection, sqlite3.Connection):
+                    apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+            with engine.connect() as conn:
+                effective = {
+                    name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in pragmas
+                }
+            app.logger.info(f"Banco SQLite ({engine.url.database}); PRAGMAs efetivos: {effective}")
+        else:
+            options = {k: v for k, v in app.config['SQLALCHEMY_ENGINE_OPTIONS'].items() if k != 'connect_args'}
+            app.logger.info(f"Banco {engine.dialect.name}; pool {type(engine.pool).__name__} com opções {options}")
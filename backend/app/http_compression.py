@@ -0,0 +1,155 @@
+import gzip
+import os
+import zlib
+import click
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # Opcional: sem o pacote, apenas gzip é oferecido
+    brotli = None
+
+# --- Compressão de Respostas (gzip / brotli) ---
+#
+# Respostas dinâmicas textuais acima de COMPRESSION_MIN_SIZE são comprimidas
+# conforme o Accept-Encoding do cliente. Arrays JSON em streaming (ver
+# app/json_provider.py) são comprimidos incrementalmente; NDJSON e SSE ficam
+# de fora (cada linha/evento precisa chegar sem esperar o buffer do
+# compressor), assim como arquivos enviados com send_file. Os arquivos do
+# frontend são comprimidos uma única vez, no build (`flask precompress-assets`),
+# e o manifesto de app/static_assets.py escolhe o irmão `.br`/`.gz` em vez de
+# comprimir por requisição.
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'application/xml',
+    'application/manifest+json', 'image/svg+xml',
+}
+COMPRESSIBLE_EXTENSIONS = {'.html', '.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.xml', '.ico', '.wasm'}
+# Respostas em streaming comprimidas incrementalmente
+STREAM_COMPRESSIBLE_MIMETYPES = {'application/json'}
+# Extensão do arquivo pré-comprimido para cada codificação, em ordem de preferência
+ENCODING_EXTENSIONS = {'br': '.br', 'gzip': '.gz'}
+
+
+def available_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate_encoding(encodings=None):
+    """Melhor codificação aceita pelo cliente entre as oferecidas (ou None)."""
+    encodings = encodings or available_encodings()
+    return request.accept_encodings.best_match(encodings)
+
+
+def _is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES)
+
+
+def compress_bytes(data, encoding, level=None):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if level is None else level)
+    return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+
+
+def _compress_stream(chunks, encoding, level):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        process, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = formato gzip
+        process, finish = compressor.compress, compressor.flush
+    try:
+        for chunk in chunks:
+            data = process(chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_response(response):
+    """after_request: comprime a resposta se o cliente aceitar e valer a pena."""
+    config = current_app.config
+    if not config.get('COMPRESSION_ENABLED', True):
+        return response
+    if response.status_code != 200 or response.direct_passthrough:
+        return response
+    if 'Content-Encoding' in response.headers or not _is_compressible(response.mimetype):
+        return response
+    if 'no-transform' in response.headers.get('Cache-Control', ''):
+        return response
+    streamed = response.is_streamed
+    if streamed and response.mimetype not in STREAM_COMPRESSIBLE_MIMETYPES:
+        return response
+
+    # A representação depende do Accept-Encoding, mesmo quando não comprimimos
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+    if not streamed and (response.content_length is None
+                         or response.content_length < config.get('COMPRESSION_MIN_SIZE', 1024)):
+        return response
+
+    level = config.get('COMPRESSION_BROTLI_QUALITY', 4) if encoding == 'br' \
+        else config.get('COMPRESSION_GZIP_LEVEL', 6)
+    if streamed:
+        # Tamanho final desconhecido: comprime à medida que os trechos são gerados
+        response.response = _compress_stream(response.response, encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(compress_bytes(response.get_data(), encoding, level))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # Os bytes mudaram: a ETag continua válida apenas na comparação fraca
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def precompress_directory(directory, min_size=0):
+    """Gera `.gz` (e `.br`, se disponível) ao lado dos arquivos textuais. Retorna quantos foram escritos."""
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            source = os.path.join(root, name)
+            stat = os.stat(source)
+            if stat.st_size < min_size:
+                continue
+            data = None
+            for encoding in available_encodings():
+                target = source + ENCODING_EXTENSIONS[encoding]
+                if os.path.exists(target) and os.stat(target).st_mtime >= stat.st_mtime:
+                    continue
+                if data is None:
+                    with open(source, 'rb') as f:
+                        data = f.read()
+                compressed = compress_bytes(data, encoding)
+                if len(compressed) >= len(data):
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(compressed)
+                written += 1
+    return written
+
+
+@click.command('precompress-assets')
+@click.argument('directory', required=False)
+def precompress_assets(directory):
+    """Pré-comprime os arquivos do build do frontend (executar após o build)."""
+    directory = directory or current_app.static_folder
+    if not directory or not os.path.isdir(directory):
+        raise click.ClickException(f"Diretório não encontrado: {directory}")
+    written = precompress_directory(directory, current_app.config.get('COMPRESSION_MIN_SIZE', 1024))
+    encodings = ', '.join(available_encodings())
+    click.echo(f"{written} arquivos pré-comprimidos ({encodings}) em {directory}.")
+
+
+def init_response_compression(app):
+    """Registra a compressão de respostas e o comando de build. Chamado por create_app()."""
+    app.after_request(compress_response)
+    app.cli.add_command(precompress_assets)
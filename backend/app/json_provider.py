@@ -0,0 +1,133 @@
+import json
+import time
+import tracemalloc
+from datetime import date, datetime
+import click
+from flask import current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Opcional: sem o pacote, usa o encoder da biblioteca padrão
+    orjson = None
+
+# --- Serialização JSON ---
+#
+# Provider do Flask baseado no orjson: serializa datetime/date/UUID/Decimal
+# nativamente (datetime sai em ISO 8601, como o antigo .isoformat() das rotas),
+# gera UTF-8 sem escapes e não ordena as chaves. Sem o orjson instalado, cai
+# para o json da biblioteca padrão com o mesmo formato de datas.
+#
+# streamed_json() monta respostas grandes linha a linha, à medida que saem
+# do cursor do banco, em vez de materializar a lista inteira para o jsonify.
+
+STREAM_CHUNK_SIZE = 64 * 1024  # bytes acumulados antes de cada escrita
+STREAM_BATCH_SIZE = 500  # linhas buscadas por vez no cursor do banco (yield_per)
+
+
+def _default(o):
+    if isinstance(o, (date, datetime)):
+        return o.isoformat()
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    return DefaultJSONProvider.default(o)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Provider JSON da aplicação (orjson quando disponível)."""
+
+    sort_keys = False
+    ensure_ascii = False
+    default = staticmethod(_default)
+
+    def dumps_bytes(self, obj):
+        if orjson is not None:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return self.dumps_bytes(obj).decode('utf-8')
+        kwargs.setdefault('default', _default)
+        kwargs.setdefault('ensure_ascii', False)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def _iter_json_chunks(dumps_bytes, rows, serialize, key, head, tail):
+    buffer = bytearray()
+    if key is None:
+        buffer += b'['
+    else:
+        buffer += dumps_bytes(head or {})[:-1]  # abre o objeto sem o '}' final
+        buffer += (b',' if head else b'') + dumps_bytes(key) + b':['
+    first = True
+    for row in rows:
+        if not first:
+            buffer += b','
+        buffer += dumps_bytes(serialize(row) if serialize else row)
+        first = False
+        if len(buffer) >= STREAM_CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += b']'
+    if key is not None:
+        trailer = tail() if tail else {}
+        if trailer:
+            buffer += b',' + dumps_bytes(trailer)[1:-1]
+        buffer += b'}'
+    yield bytes(buffer)
+
+
+def streamed_json(rows, serialize=None, key=None, head=None, tail=None, status=200):
+    """
+    Resposta JSON escrita incrementalmente enquanto `rows` é consumido.
+    Sem `key`, o corpo é um array; com `key`, um objeto {**head, key: [...], **tail()},
+    onde `tail` é chamado depois do último item (ex.: cursor da próxima página).
+    Erros durante o stream não mudam o status, que já foi enviado.
+    """
+    dumps_bytes = current_app.json.dumps_bytes
+    body = _iter_json_chunks(dumps_bytes, rows, serialize, key, head, tail)
+    return current_app.response_class(stream_with_context(body), status=status, mimetype='application/json')
+
+
+@click.command('json-benchmark')
+@click.option('--rows', default=50000, show_default=True, help='Quantidade de linhas sintéticas.')
+def json_benchmark(rows):
+    """Compara CPU e pico de memória: json padrão vs provider, e lista inteira vs stream."""
+    now = datetime.utcnow()
+    data = [{'id': i, 'prompt': f'prompt {i}', 'preview': 'texto ' * 30, 'timestamp': now} for i in range(rows)]
+    provider = current_app.json
+
+    def measure(label, fn):
+        start = time.perf_counter()
+        size = fn()
+        elapsed = time.perf_counter() - start
+        # Pico medido em uma segunda execução: o tracemalloc distorce o tempo
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        click.echo(f"{label:<34} {elapsed * 1000:>9.1f} ms {peak / 1024 / 1024:>9.1f} MiB {size / 1024 / 1024:>8.1f} MiB")
+
+    click.echo(f"{'serialização':<34} {'CPU':>12} {'pico':>13} {'corpo':>12}")
+    measure('json (stdlib, lista inteira)',
+            lambda: len(json.dumps({'items': data}, default=_default).encode('utf-8')))
+    measure('provider (lista inteira)', lambda: len(provider.dumps_bytes({'items': data})))
+    measure('provider (stream)', lambda: sum(
+        len(chunk) for chunk in _iter_json_chunks(provider.dumps_bytes, iter(data), None, 'items', None, None)
+    ))
+
+
+def init_json_provider(app):
+    """Instala o provider JSON e o comando de benchmark. Chamado por create_app()."""
+    app.json = JSONProvider(app)
+    app.cli.add_command(json_benchmark)
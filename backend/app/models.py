@@ -1,6 +1,14 @@
 from . import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import current_app, has_app_context
+from sqlalchemy.ext.hybrid import hybrid_property
+from .compression import compress_text, decompress_text, should_compress
+from .services.password_service import hash_password, verify_password
+
+
+def _preview_of(text):
+    length = current_app.config.get('PREVIEW_LENGTH', 200) if has_app_context() else 200
+    return text[:length] if text is not None else None
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -9,56 +17,152 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Incrementada a cada mudança de papel; tokens com versão anterior são recusados
+    role_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # ordenação padrão de /api/admin/users
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
     def __repr__(self):
         return f'<User {self.username}>'
 
 class Collection(db.Model):
+    __table_args__ = (
+        # Listagem das coleções do usuário ordenadas por data
+        db.Index('ix_collection_user_id_created_at', 'user_id', 'created_at'),
+        # Versão da listagem (COUNT + MAX(updated_at)) para o ETag
+        db.Index('ix_collection_user_id_updated_at', 'user_id', 'updated_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Atualizado também quando os conteúdos mudam (ver Collection.touch)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    user = db.relationship('User', backref=db.backref('collections', lazy=True))
+    user = db.relationship('User', backref=db.backref('collections', lazy=True, cascade='all, delete-orphan', passive_deletes=True))
+
+    @classmethod
+    def touch(cls, collection_id):
+        """Marca a coleção como alterada (muda o ETag da coleção e da listagem)."""
+        db.session.execute(
+            db.update(cls).where(cls.id == collection_id).values(updated_at=datetime.utcnow())
+        )
 
     def __repr__(self):
         return f'<Collection {self.name}>'
 
 class Content(db.Model):
+    __table_args__ = (
+        # Conteúdos de uma coleção ordenados por data
+        db.Index('ix_content_collection_id_created_at', 'collection_id', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    body = db.Column(db.Text, nullable=False)
-    collection_id = db.Column(db.Integer, db.ForeignKey('collection.id'), nullable=False)
+    # Carregado sob demanda: listagens usam apenas a prévia calculada no banco
+    body = db.deferred(db.Column(db.Text, nullable=False))
+    collection_id = db.Column(db.Integer, db.ForeignKey('collection.id', ondelete='CASCADE'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    collection = db.relationship('Collection', backref=db.backref('contents', lazy=True))
+    # Remoção em cascata feita pelo banco (ON DELETE CASCADE): os conteúdos não são carregados
+    collection = db.relationship('Collection', backref=db.backref('contents', lazy=True, cascade='all, delete-orphan', passive_deletes=True))
 
     def __repr__(self):
         return f'<Content {self.title}>'
 
 class GenerationHistory(db.Model):
+    __table_args__ = (
+        # Histórico do usuário com paginação keyset em (timestamp, id)
+        db.Index('ix_generation_history_user_id_timestamp_id', 'user_id', 'timestamp', 'id'),
+        # Seleção das entradas antigas pela política de retenção
+        db.Index('ix_generation_history_timestamp', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     prompt = db.Column(db.Text, nullable=False)
-    generated_content = db.Column(db.Text, nullable=False)
+    # Carregados sob demanda (grupo 'content'); use sempre a propriedade `generated_content`.
+    # Textos curtos ficam em texto puro; os longos, comprimidos em `generated_content_z`.
+    generated_content_raw = db.deferred(db.Column('generated_content', db.Text, nullable=True), group='content')
+    generated_content_z = db.deferred(db.Column(db.LargeBinary, nullable=True), group='content')
+    # Prévia gravada junto com o texto: as listagens não tocam nas colunas grandes
+    preview = db.Column(db.Text, nullable=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
-    user = db.relationship('User', backref=db.backref('history', lazy=True))
+    user = db.relationship('User', backref=db.backref('history', lazy=True, cascade='all, delete-orphan', passive_deletes=True))
+
+    @hybrid_property
+    def generated_content(self):
+        if self.generated_content_z is not None:
+            return decompress_text(self.generated_content_z)
+        return self.generated_content_raw
+
+    @generated_content.setter
+    def generated_content(self, text):
+        self.preview = _preview_of(text)
+        if should_compress(text):
+            self.generated_content_z = compress_text(text)
+            self.generated_content_raw = None
+        else:
+            self.generated_content_raw = text
+            self.generated_content_z = None
+
+    @generated_content.expression
+    def generated_content(cls):
+        # Em SQL só o texto não comprimido é acessível
+        return cls.generated_content_raw
 
     def __repr__(self):
         return f'<GenerationHistory {self.id}>'
 
+class GenerationHistoryArchive(db.Model):
+    """Entradas de histórico movidas pela política de retenção (sempre comprimidas)."""
+    __tablename__ = 'generation_history_archive'
+
+    id = db.Column(db.Integer, primary_key=True)  # Mesmo id da entrada original
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    prompt = db.Column(db.Text, nullable=False)
+    generated_content_z = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    preview = db.Column(db.Text, nullable=True)
+    timestamp = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def generated_content(self):
+        return decompress_text(self.generated_content_z)
+
+    def __repr__(self):
+        return f'<GenerationHistoryArchive {self.id}>'
+
+class GenerationJob(db.Model):
+    id = db.Column(db.String(36), primary_key=True)  # UUID gerado na criação do job
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    prompt = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    error = db.Column(db.Text, nullable=True)
+    # O texto gerado fica só no histórico (comprimido/arquivado pela manutenção)
+    history_id = db.Column(db.Integer, db.ForeignKey('generation_history.id', ondelete='SET NULL'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    user = db.relationship('User', backref=db.backref('generation_jobs', lazy=True, cascade='all, delete-orphan', passive_deletes=True))
+    history = db.relationship('GenerationHistory')
+
+    def __repr__(self):
+        return f'<GenerationJob {self.id} {self.status}>'
+
 class PasswordResetToken(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     token = db.Column(db.String(120), unique=True, nullable=False)
-    expires_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
 
-    user = db.relationship('User', backref=db.backref('reset_tokens', lazy=True))
+    user = db.relationship('User', backref=db.backref('reset_tokens', lazy=True, cascade='all, delete-orphan', passive_deletes=True))
@@ -0,0 +1,86 @@
+import base64
+import json
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import and_, or_
+
+# --- Paginação por Cursor (keyset) ---
+#
+# Em vez de OFFSET, cada página continua a partir da última chave vista
+# (timestamp, id). O custo de cada página é constante, independentemente
+# do tamanho do histórico.
+
+
+class InvalidCursorError(ValueError):
+    """Cursor malformado enviado pelo cliente."""
+
+
+def encode_cursor(timestamp, row_id):
+    payload = json.dumps([timestamp.isoformat(), row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursorError("Cursor de paginação inválido.") from e
+
+
+def get_page_size(args, default_key='PAGE_SIZE', max_key='MAX_PAGE_SIZE'):
+    """Lê `limit` da query string, limitado pelo máximo configurado."""
+    config = current_app.config
+    default = config.get(default_key, 20)
+    maximum = config.get(max_key, 100)
+    limit = args.get('limit', default, type=int)
+    return max(1, min(limit, maximum))
+
+
+def _keyset_query(query, timestamp_column, id_column, cursor, limit):
+    if cursor:
+        cursor_timestamp, cursor_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            timestamp_column < cursor_timestamp,
+            and_(timestamp_column == cursor_timestamp, id_column < cursor_id),
+        ))
+    # Busca um item extra para saber se existe próxima página
+    return query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def paginate_keyset(query, timestamp_column, id_column, cursor, limit):
+    """
+    Aplica a paginação keyset em ordem decrescente de (timestamp, id).
+    Retorna (linhas, próximo_cursor).
+    """
+    rows = _keyset_query(query, timestamp_column, id_column, cursor, limit).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
+
+
+def iter_keyset_page(query, timestamp_column, id_column, cursor, limit):
+    """
+    Variante de paginate_keyset que lê as linhas do cursor do banco sob demanda
+    (para respostas em streaming). Retorna (iterador, página), onde
+    página['next_cursor'] é preenchido quando o iterador se esgota.
+    O cursor é validado já na chamada (InvalidCursorError).
+    """
+    ordered = _keyset_query(query, timestamp_column, id_column, cursor, limit)
+    page = {'next_cursor': None}
+
+    def rows():
+        last = None
+        for count, row in enumerate(ordered.yield_per(limit + 1), start=1):
+            if count > limit:
+                page['next_cursor'] = encode_cursor(
+                    getattr(last, timestamp_column.key), getattr(last, id_column.key)
+                )
+                break
+            last = row
+            yield row
+
+    return rows(), page
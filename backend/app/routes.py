@@ -1,42 +1,34 @@
+import io
 import os
-import threading
-import time
-from flask import Blueprint, request, jsonify, current_app
+import json
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from . import db, bcrypt, jwt, mail, socketio
-from .models import User, Collection, Content, GenerationHistory, PasswordResetToken
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from .models import User, Collection, Content, GenerationHistory, GenerationHistoryArchive, GenerationJob, PasswordResetToken
+from flask_jwt_extended import create_access_token, jwt_required, verify_jwt_in_request, get_jwt_identity, current_user
+from flask_jwt_extended.exceptions import UserLookupError
+from sqlalchemy import case, func, and_, or_
 from sqlalchemy.exc import IntegrityError
 from flask_mail import Message
 from datetime import datetime, timedelta
 import secrets
 from pydantic import ValidationError
-from .services.ai_service import get_generative_model, GOOGLE_API_KEY
+from .services.ai_service import is_provider_configured, get_model_client_stats
+from .services.cache_service import get_response_cache
+from .services.generation_service import generate_text, create_chunk_coalescer, get_singleflight_stats, GenerationStream, generate_batch
+from .services.job_service import submit_generation_job, serialize_job, JobQueueFullError
+from .services.rate_limit_service import rate_limited, reserve_concurrency, detach_concurrency_leases, get_rate_limit_stats
+from .services.auth_service import admin_required, invalidate_principal, get_principal_cache_stats
+from .services.password_service import needs_rehash, record_rehash, get_password_hash_stats
+from .services.metrics_service import render_metrics, timed_history_commit
+from .services.search_service import search as search_texts
+from .services.collection_transfer_service import iter_collection_ndjson, import_collection_ndjson
 from . import schemas
-
-from .services.ai_service import clear_generative_model_cache
+from .pagination import get_page_size, iter_keyset_page, InvalidCursorError
+from .json_provider import streamed_json, STREAM_BATCH_SIZE
+from .conditional import make_etag, is_not_modified, not_modified_response, set_validators
 
 main_bp = Blueprint('main', __name__)
 
-def _clean_cache_periodically():
-    """Função que roda em background para limpar o cache."""
-    while True:
-        # Limpa o cache a cada 2 horas (7200 segundos)
-        time.sleep(7200)
-        # O app_context é necessário para acessar o logger e outras configs do Flask
-        # Como não temos o `app` aqui, usamos um truque para pegá-lo do blueprint
-        if main_bp.app_context():
-             with main_bp.app_context():
-                current_app.logger.info("Limpando o cache do modelo de IA...")
-                clear_generative_model_cache()
-
-def init_cache_cleaner(app):
-    """Inicia a thread de limpeza de cache em background."""
-    # Usamos o contexto da aplicação para garantir que tudo esteja carregado
-    with app.app_context():
-        current_app.logger.info("Iniciando a thread de limpeza de cache do modelo de IA.")
-        cache_cleaner_thread = threading.Thread(target=_clean_cache_periodically, daemon=True)
-        cache_cleaner_thread.start()
-
 
 # ... (outros imports)
 
@@ -78,6 +70,11 @@ def login():
     user = User.query.filter_by(email=validated_data.email).first()
 
     if user and user.check_password(validated_data.password):
+        if needs_rehash(user.password_hash):
+            # Migra o hash para o método/custo configurado enquanto temos a senha em claro
+            user.set_password(validated_data.password)
+            db.session.commit()
+            record_rehash()
         access_token = create_access_token(identity=str(user.id))
         return jsonify(access_token=access_token)
 
@@ -90,8 +87,9 @@ def request_password_reset():
     user = User.query.filter_by(email=email).first()
 
     if user:
-        # Remove tokens antigos para este usuário
+        # Remove tokens antigos para este usuário e os expirados de todos os usuários
         PasswordResetToken.query.filter_by(user_id=user.id).delete()
+        PasswordResetToken.query.filter(PasswordResetToken.expires_at < datetime.utcnow()).delete()
 
         # Cria novo token
         token = secrets.token_urlsafe(20)
@@ -140,12 +138,8 @@ def reset_password_with_token(token):
 @main_bp.route('/api/profile')
 @jwt_required()
 def profile():
-    current_user_identity = get_jwt_identity()
-    user_id = int(current_user_identity)
-    user = User.query.get(user_id)
-    if user:
-        return jsonify({"username": user.username, "email": user.email, "is_admin": user.is_admin})
-    return jsonify({"message": "Usuário não encontrado"}), 404
+    # Principal resolvido pelo user_lookup_loader (cache por worker, sem consulta ao banco)
+    return jsonify({"username": current_user.username, "email": current_user.email, "is_admin": current_user.is_admin})
 
 @main_bp.route('/api/profile', methods=['PUT'])
 @jwt_required()
@@ -172,6 +166,7 @@ def update_profile():
     user.username = username
     user.email = email
     db.session.commit()
+    invalidate_principal(user.id)
 
     return jsonify({"username": user.username, "email": user.email, "is_admin": user.is_admin}), 200
 
@@ -182,9 +177,28 @@ def update_profile():
 def get_collections():
     current_user_identity = get_jwt_identity()
     user_id = int(current_user_identity)
-    collections = Collection.query.filter_by(user_id=user_id).order_by(Collection.created_at.desc()).all()
-    collections_data = [{'id': c.id, 'name': c.name} for c in collections]
-    return jsonify(collections_data)
+
+    # Versão da listagem: quantidade + última alteração (coberto por ix_collection_user_id_updated_at)
+    count, last_updated = db.session.query(
+        func.count(Collection.id), func.max(Collection.updated_at)
+    ).filter(Collection.user_id == user_id).one()
+    etag = make_etag('collections', user_id, count, last_updated)
+    if is_not_modified(etag, last_updated):
+        return not_modified_response(etag, last_updated)
+
+    # Contagem de itens por coleção na mesma consulta (subconsulta coberta por índice)
+    item_count = db.session.query(func.count(Content.id)) \
+        .filter(Content.collection_id == Collection.id).scalar_subquery()
+    collections = db.session.query(
+        Collection.id, Collection.name, Collection.updated_at, item_count.label('item_count')
+    ).filter(Collection.user_id == user_id).order_by(Collection.created_at.desc()).all()
+    collections_data = [{
+        'id': c.id,
+        'name': c.name,
+        'item_count': c.item_count,
+        'updated_at': c.updated_at
+    } for c in collections]
+    return set_validators(jsonify(collections_data), etag, last_updated)
 
 @main_bp.route('/api/collections', methods=['POST'])
 @jwt_required()
@@ -210,9 +224,27 @@ def handle_collection_details(collection_id):
     collection = Collection.query.filter_by(id=collection_id, user_id=user_id).first_or_404()
 
     if request.method == 'GET':
-        contents = Content.query.filter_by(collection_id=collection.id).order_by(Content.created_at.desc()).all()
-        contents_data = [{'id': c.id, 'title': c.title, 'body': c.body} for c in contents]
-        return jsonify({'id': collection.id, 'name': collection.name, 'contents': contents_data})
+        # A coleção já foi carregada: se o cliente tem a versão atual, nada mais é lido
+        etag = make_etag('collection', collection.id, collection.updated_at)
+        if is_not_modified(etag, collection.updated_at):
+            return not_modified_response(etag, collection.updated_at)
+
+        # Apenas colunas projetadas + prévia do corpo; o corpo completo fica em /contents/<id>.
+        # A lista não tem limite: os itens são serializados à medida que saem do cursor.
+        preview_length = current_app.config.get('PREVIEW_LENGTH', 200)
+        contents = db.session.query(
+            Content.id,
+            Content.title,
+            func.substr(Content.body, 1, preview_length).label('preview')
+        ).filter(Content.collection_id == collection.id).order_by(Content.created_at.desc()) \
+            .yield_per(STREAM_BATCH_SIZE)
+        response = streamed_json(
+            contents,
+            lambda c: {'id': c.id, 'title': c.title, 'preview': c.preview},
+            key='contents',
+            head={'id': collection.id, 'name': collection.name, 'updated_at': collection.updated_at},
+        )
+        return set_validators(response, etag, collection.updated_at)
 
     elif request.method == 'PUT':
         data = request.get_json()
@@ -245,12 +277,37 @@ def add_content_to_collection(collection_id):
 
     new_content = Content(title=title, body=body, collection_id=collection.id)
     db.session.add(new_content)
+    Collection.touch(collection.id)
     db.session.commit()
 
     return jsonify({'id': new_content.id, 'title': new_content.title}), 201
 
+@main_bp.route('/api/collections/<int:collection_id>/export', methods=['GET'])
+@jwt_required()
+def export_collection(collection_id):
+    user_id = int(get_jwt_identity())
+    collection = Collection.query.filter_by(id=collection_id, user_id=user_id).first_or_404()
+
+    response = Response(
+        stream_with_context(iter_collection_ndjson(collection.id)),
+        mimetype='application/x-ndjson'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="collection-{collection.id}.ndjson"'
+    return response
+
+@main_bp.route('/api/collections/<int:collection_id>/import', methods=['POST'])
+@jwt_required()
+def import_collection(collection_id):
+    user_id = int(get_jwt_identity())
+    collection = Collection.query.filter_by(id=collection_id, user_id=user_id).first_or_404()
+
+    # Lê o corpo linha a linha, sem carregá-lo inteiro na memória. O stream do
+    # WSGI não tem buffer (readline lê byte a byte), daí o BufferedReader.
+    lines = io.BufferedReader(request.stream, buffer_size=64 * 1024)
+    result = import_collection_ndjson(collection.id, lines)
+    return jsonify(result), 200
 
-@main_bp.route('/api/collections/<int:collection_id>/contents/<int:content_id>', methods=['PUT', 'DELETE'])
+@main_bp.route('/api/collections/<int:collection_id>/contents/<int:content_id>', methods=['GET', 'PUT', 'DELETE'])
 @jwt_required()
 def handle_collection_content(collection_id, content_id):
     user_id = int(get_jwt_identity())
@@ -259,9 +316,21 @@ def handle_collection_content(collection_id, content_id):
     collection = Collection.query.filter_by(id=collection_id, user_id=user_id).first_or_404()
     
     # Verifica se o conteúdo existe e está na coleção correta
-    content = Content.query.filter_by(id=content_id, collection_id=collection.id).first_or_404()
+    content_query = Content.query.filter_by(id=content_id, collection_id=collection.id)
+    if request.method == 'GET':
+        content_query = content_query.options(db.undefer(Content.body))
+    content = content_query.first_or_404()
+
+    if request.method == 'GET':
+        return jsonify({
+            "id": content.id,
+            "title": content.title,
+            "body": content.body,
+            "created_at": content.created_at,
+            "updated_at": content.updated_at
+        })
 
-    if request.method == 'PUT':
+    elif request.method == 'PUT':
         data = request.get_json()
         title = data.get('title')
         body = data.get('body')
@@ -271,11 +340,13 @@ def handle_collection_content(collection_id, content_id):
 
         content.title = title
         content.body = body
+        Collection.touch(collection.id)
         db.session.commit()
         return jsonify({"id": content.id, "title": content.title, "body": content.body}), 200
 
     elif request.method == 'DELETE':
         db.session.delete(content)
+        Collection.touch(collection.id)
         db.session.commit()
         return jsonify({"message": "Conteúdo deletado com sucesso"}), 200
 
@@ -285,24 +356,94 @@ def handle_collection_content(collection_id, content_id):
 def get_history():
     current_user_identity = get_jwt_identity()
     user_id = int(current_user_identity)
-    history_entries = GenerationHistory.query.filter_by(user_id=user_id).order_by(GenerationHistory.timestamp.desc()).all()
-    history_data = [
+    limit = get_page_size(request.args, 'HISTORY_PAGE_SIZE', 'HISTORY_MAX_PAGE_SIZE')
+
+    # Apenas colunas projetadas + prévia gravada; o texto completo fica em /api/history/<id>
+    preview_length = current_app.config.get('PREVIEW_LENGTH', 200)
+    query = db.session.query(
+        GenerationHistory.id,
+        GenerationHistory.prompt,
+        GenerationHistory.timestamp,
+        func.substr(GenerationHistory.preview, 1, preview_length).label('preview')
+    ).filter(GenerationHistory.user_id == user_id)
+
+    try:
+        history_entries, page = iter_keyset_page(
+            query,
+            GenerationHistory.timestamp,
+            GenerationHistory.id,
+            request.args.get('cursor'),
+            limit
+        )
+    except InvalidCursorError as e:
+        return jsonify({"message": str(e)}), 400
+
+    return streamed_json(
+        history_entries,
+        lambda h: {'id': h.id, 'prompt': h.prompt, 'preview': h.preview, 'timestamp': h.timestamp},
+        key='items',
+        tail=lambda: page,
+    )
+
+@main_bp.route('/api/history/<int:history_id>', methods=['GET'])
+@jwt_required()
+def get_history_entry(history_id):
+    user_id = int(get_jwt_identity())
+    entry = GenerationHistory.query.options(db.undefer_group('content')) \
+        .filter_by(id=history_id, user_id=user_id).first()
+    if entry is None:
+        # Entradas antigas podem ter sido movidas pela política de retenção
+        entry = GenerationHistoryArchive.query.options(db.undefer(GenerationHistoryArchive.generated_content_z)) \
+            .filter_by(id=history_id, user_id=user_id).first_or_404()
+    return jsonify({
+        'id': entry.id,
+        'prompt': entry.prompt,
+        'generated_content': entry.generated_content,
+        'timestamp': entry.timestamp
+    })
+
+
+# --- Rota de Busca ---
+
+SEARCH_TYPES = {'history': ('history',), 'content': ('content',), 'all': ('history', 'content')}
+
+@main_bp.route('/api/search', methods=['GET'])
+@jwt_required()
+def search():
+    user_id = int(get_jwt_identity())
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"message": "Parâmetro 'q' é obrigatório."}), 400
+
+    kinds = SEARCH_TYPES.get(request.args.get('type', 'all'))
+    if kinds is None:
+        return jsonify({"message": "Tipo inválido. Use history, content ou all."}), 400
+
+    page = max(1, request.args.get('page', 1, type=int))
+    limit = get_page_size(request.args, 'SEARCH_PAGE_SIZE', 'SEARCH_MAX_PAGE_SIZE')
+    results, has_next = search_texts(user_id, query, kinds=kinds, page=page, per_page=limit)
+
+    items = [
         {
-            'id': h.id, 
-            'prompt': h.prompt, 
-            'generated_content': h.generated_content, 
-            'timestamp': h.timestamp.isoformat()
-        } for h in history_entries
+            'type': r['type'],
+            'id': r['id'],
+            'title': r['title'],
+            'collection_id': r['collection_id'],
+            'snippet': r['snippet'],
+            'score': r['score'],
+            'created_at': r['created_at'],
+        } for r in results
     ]
-    return jsonify(history_data)
+    return jsonify({'items': items, 'page': page, 'next_page': page + 1 if has_next else None})
 
 
 # --- Rotas de Geração de Conteúdo ---
 
 @main_bp.route('/api/generate', methods=['POST'])
 @jwt_required()
+@rate_limited('generate')
 def generate_content():
-    if not GOOGLE_API_KEY:
+    if not is_provider_configured():
         return jsonify({"error": "API Key do Google não configurada no servidor."}), 500
 
     data = request.get_json()
@@ -312,18 +453,18 @@ def generate_content():
 
     current_user_identity = get_jwt_identity()
     user_id = int(current_user_identity)
-    client_sid = request.sid # Captura o SID do cliente para respostas diretas
+    # Captura o SID do cliente para respostas diretas (contexto Socket.IO ou enviado no corpo)
+    client_sid = getattr(request, 'sid', None) or data.get('sid')
+    bypass_cache = bool(data.get('bypass_cache'))
+
+    def emit_frame(text):
+        socketio.emit('generated_content_chunk', {'chunk': text}, room=client_sid)
+        socketio.sleep(0) # Força o envio imediato
 
     try:
-        model = get_generative_model()
-        full_generated_text = ""
-        
-        # Geração de conteúdo em streaming
-        for chunk in model.generate_content(prompt, stream=True):
-            if chunk.text:
-                full_generated_text += chunk.text
-                socketio.emit('generated_content_chunk', {'chunk': chunk.text}, room=client_sid)
-                socketio.sleep(0) # Força o envio imediato
+        coalescer = create_chunk_coalescer(emit_frame)
+        full_generated_text, _ = generate_text(prompt, on_chunk=coalescer.add, bypass_cache=bypass_cache)
+        stream_stats = coalescer.close()
 
         # Salva no histórico após a geração completa
         history_entry = GenerationHistory(
@@ -332,11 +473,12 @@ def generate_content():
             generated_content=full_generated_text
         )
         db.session.add(history_entry)
-        db.session.commit()
+        with timed_history_commit('generate'):
+            db.session.commit()
 
         socketio.emit('generated_content_complete', {'full_content': full_generated_text}, room=client_sid)
         # A resposta HTTP pode ser simples, já que o conteúdo foi enviado via WebSocket
-        return jsonify({"message": "Geração de conteúdo concluída e enviada via WebSocket."}), 200
+        return jsonify({"message": "Geração de conteúdo concluída e enviada via WebSocket.", "stream": stream_stats}), 200
 
     except Exception as e:
         current_app.logger.error(f"Erro na geração de conteúdo: {e}")
@@ -346,19 +488,189 @@ def generate_content():
         return jsonify({"error": "Falha ao gerar conteúdo.", "details": error_message}), 500
 
 
+def _sse_event(event, payload):
+    """Formata um evento Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+@main_bp.route('/api/generate/stream', methods=['POST'])
+@jwt_required()
+@rate_limited('generate')
+def generate_content_stream():
+    """
+    Geração em streaming via HTTP (text/event-stream), sem depender do Socket.IO.
+    Emite eventos 'chunk', 'complete' e 'error'.
+    """
+    if not is_provider_configured():
+        return jsonify({"error": "API Key do Google não configurada no servidor."}), 500
+
+    data = request.get_json()
+    prompt = data.get('prompt')
+    if not prompt:
+        return jsonify({"error": "O prompt é obrigatório."}), 400
+
+    user_id = int(get_jwt_identity())
+    stream = GenerationStream(prompt, bypass_cache=bool(data.get('bypass_cache')))
+
+    def event_stream():
+        try:
+            for text in stream:
+                yield _sse_event('chunk', {'chunk': text})
+
+            # Salva no histórico após a geração completa
+            history_entry = GenerationHistory(
+                user_id=user_id,
+                prompt=prompt,
+                generated_content=stream.text
+            )
+            db.session.add(history_entry)
+            with timed_history_commit('stream'):
+                db.session.commit()
+
+            yield _sse_event('complete', {'history_id': history_entry.id, 'chars': len(stream.text)})
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Erro na geração de conteúdo (SSE): {e}")
+            yield _sse_event('error', {'error': "Falha ao gerar conteúdo.", 'details': str(e)})
+
+    response = Response(stream_with_context(event_stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Desativa o buffering em proxies como o nginx
+    return response
+
+
+def _batch_cost():
+    """Um token por prompt do lote; listas inválidas custam 1 e são recusadas pela validação."""
+    prompts = (request.get_json(silent=True) or {}).get('prompts')
+    if isinstance(prompts, list) and 0 < len(prompts) <= current_app.config.get('BATCH_MAX_PROMPTS', 50):
+        return len(prompts)
+    return 1
+
+@main_bp.route('/api/generate/batch', methods=['POST'])
+@jwt_required()
+@rate_limited('generate', cost=_batch_cost)
+def generate_content_batch():
+    """
+    Gera uma lista de prompts com paralelismo limitado, emitindo o progresso
+    por item via text/event-stream ('item', 'complete'). Todas as entradas do
+    histórico são gravadas em uma única transação ao final.
+    """
+    if not is_provider_configured():
+        return jsonify({"error": "API Key do Google não configurada no servidor."}), 500
+
+    try:
+        validated_data = schemas.BatchGenerateSchema(**request.get_json())
+    except ValidationError as err:
+        return jsonify(err.errors()), 400
+
+    max_prompts = current_app.config.get('BATCH_MAX_PROMPTS', 50)
+    if len(validated_data.prompts) > max_prompts:
+        return jsonify({"error": f"No máximo {max_prompts} prompts por lote."}), 400
+
+    user_id = int(get_jwt_identity())
+    prompts = validated_data.prompts
+    # O lote já ocupa uma vaga; o paralelismo extra vem das vagas livres do usuário
+    wanted = min(current_app.config.get('BATCH_MAX_CONCURRENCY', 4), len(prompts))
+    max_concurrency = 1 + reserve_concurrency(wanted - 1)
+
+    def event_stream():
+        results = {}
+        failed = 0
+        for index, text, error in generate_batch(prompts, max_concurrency, bypass_cache=validated_data.bypass_cache):
+            if error is not None:
+                failed += 1
+                current_app.logger.error(f"Erro na geração em lote (item {index}): {error}")
+                yield _sse_event('item', {'index': index, 'status': 'failed', 'error': str(error)})
+            else:
+                results[index] = text
+                yield _sse_event('item', {'index': index, 'status': 'completed', 'content': text})
+
+        history_ids = {}
+        try:
+            # Inserção em massa: uma única transação para todo o lote
+            entries = [
+                (index, GenerationHistory(user_id=user_id, prompt=prompts[index], generated_content=text))
+                for index, text in sorted(results.items())
+            ]
+            db.session.add_all([entry for _, entry in entries])
+            with timed_history_commit('batch'):
+                db.session.commit()
+            history_ids = {index: entry.id for index, entry in entries}
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Erro ao salvar o histórico do lote: {e}")
+            yield _sse_event('error', {'error': "Falha ao salvar o histórico.", 'details': str(e)})
+            return
+
+        yield _sse_event('complete', {
+            'total': len(prompts),
+            'completed': len(results),
+            'failed': failed,
+            'history_ids': [history_ids.get(i) for i in range(len(prompts))],
+        })
+
+    response = Response(stream_with_context(event_stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# --- Rotas de Jobs de Geração (assíncronos) ---
+
+@main_bp.route('/api/jobs', methods=['POST'])
+@jwt_required()
+@rate_limited('generate')
+def create_generation_job():
+    if not is_provider_configured():
+        return jsonify({"error": "API Key do Google não configurada no servidor."}), 500
+
+    data = request.get_json()
+    prompt = data.get('prompt')
+    if not prompt:
+        return jsonify({"error": "O prompt é obrigatório."}), 400
+
+    user_id = int(get_jwt_identity())
+    client_sid = data.get('sid')
+
+    # A vaga de concorrência do usuário fica com o job até ele terminar
+    try:
+        job = submit_generation_job(user_id, prompt, client_sid=client_sid, bypass_cache=bool(data.get('bypass_cache')),
+                                    on_finish=detach_concurrency_leases())
+    except JobQueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify({"job_id": job.id, "status": job.status, "status_url": f"/api/jobs/{job.id}"}), 202
+
+@main_bp.route('/api/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_generation_job(job_id):
+    user_id = int(get_jwt_identity())
+    job = GenerationJob.query.filter_by(id=job_id, user_id=user_id).first_or_404()
+    return jsonify(serialize_job(job))
+
+
+# --- Métricas ---
+
+@main_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas no formato texto do Prometheus (agregadas entre os workers)."""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
 # --- Rotas para o SocketIO ---
 
 @socketio.on('connect')
-@jwt_required(optional=True) # Permite conexões sem token, mas o contexto de identidade não estará disponível
 def handle_connect():
-    # Opcional: verificar a identidade do usuário se o token for fornecido
-    current_user_id = get_jwt_identity()
-    if current_user_id:
-        user = User.query.get(int(current_user_id))
-        if user:
-            current_app.logger.info(f"Cliente conectado ao WebSocket: {user.username} (SID: {request.sid})")
-        else:
-            current_app.logger.info(f"Cliente com token inválido conectado ao WebSocket (SID: {request.sid})")
+    # Opcional: verificar a identidade do usuário se o token for fornecido.
+    # Sem token a conexão é anônima; com token de usuário removido ou com papel
+    # alterado (UserLookupError), apenas registra e segue, como antes do cache de principais.
+    try:
+        verify_jwt_in_request(optional=True)
+    except UserLookupError:
+        current_app.logger.info(f"Cliente com token inválido conectado ao WebSocket (SID: {request.sid})")
+        return
+    if get_jwt_identity():
+        current_app.logger.info(f"Cliente conectado ao WebSocket: {current_user.username} (SID: {request.sid})")
     else:
         current_app.logger.info(f"Cliente anônimo conectado ao WebSocket (SID: {request.sid})")
 
@@ -370,41 +682,125 @@ def handle_disconnect():
 
 # --- Rotas de Admin ---
 
+ADMIN_USER_STATS = ('collection_count', 'generation_count', 'last_generation_at')
+ADMIN_USER_SORTS = ('created_at', 'username', 'email') + ADMIN_USER_STATS
+
+def _admin_user_stats(user_id):
+    """Estatísticas por usuário como subconsultas correlacionadas a `user_id` (histórico ativo + arquivado)."""
+    def correlated(aggregate, column):
+        return db.session.query(aggregate).filter(column == user_id).scalar_subquery()
+
+    last_active = correlated(func.max(GenerationHistory.timestamp), GenerationHistory.user_id)
+    last_archived = correlated(func.max(GenerationHistoryArchive.timestamp), GenerationHistoryArchive.user_id)
+    return {
+        'collection_count': correlated(func.count(Collection.id), Collection.user_id),
+        'generation_count': correlated(func.count(GenerationHistory.id), GenerationHistory.user_id)
+                            + correlated(func.count(GenerationHistoryArchive.id), GenerationHistoryArchive.user_id),
+        # Maior entre as duas tabelas; max(a, b) escalar do SQLite e GREATEST divergem quanto a NULL
+        'last_generation_at': case(
+            (last_archived.is_(None), last_active),
+            (or_(last_active.is_(None), last_archived > last_active), last_archived),
+            else_=last_active,
+        ),
+    }
+
 @main_bp.route('/api/admin/users', methods=['GET'])
 @jwt_required()
+@admin_required("Acesso negado: requer privilégios de administrador")
 def get_all_users():
-    user_id = int(get_jwt_identity())
-    current_user = User.query.get(user_id)
-    if not current_user or not current_user.is_admin:
-        return jsonify({"message": "Acesso negado: requer privilégios de administrador"}), 403
-
-    users = User.query.all()
-    users_data = [{
-        "id": user.id,
-        "username": user.username,
-        "email": user.email,
-        "is_admin": user.is_admin,
-        "created_at": user.created_at.isoformat()
-    } for user in users]
-    
-    return jsonify(users_data)
+    limit = get_page_size(request.args, 'ADMIN_USERS_PAGE_SIZE', 'ADMIN_USERS_MAX_PAGE_SIZE')
+    page = max(1, request.args.get('page', 1, type=int))
+    sort = request.args.get('sort', 'created_at')
+    order = request.args.get('order', 'desc')
+    if sort not in ADMIN_USER_SORTS or order not in ('asc', 'desc'):
+        return jsonify({"message": f"Ordenação inválida. Use sort={'|'.join(ADMIN_USER_SORTS)} e order=asc|desc."}), 400
+
+    query = db.session.query(User)
+    prefix = request.args.get('q', '').strip()
+    if prefix:
+        # Intervalo [prefixo, prefixo + U+FFFF) usa os índices únicos de username/email
+        upper = prefix + '\uffff'
+        query = query.filter(or_(
+            and_(User.username >= prefix, User.username < upper),
+            and_(User.email >= prefix, User.email < upper),
+        ))
+    # Total em uma contagem à parte: a janela COUNT() OVER obrigaria a montar todas as linhas
+    total = query.with_entities(func.count(User.id)).scalar()
+
+    # 1) Ids da página: ORDER BY/OFFSET/LIMIT apenas sobre `users` (índice em
+    #    created_at/username/email). Ordenar por uma estatística exige calculá-la
+    #    para todos os usuários filtrados, mas só nessa etapa.
+    direction = (lambda column: column.desc()) if order == 'desc' else (lambda column: column.asc())
+    inner_sort = _admin_user_stats(User.id)[sort] if sort in ADMIN_USER_STATS else getattr(User, sort)
+    page_ids = query.with_entities(User.id.label('id')) \
+        .order_by(direction(inner_sort), direction(User.id)) \
+        .offset((page - 1) * limit).limit(limit).subquery()
+
+    # 2) Estatísticas (subconsultas correlacionadas cobertas por índices em
+    #    user_id) calculadas apenas para as linhas da página.
+    stats = _admin_user_stats(User.id)
+    outer_sort = stats[sort] if sort in ADMIN_USER_STATS else getattr(User, sort)
+    rows = db.session.query(
+        User.id, User.username, User.email, User.is_admin, User.created_at,
+        *(stats[name].label(name) for name in ADMIN_USER_STATS),
+    ).join(page_ids, page_ids.c.id == User.id) \
+        .order_by(direction(outer_sort), direction(User.id)).yield_per(STREAM_BATCH_SIZE)
+
+    def serialize(row):
+        return {
+            "id": row.id,
+            "username": row.username,
+            "email": row.email,
+            "is_admin": row.is_admin,
+            "created_at": row.created_at,
+            "collection_count": row.collection_count,
+            "generation_count": row.generation_count,
+            "last_generation_at": row.last_generation_at,
+        }
+
+    def tail():
+        return {'total': total, 'next_page': page + 1 if page * limit < total else None}
+
+    return streamed_json(rows, serialize, key='items', head={'page': page}, tail=tail)
 
 @main_bp.route('/api/admin/users/<int:user_id>', methods=['PUT'])
 @jwt_required()
+@admin_required()
 def update_user_role(user_id):
-    admin_user_id = int(get_jwt_identity())
-    admin_user = User.query.get(admin_user_id)
-    if not admin_user or not admin_user.is_admin:
-        return jsonify({"message": "Acesso negado"}), 403
-
     user = User.query.get(user_id)
     if not user:
         return jsonify({"message": "Usuário não encontrado"}), 404
 
     data = request.get_json()
     if 'is_admin' in data and isinstance(data['is_admin'], bool):
-        user.is_admin = data['is_admin']
+        if user.is_admin != data['is_admin']:
+            user.is_admin = data['is_admin']
+            # Tokens emitidos com o papel anterior deixam de ser aceitos
+            user.role_version = (user.role_version or 0) + 1
         db.session.commit()
+        invalidate_principal(user.id)
         return jsonify({"success": True, "message": f"Permissões do usuário {user.username} atualizadas."})
     
     return jsonify({"message": "Payload inválido"}), 400
+
+@main_bp.route('/api/admin/cache-stats', methods=['GET'])
+@jwt_required()
+@admin_required()
+def get_cache_stats():
+    stats = get_response_cache().get_stats()
+    stats['singleflight'] = get_singleflight_stats()
+    stats['principals'] = get_principal_cache_stats()
+    stats['password_hashing'] = get_password_hash_stats()
+    return jsonify(stats)
+
+@main_bp.route('/api/admin/model-status', methods=['GET'])
+@jwt_required()
+@admin_required()
+def get_model_status():
+    return jsonify(get_model_client_stats())
+
+@main_bp.route('/api/admin/rate-limit-stats', methods=['GET'])
+@jwt_required()
+@admin_required()
+def get_rate_limit_statistics():
+    return jsonify(get_rate_limit_stats())
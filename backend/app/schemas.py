@@ -1,4 +1,5 @@
-from pydantic import BaseModel, EmailStr, constr
+from typing import List
+from pydantic import BaseModel, EmailStr, constr, Field
 
 class UserRegisterSchema(BaseModel):
     username: constr(min_length=3, max_length=80)
@@ -10,4 +11,12 @@ class UserLoginSchema(BaseModel):
     password: str
 
 class CollectionSchema(BaseModel):
-    name: constr(min_length=1, max_length=100)
\ No newline at end of file
+    name: constr(min_length=1, max_length=100)
+
+class ContentSchema(BaseModel):
+    title: constr(min_length=1, max_length=200)
+    body: constr(min_length=1)
+
+class BatchGenerateSchema(BaseModel):
+    prompts: List[constr(min_length=1)] = Field(min_length=1)
+    bypass_cache: bool = False
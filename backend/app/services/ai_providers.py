@@ -0,0 +1,142 @@
+import hashlib
+import random
+import threading
+import time
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+
+# --- Provedores de IA ---
+#
+# Todo provedor expõe `stream(prompt)`, que produz o texto gerado em trechos
+# (strings), `warm_up()` e `health_check()`. O provedor ativo é escolhido por
+# `Config.AI_PROVIDER`.
+
+
+class ProviderError(Exception):
+    """Erro levantado por um provedor durante a geração."""
+
+
+_configure_lock = threading.Lock()
+_configured_api_key = None
+
+
+def _configure_once(api_key):
+    """genai.configure() descarta os clientes já criados: só é chamado uma vez por processo (ou se a chave mudar)."""
+    global _configured_api_key
+    with _configure_lock:
+        if _configured_api_key != api_key:
+            genai.configure(api_key=api_key)
+            _configured_api_key = api_key
+
+
+class GeminiProvider:
+    """Provedor baseado no Google Gemini (google-generativeai)."""
+
+    name = 'gemini'
+
+    def __init__(self, config):
+        api_key = config.get('GOOGLE_API_KEY')
+        if not api_key:
+            raise ValueError("A chave da API do Google não foi configurada.")
+        self.model_name = config.get('AI_MODEL_NAME', 'gemini-pro')
+        _configure_once(api_key)
+        self.model = genai.GenerativeModel(self.model_name)
+        # O GenerativeModel só cria o cliente gRPC na primeira geração. Cada
+        # provedor recebe o seu (uma renovação troca de canal de fato), e
+        # warm_up() o conecta antes de o provedor entrar em uso.
+        self.model._client = genai_client._client_manager.make_client('generative')
+
+    def warm_up(self):
+        """Abre a conexão do cliente com uma chamada barata (contagem de tokens, sem gerar)."""
+        self.model.count_tokens("ping")
+
+    def health_check(self):
+        """Consulta os metadados do modelo (chamada leve, sem gerar tokens)."""
+        genai.get_model(f"models/{self.model_name}")
+        return True
+
+    def stream(self, prompt):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+class StubProvider:
+    """
+    Provedor local e determinístico para testes de carga, sem rede.
+    Simula o tempo até o primeiro trecho, o atraso entre trechos,
+    o tamanho dos trechos e uma taxa de erro configuráveis.
+    """
+
+    name = 'stub'
+
+    _VOCABULARY = (
+        "conteúdo marketing público campanha engajamento marca estratégia "
+        "digital audiência criativo texto anúncio rede social produto cliente "
+        "resultado mensagem valor inovação"
+    ).split()
+
+    def __init__(self, config):
+        self.model_name = config.get('AI_MODEL_NAME', 'stub')
+        self.time_to_first_token = config.get('STUB_TIME_TO_FIRST_TOKEN', 0.5)
+        self.inter_chunk_delay = config.get('STUB_INTER_CHUNK_DELAY', 0.05)
+        self.chunk_size = max(1, config.get('STUB_CHUNK_SIZE', 32))
+        self.response_length = config.get('STUB_RESPONSE_LENGTH', 2000)
+        self.error_rate = config.get('STUB_ERROR_RATE', 0.0)
+        self._rng = random.Random(config.get('STUB_SEED', 0))
+        self._rng_lock = threading.Lock()
+
+    def _should_fail(self):
+        if self.error_rate <= 0:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < self.error_rate
+
+    def warm_up(self):
+        pass
+
+    def health_check(self):
+        return True
+
+    def build_response(self, prompt):
+        """Texto sintético derivado do prompt (mesmo prompt, mesma resposta)."""
+        seed = int.from_bytes(hashlib.sha256(prompt.encode('utf-8')).digest()[:8], 'big')
+        rng = random.Random(seed)
+        words = []
+        length = 0
+        while length < self.response_length:
+            word = rng.choice(self._VOCABULARY)
+            words.append(word)
+            length += len(word) + 1
+        return " ".join(words)[:self.response_length]
+
+    def stream(self, prompt):
+        fail = self._should_fail()
+        text = self.build_response(prompt)
+        if self.time_to_first_token > 0:
+            time.sleep(self.time_to_first_token)
+        starts = range(0, len(text), self.chunk_size)
+        # Falhas simuladas acontecem no meio do stream, como na API real
+        fail_at = len(starts) // 2 if fail else None
+        for index, start in enumerate(starts):
+            if index > 0 and self.inter_chunk_delay > 0:
+                time.sleep(self.inter_chunk_delay)
+            if index == fail_at:
+                raise ProviderError("Falha simulada pelo provedor stub.")
+            yield text[start:start + self.chunk_size]
+
+
+PROVIDERS = {
+    GeminiProvider.name: GeminiProvider,
+    StubProvider.name: StubProvider,
+}
+
+
+def create_provider(config):
+    """Instancia o provedor configurado em `AI_PROVIDER`."""
+    provider_name = config.get('AI_PROVIDER', GeminiProvider.name)
+    try:
+        provider_class = PROVIDERS[provider_name]
+    except KeyError:
+        raise ValueError(f"Provedor de IA desconhecido: '{provider_name}'.")
+    return provider_class(config)
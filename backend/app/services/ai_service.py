@@ -1,34 +1,172 @@
 import os
-import google.generativeai as genai
+import threading
+import time
+from datetime import datetime
 from flask import current_app
+from .. import is_cli_command
+from .ai_providers import create_provider
 
 # --- Configuração do Modelo Generativo ---
+#
+# Ciclo de vida do cliente do modelo (por worker):
+#   - aquecimento na criação do app (conexão aberta com uma chamada barata),
+#     para que nenhuma requisição pague o cold start; ignorado em comandos da CLI;
+#   - health checks periódicos em background;
+#   - renovação periódica (ou após falha no health check) que cria e valida um
+#     novo cliente ANTES de substituir o antigo.
 
-# Cache para o modelo generativo para evitar reinicialização
+# Cache para o provedor generativo para evitar reinicialização
 generative_model_cache = None
 GOOGLE_API_KEY = os.environ.get('GOOGLE_API_KEY')
 
+_model_lock = threading.Lock()
+model_lifecycle_thread = None
+model_client_stats = {
+    'initializations': 0,
+    'initialization_failures': 0,
+    'last_init_seconds': None,
+    'total_init_seconds': 0.0,
+    'refreshes': 0,
+    'refresh_failures': 0,
+    'health_checks': 0,
+    'health_check_failures': 0,
+    'last_health_check_ok': None,
+    'last_refreshed_at': None,
+}
+
+def _create_and_measure(config):
+    """Cria e aquece (conecta) um novo provedor registrando a latência de inicialização."""
+    started = time.perf_counter()
+    try:
+        provider = create_provider(config)
+        provider.warm_up()
+    except Exception:
+        model_client_stats['initialization_failures'] += 1
+        raise
+    elapsed = time.perf_counter() - started
+    model_client_stats['initializations'] += 1
+    model_client_stats['last_init_seconds'] = round(elapsed, 4)
+    model_client_stats['total_init_seconds'] += elapsed
+    return provider
+
 def get_generative_model():
     """
-    Retorna uma instância cacheada do modelo generativo.
-    Inicializa o modelo se ainda não estiver em cache.
+    Retorna uma instância cacheada do provedor generativo configurado.
+    Inicializa o provedor se ainda não estiver em cache (ex.: aquecimento desativado).
     """
     global generative_model_cache
     if generative_model_cache is None:
-        try:
-            if not GOOGLE_API_KEY:
-                raise ValueError("A chave da API do Google não foi configurada.")
-            
-            genai.configure(api_key=GOOGLE_API_KEY)
-            generative_model_cache = genai.GenerativeModel('gemini-pro')
-            current_app.logger.info("Modelo Generativo 'gemini-pro' inicializado com sucesso.")
-        except Exception as e:
-            current_app.logger.error(f"Falha ao inicializar o modelo generativo: {e}")
-            # Propaga o erro para que a rota que o chamou possa lidar com ele
-            raise
-            
+        with _model_lock:
+            if generative_model_cache is None:
+                try:
+                    generative_model_cache = _create_and_measure(current_app.config)
+                    current_app.logger.info(
+                        f"Provedor generativo '{generative_model_cache.name}' "
+                        f"(modelo '{generative_model_cache.model_name}') inicializado com sucesso."
+                    )
+                except Exception as e:
+                    current_app.logger.error(f"Falha ao inicializar o modelo generativo: {e}")
+                    # Propaga o erro para que a rota que o chamou possa lidar com ele
+                    raise
+
     return generative_model_cache
 
+def get_model_identifier():
+    """Identificador 'provedor:modelo' usado, por exemplo, nas chaves de cache."""
+    config = current_app.config
+    return f"{config.get('AI_PROVIDER', 'gemini')}:{config.get('AI_MODEL_NAME', 'gemini-pro')}"
+
+def is_provider_configured():
+    """Indica se o provedor configurado tem as credenciais necessárias."""
+    config = current_app.config
+    if config.get('AI_PROVIDER', 'gemini') == 'gemini':
+        return bool(config.get('GOOGLE_API_KEY'))
+    return True
+
+def refresh_generative_model():
+    """
+    Cria e conecta um novo cliente (warm_up valida a conexão) e só então
+    substitui o atual. Se a criação falhar, o cliente antigo continua em uso.
+    """
+    global generative_model_cache
+    try:
+        new_provider = _create_and_measure(current_app.config)
+    except Exception as e:
+        model_client_stats['refresh_failures'] += 1
+        current_app.logger.error(f"Falha ao renovar o cliente do modelo; mantendo o atual: {e}")
+        return False
+
+    with _model_lock:
+        generative_model_cache = new_provider
+    model_client_stats['refreshes'] += 1
+    model_client_stats['last_refreshed_at'] = datetime.utcnow()
+    current_app.logger.info("Cliente do modelo generativo renovado.")
+    return True
+
+def check_generative_model_health():
+    """Executa o health check do cliente atual. Retorna True se estiver saudável."""
+    provider = generative_model_cache
+    if provider is None:
+        return False
+    model_client_stats['health_checks'] += 1
+    try:
+        healthy = bool(provider.health_check())
+    except Exception as e:
+        current_app.logger.warning(f"Health check do modelo falhou: {e}")
+        healthy = False
+    if not healthy:
+        model_client_stats['health_check_failures'] += 1
+    model_client_stats['last_health_check_ok'] = healthy
+    return healthy
+
+def get_model_client_stats():
+    stats = dict(model_client_stats)
+    stats['total_init_seconds'] = round(stats['total_init_seconds'], 4)
+    stats['ready'] = generative_model_cache is not None
+    return stats
+
+def _model_lifecycle_loop(app):
+    """Loop em background: health checks periódicos e renovação do cliente."""
+    health_interval = app.config.get('MODEL_HEALTH_CHECK_INTERVAL', 300)
+    refresh_interval = app.config.get('MODEL_REFRESH_INTERVAL', 7200)
+    next_refresh = time.monotonic() + refresh_interval
+    while True:
+        time.sleep(health_interval)
+        # Usa o objeto `app` recebido; Blueprints não têm app_context()
+        with app.app_context():
+            healthy = check_generative_model_health()
+            if not healthy or time.monotonic() >= next_refresh:
+                if refresh_generative_model():
+                    next_refresh = time.monotonic() + refresh_interval
+
+def init_model_lifecycle(app):
+    """
+    Aquece o cliente do modelo e inicia a thread de manutenção (uma por worker).
+    Chamado por create_app().
+    """
+    global model_lifecycle_thread
+    if is_cli_command():
+        # Ex.: `flask db upgrade`: sem chamadas de rede nem threads em background
+        return
+    with app.app_context():
+        if not is_provider_configured():
+            app.logger.warning("Provedor de IA sem credenciais; aquecimento do modelo ignorado.")
+            return
+
+        if app.config.get('MODEL_WARMUP_ENABLED', True):
+            try:
+                get_generative_model()
+            except Exception:
+                # Erro já registrado; a primeira requisição tentará novamente
+                pass
+
+        if app.config.get('MODEL_LIFECYCLE_ENABLED', True) and model_lifecycle_thread is None:
+            app.logger.info("Iniciando a thread de manutenção do cliente do modelo de IA.")
+            model_lifecycle_thread = threading.Thread(
+                target=_model_lifecycle_loop, args=(app,), daemon=True, name='model-lifecycle'
+            )
+            model_lifecycle_thread.start()
+
 def clear_generative_model_cache():
     """
     Limpa o cache do modelo generativo.
@@ -36,4 +174,3 @@ def clear_generative_model_cache():
     global generative_model_cache
     generative_model_cache = None
     current_app.logger.info("Cache do modelo generativo foi limpo.")
-
@@ -0,0 +1,131 @@
+import threading
+from functools import wraps
+from typing import NamedTuple
+from flask import current_app, jsonify
+from flask_jwt_extended import current_user, get_jwt
+from .. import db, jwt
+from ..models import User
+from .cache_service import MemoryLRU
+
+# --- Principal Autenticado ---
+#
+# O token carrega `is_admin` e `rv` (versão do papel do usuário). O
+# user_lookup_loader resolve o principal a partir de um cache TTL por worker,
+# então rotas autenticadas não consultam a tabela de usuários a cada
+# requisição. Alterações de papel incrementam `User.role_version`: tokens
+# emitidos antes disso deixam de ser aceitos. Em outros workers a entrada
+# antiga pode valer até PRINCIPAL_CACHE_TTL segundos, exceto nas rotas
+# administrativas: admin_required sempre relê o papel do banco.
+
+principal_cache_instance = None
+_cache_lock = threading.Lock()
+principal_cache_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+class Principal(NamedTuple):
+    """Dados do usuário autenticado usados pelas rotas (não é uma instância do ORM)."""
+    id: int
+    username: str
+    email: str
+    is_admin: bool
+    role_version: int
+
+
+def get_principal_cache():
+    global principal_cache_instance
+    if principal_cache_instance is None:
+        with _cache_lock:
+            if principal_cache_instance is None:
+                config = current_app.config
+                principal_cache_instance = MemoryLRU(
+                    config.get('PRINCIPAL_CACHE_MAX_ENTRIES', 1024),
+                    config.get('PRINCIPAL_CACHE_TTL', 60),
+                )
+    return principal_cache_instance
+
+
+def reset_principal_cache():
+    """Descarta o cache atual (usado em testes)."""
+    global principal_cache_instance
+    principal_cache_instance = None
+
+
+def load_principal(user_id, refresh=False):
+    """Retorna o Principal do usuário (do cache ou do banco) ou None se ele não existir."""
+    cache = get_principal_cache()
+    if not refresh:
+        principal = cache.get(user_id)
+        if principal is not None:
+            principal_cache_stats['hits'] += 1
+            return principal
+
+    principal_cache_stats['misses'] += 1
+    row = db.session.query(
+        User.id, User.username, User.email, User.is_admin, User.role_version
+    ).filter(User.id == user_id).first()
+    if row is None:
+        cache.delete(user_id)
+        return None
+    principal = Principal(row.id, row.username, row.email, bool(row.is_admin), row.role_version or 0)
+    cache.set(user_id, principal)
+    return principal
+
+
+def invalidate_principal(user_id):
+    """Remove o usuário do cache após alterações de perfil, papel ou remoção."""
+    get_principal_cache().delete(user_id)
+    principal_cache_stats['invalidations'] += 1
+
+
+def get_principal_cache_stats():
+    stats = dict(principal_cache_stats)
+    stats['entries'] = len(get_principal_cache())
+    return stats
+
+
+@jwt.additional_claims_loader
+def add_principal_claims(identity):
+    # Chamado por create_access_token(): o login também aquece o cache
+    principal = load_principal(int(identity), refresh=True)
+    if principal is None:
+        return {}
+    return {'is_admin': principal.is_admin, 'rv': principal.role_version}
+
+
+@jwt.user_lookup_loader
+def lookup_principal(jwt_header, jwt_data):
+    user_id = int(jwt_data['sub'])
+    token_version = jwt_data.get('rv', 0)
+    principal = load_principal(user_id)
+    if principal is not None and principal.role_version < token_version:
+        # Cache deste worker desatualizado em relação ao token
+        principal = load_principal(user_id, refresh=True)
+    if principal is None or principal.role_version != token_version:
+        return None
+    return principal
+
+
+@jwt.user_lookup_error_loader
+def principal_not_found(jwt_header, jwt_data):
+    return jsonify({"message": "Sessão inválida ou permissões alteradas. Faça login novamente."}), 401
+
+
+def admin_required(message="Acesso negado"):
+    """
+    Decorador para rotas administrativas (aplicar abaixo de @jwt_required).
+    Relê o papel do banco em vez de confiar no cache: um administrador
+    rebaixado perde o acesso em todos os workers, sem esperar o TTL.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_user.is_admin:
+                return jsonify({"message": message}), 403
+            principal = load_principal(current_user.id, refresh=True)
+            if principal is None or principal.role_version != get_jwt().get('rv', 0):
+                return principal_not_found(None, None)
+            if not principal.is_admin:
+                return jsonify({"message": message}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
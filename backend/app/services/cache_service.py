@@ -0,0 +1,320 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from .metrics_service import get_counter_totals, response_cache_requests
+
+# --- Cache de Respostas do Modelo Generativo ---
+#
+# Duas camadas:
+#   1. LRU em memória (por processo), com TTL e limites de entradas e de bytes.
+#   2. Camada em disco (SQLite) compartilhada entre os workers do gunicorn,
+#      com os mesmos limites.
+# A chave é um hash SHA-256 do prompt normalizado + nome do modelo.
+# Os contadores de acertos/falhas são Counters do Prometheus, agregados entre workers.
+
+response_cache_instance = None
+
+
+def normalize_prompt(prompt):
+    """Normaliza o prompt (espaços em branco) para aumentar a taxa de acerto."""
+    return " ".join(prompt.split())
+
+
+def make_cache_key(prompt, model_name):
+    """Gera a chave de cache endereçada por conteúdo."""
+    payload = f"{model_name}\x00{normalize_prompt(prompt)}".encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+
+def payload_size(value):
+    """Tamanho do valor em bytes (texto em UTF-8)."""
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return 0
+
+
+class MemoryLRU:
+    """LRU em memória, thread-safe, com expiração por TTL e limites de entradas e de bytes."""
+
+    def __init__(self, max_entries, ttl, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.total_bytes = 0
+        self._data = OrderedDict()  # chave -> (valor, expires_at, tamanho)
+        self._lock = threading.Lock()
+
+    def _pop(self, key):
+        _, _, size = self._data.pop(key)
+        self.total_bytes -= size
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at, _ = item
+            if expires_at < time.time():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        size = payload_size(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            # Maior que o orçamento inteiro: não vale expulsar todo o resto
+            self.delete(key)
+            return
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, expires_at, size)
+            self.total_bytes += size
+            while len(self._data) > self.max_entries or (self.max_bytes and self.total_bytes > self.max_bytes):
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.total_bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _SQLiteTier:
+    """
+    Camada em disco compartilhada entre processos, com TTL e limites de entradas
+    e de bytes. Os totais ficam em `response_cache_totals`, mantida por triggers,
+    então uma gravação não precisa de COUNT(*)/SUM() sobre a tabela inteira.
+    """
+
+    SCHEMA_VERSION = 2
+    SWEEP_INTERVAL = 60  # segundos entre remoções de entradas expiradas (por processo)
+
+    def __init__(self, path, max_entries, ttl, max_bytes=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._next_sweep = 0
+        conn = self._connect()
+        (version,) = conn.execute("PRAGMA user_version").fetchone()
+        if version < self.SCHEMA_VERSION:
+            # É só um cache: versões antigas do esquema são descartadas
+            conn.execute("DROP TABLE IF EXISTS response_cache")
+            conn.execute("DROP TABLE IF EXISTS response_cache_totals")
+        conn.executescript(
+            "BEGIN;"
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS ix_response_cache_last_access ON response_cache (last_access);"
+            "CREATE INDEX IF NOT EXISTS ix_response_cache_expires_at ON response_cache (expires_at);"
+            "CREATE TABLE IF NOT EXISTS response_cache_totals ("
+            " id INTEGER PRIMARY KEY CHECK (id = 1), entries INTEGER NOT NULL, bytes INTEGER NOT NULL);"
+            "INSERT OR IGNORE INTO response_cache_totals (id, entries, bytes) VALUES (1, 0, 0);"
+            "CREATE TRIGGER IF NOT EXISTS response_cache_totals_ai AFTER INSERT ON response_cache BEGIN"
+            " UPDATE response_cache_totals SET entries = entries + 1, bytes = bytes + new.size; END;"
+            "CREATE TRIGGER IF NOT EXISTS response_cache_totals_ad AFTER DELETE ON response_cache BEGIN"
+            " UPDATE response_cache_totals SET entries = entries - 1, bytes = bytes - old.size; END;"
+            "CREATE TRIGGER IF NOT EXISTS response_cache_totals_au AFTER UPDATE OF size ON response_cache BEGIN"
+            " UPDATE response_cache_totals SET bytes = bytes - old.size + new.size; END;"
+            f"PRAGMA user_version = {self.SCHEMA_VERSION};"
+            "COMMIT;"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """Retorna (valor, expires_at), ou None se ausente ou expirada."""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at < now:
+            conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+        return value, expires_at
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.ttl)
+        size = payload_size(value)
+        if self.max_bytes and size > self.max_bytes:
+            return
+        conn = self._connect()
+        # UPSERT (e não INSERT OR REPLACE): o REPLACE não dispara os triggers de DELETE
+        conn.execute(
+            "INSERT INTO response_cache (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+            "expires_at = excluded.expires_at, last_access = excluded.last_access",
+            (key, value, size, expires_at, now),
+        )
+        self._evict(conn, now)
+
+    def _over_budget(self, conn):
+        entries, total_bytes = conn.execute(
+            "SELECT entries, bytes FROM response_cache_totals WHERE id = 1"
+        ).fetchone()
+        return entries > self.max_entries or (self.max_bytes and total_bytes > self.max_bytes)
+
+    def _evict(self, conn, now):
+        if now >= self._next_sweep:
+            # Usa ix_response_cache_expires_at: só visita as entradas expiradas
+            conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (now,))
+            self._next_sweep = now + self.SWEEP_INTERVAL
+        # Remove a menos usada até caber no orçamento (uma busca no índice de last_access por linha)
+        while self._over_budget(conn):
+            conn.execute(
+                "DELETE FROM response_cache WHERE key = ("
+                " SELECT key FROM response_cache ORDER BY last_access ASC LIMIT 1)"
+            )
+
+    def totals(self):
+        entries, total_bytes = self._connect().execute(
+            "SELECT entries, bytes FROM response_cache_totals WHERE id = 1"
+        ).fetchone()
+        return {'entries': entries, 'bytes': total_bytes}
+
+    def clear(self):
+        self._connect().execute("DELETE FROM response_cache")
+
+
+class ResponseCache:
+    """
+    Cache de respostas em duas camadas (memória + SQLite) com contadores
+    de acertos e falhas (exportados no /metrics).
+    """
+
+    def __init__(self, memory_max_entries=256, disk_path=None, disk_max_entries=10000, ttl=86400,
+                 memory_max_bytes=None, disk_max_bytes=None):
+        self.memory = MemoryLRU(memory_max_entries, ttl, max_bytes=memory_max_bytes)
+        self.disk = _SQLiteTier(disk_path, disk_max_entries, ttl, max_bytes=disk_max_bytes) if disk_path else None
+
+    def _incr(self, result):
+        response_cache_requests.labels(result).inc()
+
+    def get(self, prompt, model_name):
+        key = make_cache_key(prompt, model_name)
+        value = self.memory.get(key)
+        if value is not None:
+            self._incr('memory_hit')
+            return value
+
+        if self.disk is not None:
+            try:
+                entry = self.disk.get(key)
+            except sqlite3.Error as e:
+                current_app.logger.warning(f"Falha ao ler o cache em disco: {e}")
+                entry = None
+            if entry is not None:
+                value, expires_at = entry
+                # Promove para a camada em memória só pelo TTL que resta no disco
+                self.memory.set(key, value, ttl=expires_at - time.time())
+                self._incr('disk_hit')
+                return value
+
+        self._incr('miss')
+        return None
+
+    def set(self, prompt, model_name, value):
+        if not value:
+            return
+        key = make_cache_key(prompt, model_name)
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error as e:
+                current_app.logger.warning(f"Falha ao gravar no cache em disco: {e}")
+        self._incr('store')
+
+    def record_bypass(self):
+        self._incr('bypass')
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def get_stats(self):
+        """Contadores somados entre os workers; os tamanhos da camada em memória são do processo atual."""
+        totals = get_counter_totals(response_cache_requests, 'result')
+        stats = {
+            'memory_hits': totals.get('memory_hit', 0),
+            'disk_hits': totals.get('disk_hit', 0),
+            'misses': totals.get('miss', 0),
+            'stores': totals.get('store', 0),
+            'bypassed': totals.get('bypass', 0),
+        }
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        stats['hit_ratio'] = round(hits / lookups, 4) if lookups else 0.0
+        stats['memory_entries'] = len(self.memory)
+        stats['memory_bytes'] = self.memory.total_bytes
+        if self.disk is not None:
+            try:
+                totals = self.disk.totals()
+                stats['disk_entries'], stats['disk_bytes'] = totals['entries'], totals['bytes']
+            except sqlite3.Error:
+                pass
+        return stats
+
+
+def get_response_cache():
+    """
+    Retorna a instância (por processo) do cache de respostas,
+    criando-a a partir da configuração do app na primeira chamada.
+    """
+    global response_cache_instance
+    if response_cache_instance is None:
+        config = current_app.config
+        disk_path = config.get('RESPONSE_CACHE_PATH')
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+        response_cache_instance = ResponseCache(
+            memory_max_entries=config.get('RESPONSE_CACHE_MEMORY_MAX_ENTRIES', 256),
+            disk_path=disk_path,
+            disk_max_entries=config.get('RESPONSE_CACHE_DISK_MAX_ENTRIES', 10000),
+            ttl=config.get('RESPONSE_CACHE_TTL', 86400),
+            memory_max_bytes=config.get('RESPONSE_CACHE_MEMORY_MAX_BYTES'),
+            disk_max_bytes=config.get('RESPONSE_CACHE_MAX_BYTES'),
+        )
+        current_app.logger.info("Cache de respostas do modelo inicializado.")
+    return response_cache_instance
+
+
+def reset_response_cache():
+    """Descarta a instância atual do cache (usado em testes)."""
+    global response_cache_instance
+    response_cache_instance = None
@@ -0,0 +1,105 @@
+import json
+from datetime import datetime
+from flask import current_app
+from pydantic import ValidationError
+from sqlalchemy import and_, insert, or_, select
+from .. import db
+from ..models import Collection, Content
+from ..schemas import ContentSchema
+
+# --- Exportação e Importação de Coleções (NDJSON) ---
+#
+# Um objeto JSON por linha: {"title": ..., "body": ...}. A exportação lê em
+# lotes por keyset (created_at, id) e a importação grava em lotes com
+# executemany, então a memória usada não depende do tamanho da coleção.
+
+
+def iter_collection_ndjson(collection_id, batch_size=None):
+    """Gera as linhas NDJSON dos conteúdos da coleção, em ordem de criação."""
+    batch_size = batch_size or current_app.config.get('COLLECTION_EXPORT_BATCH_SIZE', 500)
+    columns = (Content.id, Content.title, Content.body, Content.created_at)
+    dumps = current_app.json.dumps
+    last = None
+    while True:
+        query = select(*columns).where(Content.collection_id == collection_id)
+        if last is not None:
+            query = query.where(or_(
+                Content.created_at > last[0],
+                and_(Content.created_at == last[0], Content.id > last[1]),
+            ))
+        rows = db.session.execute(
+            query.order_by(Content.created_at, Content.id).limit(batch_size)
+        ).all()
+        for row in rows:
+            yield dumps({
+                'id': row.id,
+                'title': row.title,
+                'body': row.body,
+                'created_at': row.created_at,
+            }) + '\n'
+        if len(rows) < batch_size:
+            break
+        last = (rows[-1].created_at, rows[-1].id)
+        # Não mantém os lotes já enviados na sessão
+        db.session.expire_all()
+
+
+def import_collection_ndjson(collection_id, lines, batch_size=None, max_errors=None):
+    """
+    Importa conteúdos a partir de linhas NDJSON (bytes ou str).
+    Linhas inválidas são ignoradas e reportadas; as válidas são gravadas em lotes.
+    Retorna {'imported': n, 'failed': n, 'errors': [{'line': n, 'errors': [...]}]}.
+    """
+    config = current_app.config
+    batch_size = batch_size or config.get('COLLECTION_IMPORT_BATCH_SIZE', 1000)
+    max_errors = max_errors if max_errors is not None else config.get('COLLECTION_IMPORT_MAX_ERRORS', 100)
+    result = {'imported': 0, 'failed': 0, 'errors': []}
+    batch = []
+
+    def flush():
+        if batch:
+            # Lista de dicts -> executemany em uma única transação por lote
+            db.session.execute(insert(Content), batch)
+            Collection.touch(collection_id)
+            db.session.commit()
+            result['imported'] += len(batch)
+            batch.clear()
+
+    def fail(line_number, errors):
+        result['failed'] += 1
+        if len(result['errors']) < max_errors:
+            result['errors'].append({'line': line_number, 'errors': errors})
+
+    for line_number, raw in enumerate(lines, start=1):
+        if isinstance(raw, bytes):
+            try:
+                raw = raw.decode('utf-8')
+            except UnicodeDecodeError:
+                fail(line_number, ["Linha não está em UTF-8."])
+                continue
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            item = ContentSchema(**json.loads(raw))
+        except json.JSONDecodeError as e:
+            fail(line_number, [f"JSON inválido: {e.msg}"])
+            continue
+        except TypeError:
+            fail(line_number, ["Cada linha deve ser um objeto JSON."])
+            continue
+        except ValidationError as e:
+            fail(line_number, [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()])
+            continue
+
+        batch.append({
+            'title': item.title,
+            'body': item.body,
+            'collection_id': collection_id,
+            'created_at': datetime.utcnow(),
+        })
+        if len(batch) >= batch_size:
+            flush()
+
+    flush()
+    return result
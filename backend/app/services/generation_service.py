@@ -0,0 +1,336 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from .ai_service import get_generative_model, get_model_identifier
+from .cache_service import get_response_cache, make_cache_key
+from .metrics_service import StreamTimer, get_counter_totals, singleflight_requests, socket_emit_duration, upstream_errors
+
+# --- Pipeline de Geração de Conteúdo ---
+#
+# Ponto único usado pela rota HTTP e pelos workers de jobs:
+# consulta o cache, faz o streaming do modelo e repassa cada trecho
+# para o callback `on_chunk`.
+#
+# Requisições idênticas e simultâneas são coalescidas (single-flight): a
+# primeira inicia uma thread produtora que lê o modelo; todas (inclusive a
+# primeira) recebem os trechos já produzidos e acompanham o restante ao vivo.
+
+
+class ChunkCoalescer:
+    """
+    Agrupa trechos pequenos do stream antes de enviá-los ao cliente.
+
+    O buffer é uma lista (acumulação O(n)) e é descarregado quando atinge
+    `flush_chars` caracteres ou quando `flush_interval` segundos se passaram
+    desde o último envio. O primeiro trecho é enviado imediatamente para não
+    atrasar o tempo até o primeiro byte. Um timer, armado quando o buffer
+    deixa de estar vazio, garante o limite de tempo mesmo se o modelo pausar
+    entre trechos; `close()` envia o que restar.
+    """
+
+    def __init__(self, emit, flush_chars=256, flush_interval=0.05):
+        self.emit = emit
+        self.flush_chars = flush_chars
+        self.flush_interval = flush_interval
+        self.chunks_received = 0
+        self.frames_sent = 0
+        self.chars_received = 0
+        self._pending = []
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
+        self._timer = None
+        # O timer envia de outra thread: o lock mantém a ordem dos quadros
+        self._lock = threading.Lock()
+
+    def add(self, text):
+        with self._lock:
+            self.chunks_received += 1
+            self.chars_received += len(text)
+            self._pending.append(text)
+            self._pending_chars += len(text)
+            if (self.frames_sent == 0
+                    or self._pending_chars >= self.flush_chars
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        frame = "".join(self._pending)
+        self._pending = []
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
+        self.frames_sent += 1
+        with socket_emit_duration.time():
+            self.emit(frame)
+
+    def close(self):
+        self.flush()
+        return self.get_stats()
+
+    def get_stats(self):
+        return {
+            'chunks_received': self.chunks_received,
+            'frames_sent': self.frames_sent,
+            'chars': self.chars_received,
+        }
+
+
+def create_chunk_coalescer(emit):
+    """Cria um ChunkCoalescer com os limites definidos na configuração."""
+    config = current_app.config
+    return ChunkCoalescer(
+        emit,
+        flush_chars=config.get('STREAM_FLUSH_CHARS', 256),
+        flush_interval=config.get('STREAM_FLUSH_INTERVAL', 0.05),
+    )
+
+
+class _InFlightGeneration:
+    """
+    Stream em andamento compartilhado entre requisições idênticas. Todos os
+    consumidores (inclusive o primeiro) o acompanham por `follow()`; quando o
+    último desiste, a geração é cancelada.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.consumers = 0
+        self.cancelled = False
+        self._condition = threading.Condition()
+
+    def attach(self):
+        """Registra um consumidor. Retorna False se a geração já foi cancelada."""
+        with self._condition:
+            if self.cancelled:
+                return False
+            self.consumers += 1
+            return True
+
+    def _detach(self):
+        with self._condition:
+            self.consumers -= 1
+            if self.consumers == 0 and not self.done:
+                self.cancelled = True
+
+    def publish(self, text):
+        with self._condition:
+            self.chunks.append(text)
+            self._condition.notify_all()
+
+    def finish(self, error=None):
+        with self._condition:
+            self.done = True
+            self.error = error
+            self._condition.notify_all()
+
+    def follow(self, timeout):
+        """Itera sobre todos os trechos (passados e futuros) até o fim do stream (após attach())."""
+        index = 0
+        try:
+            while True:
+                with self._condition:
+                    while index >= len(self.chunks) and not self.done:
+                        if not self._condition.wait(timeout=timeout):
+                            raise TimeoutError("Tempo esgotado aguardando a geração em andamento.")
+                    pending = self.chunks[index:]
+                    finished = self.done
+                    error = self.error
+                for text in pending:
+                    yield text
+                index += len(pending)
+                if finished and index >= len(self.chunks):
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            # Também quando o consumidor desiste no meio (GeneratorExit)
+            self._detach()
+
+
+in_flight_generations = {}
+_in_flight_lock = threading.Lock()
+
+
+def _join_or_lead(key):
+    """Retorna (stream já registrado com este consumidor, é_líder) para a chave informada."""
+    with _in_flight_lock:
+        flight = in_flight_generations.get(key)
+        if flight is not None and flight.attach():
+            singleflight_requests.labels('follower').inc()
+            return flight, False
+        # Sem geração em andamento (ou a anterior foi cancelada): inicia uma nova
+        flight = _InFlightGeneration()
+        flight.attach()
+        in_flight_generations[key] = flight
+        singleflight_requests.labels('leader').inc()
+        return flight, True
+
+
+def get_singleflight_stats():
+    """Líderes/seguidores somados entre os workers; `in_flight` é do processo atual."""
+    totals = get_counter_totals(singleflight_requests, 'role')
+    with _in_flight_lock:
+        in_flight = len(in_flight_generations)
+    return {'leaders': totals.get('leader', 0), 'followers': totals.get('follower', 0), 'in_flight': in_flight}
+
+
+class GenerationAborted(Exception):
+    """Todos os consumidores desistiram antes do fim da geração."""
+
+
+def _produce(app, flight, key, prompt, model_identifier):
+    """
+    Thread produtora: lê o modelo, publica no stream compartilhado e grava o
+    cache. Roda separada das requisições para que a desconexão de um cliente
+    (mesmo o primeiro) não interrompa os demais; para apenas quando não resta
+    nenhum consumidor.
+    """
+    with app.app_context():
+        upstream = _stream_from_model(prompt)
+        try:
+            for text in upstream:
+                if flight.cancelled:
+                    raise GenerationAborted("A geração em andamento foi interrompida.")
+                flight.publish(text)
+            get_response_cache().set(prompt, model_identifier, "".join(flight.chunks))
+        except Exception as e:
+            error = e
+        else:
+            error = None
+        finally:
+            upstream.close()
+            with _in_flight_lock:
+                if in_flight_generations.get(key) is flight:
+                    del in_flight_generations[key]
+        flight.finish(error=error)
+
+
+class GenerationStream:
+    """
+    Iterável sobre os trechos de uma geração (cache, single-flight ou modelo).
+    Após a iteração completa, `text` contém o texto final e `from_cache`
+    indica se a resposta veio do cache.
+    """
+
+    def __init__(self, prompt, bypass_cache=False):
+        self.prompt = prompt
+        self.bypass_cache = bypass_cache or not current_app.config.get('RESPONSE_CACHE_ENABLED', True)
+        self.text = None
+        self.from_cache = False
+        self.source = 'model'  # model, cache ou singleflight (para as métricas)
+
+    def __iter__(self):
+        timer = StreamTimer()
+        parts = []
+        for text in self._chunks():
+            timer.on_chunk(text)
+            parts.append(text)
+            yield text
+        self.text = "".join(parts)
+        timer.finish(self.source)
+
+    def _chunks(self):
+        response_cache = get_response_cache()
+        model_identifier = get_model_identifier()
+
+        cached_text = None
+        if self.bypass_cache:
+            response_cache.record_bypass()
+        else:
+            cached_text = response_cache.get(self.prompt, model_identifier)
+
+        if cached_text is not None:
+            # Cache hit: reenvia o texto em trechos, como no streaming
+            self.from_cache = True
+            self.source = 'cache'
+            chunk_size = current_app.config.get('RESPONSE_CACHE_REPLAY_CHUNK_SIZE', 256)
+            for start in range(0, len(cached_text), chunk_size):
+                yield cached_text[start:start + chunk_size]
+            return
+
+        if self.bypass_cache:
+            # Geração explicitamente nova: não participa da coalescência
+            yield from _stream_from_model(self.prompt)
+            return
+
+        key = make_cache_key(self.prompt, model_identifier)
+        flight, is_leader = _join_or_lead(key)
+        if is_leader:
+            app = current_app._get_current_object()
+            threading.Thread(
+                target=_produce, args=(app, flight, key, self.prompt, model_identifier),
+                daemon=True, name='generation-upstream',
+            ).start()
+        else:
+            self.source = 'singleflight'
+
+        timeout = current_app.config.get('SINGLEFLIGHT_WAIT_TIMEOUT', 120)
+        yield from flight.follow(timeout)
+
+
+def generate_text(prompt, on_chunk=None, bypass_cache=False):
+    """
+    Gera o texto completo para o prompt, chamando `on_chunk(texto)` a cada trecho.
+    Retorna uma tupla (texto_completo, veio_do_cache).
+    """
+    stream = GenerationStream(prompt, bypass_cache=bypass_cache)
+    for text in stream:
+        if on_chunk is not None:
+            on_chunk(text)
+    return stream.text, stream.from_cache
+
+
+def _stream_from_model(prompt):
+    """Abre o stream no provedor configurado, ignorando trechos vazios."""
+    try:
+        provider = get_generative_model()
+
+        # Geração de conteúdo em streaming
+        for text in provider.stream(prompt):
+            if text:
+                yield text
+    except Exception:
+        upstream_errors.labels(current_app.config.get('AI_PROVIDER', 'gemini')).inc()
+        raise
+
+
+def generate_batch(prompts, max_concurrency, bypass_cache=False):
+    """
+    Gera vários prompts em paralelo (no máximo `max_concurrency` por vez).
+    Produz (índice, texto, erro) à medida que cada item termina.
+    """
+    app = current_app._get_current_object()
+
+    def run(prompt):
+        with app.app_context():
+            text, _ = generate_text(prompt, bypass_cache=bypass_cache)
+            return text
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(prompts))),
+                                  thread_name_prefix='generation-batch')
+    try:
+        futures = {executor.submit(run, prompt): index for index, prompt in enumerate(prompts)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                yield index, future.result(), None
+            except Exception as e:
+                yield index, None, e
+    finally:
+        # Se o consumidor desistir (cliente desconectou), descarta o que ainda não começou
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,132 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from .. import db, is_cli_command
+from ..compression import compress_text, get_compression_threshold
+from ..models import GenerationHistory, GenerationHistoryArchive
+from .job_service import reconcile_stale_jobs
+
+# --- Manutenção do Histórico ---
+#
+# Mantém a tabela `generation_history` pequena e residente em cache:
+# - comprime, em lotes, textos longos gravados antes da compressão existir;
+# - move para `generation_history_archive` as entradas mais antigas que
+#   HISTORY_RETENTION_DAYS (desativado por padrão). Entradas arquivadas
+#   continuam acessíveis por /api/history/<id>, mas saem da listagem e da busca.
+
+history_maintenance_thread = None
+history_maintenance_stats = {'compressed': 0, 'archived': 0, 'last_run_at': None}
+
+
+def compress_pending_history(batch_size=None):
+    """Comprime um lote de entradas ainda em texto puro. Retorna quantas foram comprimidas."""
+    config = current_app.config
+    batch_size = batch_size or config.get('HISTORY_MAINTENANCE_BATCH_SIZE', 500)
+    threshold = get_compression_threshold()
+    if threshold <= 0:
+        return 0
+
+    entries = GenerationHistory.query.options(db.undefer_group('content')).filter(
+        GenerationHistory.generated_content_raw.isnot(None),
+        func.length(GenerationHistory.generated_content_raw) >= threshold,
+    ).limit(batch_size).all()
+    for entry in entries:
+        # O setter grava o texto comprimido e limpa a coluna de texto puro
+        entry.generated_content = entry.generated_content_raw
+    db.session.commit()
+    history_maintenance_stats['compressed'] += len(entries)
+    return len(entries)
+
+
+def archive_expired_history(retention_days=None, batch_size=None):
+    """Move um lote de entradas expiradas para o arquivo. Retorna quantas foram movidas."""
+    config = current_app.config
+    retention_days = retention_days if retention_days is not None else config.get('HISTORY_RETENTION_DAYS', 0)
+    batch_size = batch_size or config.get('HISTORY_MAINTENANCE_BATCH_SIZE', 500)
+    if retention_days <= 0:
+        return 0
+
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    entries = GenerationHistory.query.options(db.undefer_group('content')) \
+        .filter(GenerationHistory.timestamp < cutoff) \
+        .order_by(GenerationHistory.timestamp).limit(batch_size).all()
+    if not entries:
+        return 0
+
+    ids = [entry.id for entry in entries]
+    try:
+        db.session.add_all([
+            GenerationHistoryArchive(
+                id=entry.id,
+                user_id=entry.user_id,
+                prompt=entry.prompt,
+                generated_content_z=entry.generated_content_z or compress_text(entry.generated_content or ''),
+                preview=entry.preview,
+                timestamp=entry.timestamp,
+            ) for entry in entries
+        ])
+        # generation_job.history_id vira NULL pelo banco (ON DELETE SET NULL)
+        GenerationHistory.query.filter(GenerationHistory.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+    except IntegrityError:
+        # Outro worker arquivou o mesmo lote
+        db.session.rollback()
+        return 0
+    history_maintenance_stats['archived'] += len(ids)
+    return len(ids)
+
+
+def run_history_maintenance():
+    """Executa compressão e arquivamento até esvaziar as pendências."""
+    compressed = archived = 0
+    while True:
+        count = compress_pending_history()
+        compressed += count
+        if not count:
+            break
+    while True:
+        count = archive_expired_history()
+        archived += count
+        if not count:
+            break
+    history_maintenance_stats['last_run_at'] = datetime.utcnow()
+    return compressed, archived
+
+
+def get_history_maintenance_stats():
+    return dict(history_maintenance_stats)
+
+
+def _history_maintenance_loop(app):
+    interval = app.config.get('HISTORY_MAINTENANCE_INTERVAL', 3600)
+    while True:
+        with app.app_context():
+            try:
+                compressed, archived = run_history_maintenance()
+                if compressed or archived:
+                    app.logger.info(f"Manutenção do histórico: {compressed} comprimidas, {archived} arquivadas.")
+                # Mesma varredura da inicialização: jobs órfãos e jobs já terminados
+                failed, pruned = reconcile_stale_jobs()
+                if failed or pruned:
+                    app.logger.info(f"Manutenção dos jobs: {failed} órfãos encerrados, {pruned} removidos.")
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Falha na manutenção do histórico: {e}")
+            finally:
+                db.session.remove()
+        time.sleep(interval)
+
+
+def init_history_maintenance(app):
+    """Inicia a thread de manutenção do histórico. Chamado por create_app()."""
+    global history_maintenance_thread
+    if is_cli_command():
+        return
+    if app.config.get('HISTORY_MAINTENANCE_ENABLED', True) and history_maintenance_thread is None:
+        history_maintenance_thread = threading.Thread(
+            target=_history_maintenance_loop, args=(app,), daemon=True, name='history-maintenance'
+        )
+        history_maintenance_thread.start()
@@ -0,0 +1,208 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from .. import db, socketio
+from ..models import GenerationHistory, GenerationJob
+from .generation_service import generate_text, create_chunk_coalescer
+from .metrics_service import timed_history_commit
+
+# --- Fila de Jobs de Geração ---
+#
+# Desacopla a concorrência HTTP da latência do modelo: a rota cria o job,
+# devolve o ID imediatamente e um pool limitado de threads executa a geração.
+# O estado do job é persistido na tabela `generation_job` (o texto gerado fica
+# apenas no histórico, via `history_id`). Jobs que ficaram 'pending'/'running'
+# por um worker que morreu são encerrados na inicialização e pela manutenção
+# periódica, que também remove os jobs já terminados.
+
+ACTIVE_STATUSES = ('pending', 'running')
+
+job_executor = None
+job_slots = None
+_executor_lock = threading.Lock()
+
+
+class JobQueueFullError(Exception):
+    """Levantada quando a fila de jobs atingiu o limite configurado."""
+
+
+def _get_executor():
+    """Cria (uma vez por processo) o pool de workers e o semáforo da fila."""
+    global job_executor, job_slots
+    if job_executor is None:
+        with _executor_lock:
+            if job_executor is None:
+                config = current_app.config
+                max_workers = config.get('GENERATION_JOB_WORKERS', 4)
+                job_slots = threading.BoundedSemaphore(
+                    max_workers + config.get('GENERATION_JOB_QUEUE_SIZE', 32)
+                )
+                job_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='generation-job')
+                current_app.logger.info(f"Pool de jobs de geração iniciado com {max_workers} workers.")
+    return job_executor
+
+
+def submit_generation_job(user_id, prompt, client_sid=None, bypass_cache=False, on_finish=None):
+    """
+    Persiste um novo job e o agenda no pool de workers.
+    `on_finish` é chamado quando o job termina (ou não chega a ser agendado),
+    ex.: para liberar a vaga de concorrência do usuário.
+    Levanta JobQueueFullError se não houver vaga na fila.
+    """
+    executor = _get_executor()
+    if not job_slots.acquire(blocking=False):
+        if on_finish:
+            on_finish()
+        raise JobQueueFullError("A fila de geração está cheia. Tente novamente em instantes.")
+
+    try:
+        job = GenerationJob(id=str(uuid.uuid4()), user_id=user_id, prompt=prompt, status='pending')
+        db.session.add(job)
+        db.session.commit()
+        app = current_app._get_current_object()
+        executor.submit(_run_job, app, job.id, client_sid, bypass_cache, on_finish)
+    except Exception:
+        job_slots.release()
+        if on_finish:
+            on_finish()
+        raise
+    return job
+
+
+def _run_job(app, job_id, client_sid, bypass_cache, on_finish=None):
+    """Executa um job dentro do contexto do app (roda em uma thread do pool)."""
+    try:
+        with app.app_context():
+            try:
+                _execute_job(job_id, client_sid, bypass_cache)
+            except Exception as e:
+                # Qualquer falha (inclusive ao marcar 'running' ou ao gravar o resultado) encerra o job
+                db.session.rollback()
+                current_app.logger.error(f"Erro no job de geração {job_id}: {e}")
+                _mark_failed(job_id, str(e))
+                if client_sid:
+                    socketio.emit('generated_content_error', {'error': "Falha ao gerar conteúdo.", 'details': str(e), 'job_id': job_id}, room=client_sid)
+            finally:
+                db.session.remove()
+    finally:
+        job_slots.release()
+        if on_finish:
+            on_finish()
+
+
+def _execute_job(job_id, client_sid, bypass_cache):
+    job = db.session.get(GenerationJob, job_id)
+    if job is None:
+        return
+    job.status = 'running'
+    job.started_at = datetime.utcnow()
+    db.session.commit()
+
+    def emit_frame(text):
+        socketio.emit('generated_content_chunk', {'chunk': text, 'job_id': job_id}, room=client_sid)
+
+    coalescer = create_chunk_coalescer(emit_frame) if client_sid else None
+    full_generated_text, _ = generate_text(
+        job.prompt,
+        on_chunk=coalescer.add if coalescer else None,
+        bypass_cache=bypass_cache
+    )
+    if coalescer:
+        coalescer.close()
+
+    history_entry = GenerationHistory(
+        user_id=job.user_id,
+        prompt=job.prompt,
+        generated_content=full_generated_text
+    )
+    db.session.add(history_entry)
+    db.session.flush()
+
+    job.status = 'completed'
+    job.history_id = history_entry.id
+    job.finished_at = datetime.utcnow()
+    with timed_history_commit('job'):
+        db.session.commit()
+
+    if client_sid:
+        socketio.emit('generated_content_complete', {'full_content': full_generated_text, 'job_id': job_id}, room=client_sid)
+
+
+def _mark_failed(job_id, error):
+    """Marca o job como falho; se nem isso for possível, o reconcile_stale_jobs o encerra depois."""
+    try:
+        GenerationJob.query.filter(
+            GenerationJob.id == job_id, GenerationJob.status.in_(ACTIVE_STATUSES)
+        ).update({'status': 'failed', 'error': error, 'finished_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Não foi possível marcar o job {job_id} como falho: {e}")
+
+
+def reconcile_stale_jobs(max_age=None, retention=None):
+    """
+    Marca como falhos os jobs 'pending'/'running' parados há mais de
+    GENERATION_JOB_STALE_AFTER segundos (ex.: o worker que os executava
+    reiniciou). Usa um prazo em vez de encerrar todos os jobs ativos porque
+    os outros workers do gunicorn podem estar executando os seus.
+    Também remove os jobs terminados há mais de GENERATION_JOB_RETENTION
+    segundos (o texto continua no histórico).
+    Retorna (jobs encerrados, jobs removidos).
+    """
+    config = current_app.config
+    if max_age is None:
+        max_age = config.get('GENERATION_JOB_STALE_AFTER', 900)
+    if retention is None:
+        retention = config.get('GENERATION_JOB_RETENTION', 86400)
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=max_age)
+    stale = db.or_(
+        db.and_(GenerationJob.status == 'pending', GenerationJob.created_at < cutoff),
+        db.and_(GenerationJob.status == 'running', GenerationJob.started_at < cutoff),
+    )
+    failed = GenerationJob.query.filter(stale).update({
+        'status': 'failed',
+        'error': "Job interrompido antes de terminar (worker reiniciado ou travado).",
+        'finished_at': now,
+    }, synchronize_session=False)
+    pruned = GenerationJob.query.filter(
+        GenerationJob.status.in_(('completed', 'failed')),
+        GenerationJob.finished_at < now - timedelta(seconds=retention),
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return failed, pruned
+
+
+def init_job_queue(app):
+    """Encerra os jobs órfãos de execuções anteriores. Chamado por create_app()."""
+    with app.app_context():
+        try:
+            count, _ = reconcile_stale_jobs()
+        except SQLAlchemyError as e:
+            # Ex.: banco ainda sem a tabela generation_job (antes do `flask db upgrade`)
+            db.session.rollback()
+            app.logger.debug(f"Reconciliação de jobs ignorada: {e}")
+            return
+        finally:
+            db.session.remove()
+        if count:
+            app.logger.warning(f"{count} jobs de geração órfãos marcados como falhos.")
+
+
+def serialize_job(job):
+    # Datas vão como datetime: o provider JSON (app/json_provider.py) as formata
+    return {
+        'id': job.id,
+        'status': job.status,
+        'prompt': job.prompt,
+        'result': job.history.generated_content if job.history is not None else None,
+        'error': job.error,
+        'history_id': job.history_id,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
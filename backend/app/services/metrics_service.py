@@ -0,0 +1,143 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+)
+from prometheus_client import multiprocess
+
+# --- Métricas de Geração (formato Prometheus) ---
+#
+# Com vários workers do gunicorn, defina PROMETHEUS_MULTIPROC_DIR (o
+# `gunicorn.conf.py` já faz isso): cada processo grava suas métricas em
+# arquivos nesse diretório e o endpoint /metrics agrega todos eles.
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+THROUGHPUT_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+DB_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+time_to_first_chunk = Histogram(
+    'generation_time_to_first_chunk_seconds',
+    'Tempo até o primeiro trecho da geração.',
+    ['source'], buckets=LATENCY_BUCKETS,
+)
+generation_duration = Histogram(
+    'generation_duration_seconds',
+    'Tempo total da geração (do início ao último trecho).',
+    ['source'], buckets=LATENCY_BUCKETS,
+)
+generation_chars_per_second = Histogram(
+    'generation_chars_per_second',
+    'Vazão de caracteres por stream.',
+    ['source'], buckets=THROUGHPUT_BUCKETS,
+)
+generation_chunks = Counter(
+    'generation_chunks_total',
+    'Trechos recebidos do pipeline de geração.',
+    ['source'],
+)
+generation_chars = Counter(
+    'generation_chars_total',
+    'Caracteres gerados.',
+    ['source'],
+)
+generations = Counter(
+    'generation_requests_total',
+    'Gerações concluídas, por origem (model, cache, singleflight).',
+    ['source'],
+)
+upstream_errors = Counter(
+    'generation_upstream_errors_total',
+    'Erros vindos do provedor de IA.',
+    ['provider'],
+)
+socket_emit_duration = Histogram(
+    'generation_socket_emit_seconds',
+    'Tempo gasto enviando cada frame ao cliente (camada de socket).',
+    buckets=DB_BUCKETS,
+)
+rate_limit_decisions = Counter(
+    'rate_limit_decisions_total',
+    'Decisões da limitação por usuário (allowed, limited_rate, limited_concurrency).',
+    ['result'],
+)
+response_cache_requests = Counter(
+    'response_cache_requests_total',
+    'Operações do cache de respostas (memory_hit, disk_hit, miss, store, bypass).',
+    ['result'],
+)
+singleflight_requests = Counter(
+    'generation_singleflight_requests_total',
+    'Gerações coalescidas, por papel (leader abre o stream; follower acompanha).',
+    ['role'],
+)
+history_commit_duration = Histogram(
+    'generation_history_commit_seconds',
+    'Latência do commit das entradas de histórico.',
+    ['endpoint'], buckets=DB_BUCKETS,
+)
+
+
+class StreamTimer:
+    """Mede um stream de geração: tempo até o primeiro trecho, duração e vazão."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_chunk_at = None
+        self.chunks = 0
+        self.chars = 0
+
+    def on_chunk(self, text):
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.perf_counter()
+        self.chunks += 1
+        self.chars += len(text)
+
+    def finish(self, source):
+        elapsed = time.perf_counter() - self.started
+        if self.first_chunk_at is not None:
+            time_to_first_chunk.labels(source).observe(self.first_chunk_at - self.started)
+        generation_duration.labels(source).observe(elapsed)
+        generation_chunks.labels(source).inc(self.chunks)
+        generation_chars.labels(source).inc(self.chars)
+        generations.labels(source).inc()
+        if elapsed > 0:
+            generation_chars_per_second.labels(source).observe(self.chars / elapsed)
+
+
+@contextmanager
+def timed_history_commit(endpoint):
+    """Mede a latência do commit do histórico para o endpoint informado."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        history_commit_duration.labels(endpoint).observe(time.perf_counter() - started)
+
+
+def _collecting_registry():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics():
+    """Retorna (corpo, content-type) com as métricas agregadas de todos os workers."""
+    return generate_latest(_collecting_registry()), CONTENT_TYPE_LATEST
+
+
+def get_counter_totals(counter, label):
+    """
+    Soma um Counter por valor do rótulo `label`, agregando todos os workers
+    (mesma fonte do /metrics). Usado pelos endpoints de estatísticas.
+    """
+    sample_name = counter.describe()[0].name + '_total'
+    totals = {}
+    for metric in _collecting_registry().collect():
+        for sample in metric.samples:
+            if sample.name == sample_name:
+                key = sample.labels[label]
+                totals[key] = totals.get(key, 0) + int(sample.value)
+    return totals
@@ -0,0 +1,100 @@
+import time
+import bcrypt as bcrypt_lib
+import click
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# --- Hash de Senhas ---
+#
+# A derivação de chave (scrypt/pbkdf2/bcrypt) é propositalmente cara. Ela roda
+# na thread da requisição: hashlib.scrypt/pbkdf2_hmac e o bcrypt liberam a GIL
+# durante o cálculo, então as threads do gunicorn já a executam em paralelo
+# nos núcleos disponíveis. O custo é controlado pelo método configurado.
+#
+# PASSWORD_HASH_METHOD segue o formato do werkzeug ("scrypt:32768:8:1",
+# "pbkdf2:sha256:600000") ou "bcrypt:<rounds>". Hashes gravados com outros
+# parâmetros continuam válidos e são refeitos no próximo login bem-sucedido.
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+password_hash_stats = {'hashed': 0, 'verified': 0, 'rehashed': 0}
+
+
+def _hash(password, method):
+    if method.startswith('bcrypt'):
+        rounds = int(method.split(':')[1]) if ':' in method else 12
+        # bcrypt considera apenas os primeiros 72 bytes
+        return bcrypt_lib.hashpw(password.encode('utf-8')[:72], bcrypt_lib.gensalt(rounds)).decode('ascii')
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash, password):
+    if password_hash.startswith('$2'):
+        try:
+            return bcrypt_lib.checkpw(password.encode('utf-8')[:72], password_hash.encode('ascii'))
+        except ValueError:
+            return False
+    return check_password_hash(password_hash, password)
+
+
+def get_hash_method():
+    return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD) if has_app_context() else DEFAULT_METHOD
+
+
+def hash_password(password, method=None):
+    """Gera o hash da senha com o método configurado."""
+    password_hash_stats['hashed'] += 1
+    return _hash(password, method or get_hash_method())
+
+
+def verify_password(password_hash, password):
+    """Confere a senha contra o hash gravado (qualquer método suportado)."""
+    if not password_hash:
+        return False
+    password_hash_stats['verified'] += 1
+    return _verify(password_hash, password)
+
+
+def needs_rehash(password_hash, method=None):
+    """Indica se o hash foi gerado com algoritmo ou parâmetros diferentes dos configurados."""
+    method = method or get_hash_method()
+    if method.startswith('bcrypt'):
+        if not password_hash.startswith('$2'):
+            return True
+        rounds = int(method.split(':')[1]) if ':' in method else 12
+        return int(password_hash.split('$')[2]) != rounds
+    # Formato do werkzeug: "<método>:<parâmetros>$<salt>$<hash>"; "scrypt" aceita quaisquer parâmetros
+    stored_method = password_hash.split('$', 1)[0]
+    return stored_method != method and not stored_method.startswith(method + ':')
+
+
+def record_rehash():
+    password_hash_stats['rehashed'] += 1
+
+
+def get_password_hash_stats():
+    stats = dict(password_hash_stats)
+    stats['method'] = get_hash_method()
+    return stats
+
+
+@click.command('password-benchmark')
+@click.option('--method', 'methods', multiple=True,
+              help='Método a medir (repetível). Padrão: o configurado e algumas alternativas.')
+@click.option('--iterations', default=20, show_default=True, help='Verificações por método.')
+def password_benchmark(methods, iterations):
+    """Mede logins/s por núcleo (verificações de senha sequenciais) para cada configuração."""
+    methods = methods or (get_hash_method(), 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'bcrypt:12', 'bcrypt:10')
+    click.echo(f"{'método':<24} {'ms/login':>10} {'logins/s/núcleo':>16}")
+    for method in dict.fromkeys(methods):
+        password_hash = _hash('benchmark-password', method)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            _verify(password_hash, 'benchmark-password')
+        elapsed = (time.perf_counter() - start) / iterations
+        click.echo(f"{method:<24} {elapsed * 1000:>10.1f} {1 / elapsed:>16.1f}")
+
+
+def init_password_hashing(app):
+    """Registra o comando de benchmark. Chamado por create_app()."""
+    app.cli.add_command(password_benchmark)
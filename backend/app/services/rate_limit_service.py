@@ -0,0 +1,303 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from functools import wraps
+from flask import current_app, g, jsonify
+from flask_jwt_extended import current_user
+from .metrics_service import get_counter_totals, rate_limit_decisions
+
+# --- Limitação de Taxa e de Concorrência ---
+#
+# Cada usuário tem um token bucket (requisições/segundo + rajada) e um limite
+# de streams simultâneos. Os limites vêm do papel do usuário (`admin`/`user`)
+# em `Config.RATE_LIMITS`, com sobrescritas por usuário em
+# `Config.RATE_LIMIT_USER_OVERRIDES`.
+# Backends: 'memory' (por processo) ou 'sqlite' (compartilhado entre workers).
+
+rate_limiter_instance = None
+RATE_LIMIT_RESULTS = ('allowed', 'limited_rate', 'limited_concurrency')
+
+
+def _incr(result):
+    rate_limit_decisions.labels(result).inc()
+
+
+class MemoryRateLimitBackend:
+    """Backend em memória (limites valem apenas dentro do processo)."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, burst, cost=1):
+        """Consome `cost` tokens. Retorna 0 se permitido ou os segundos até haver tokens suficientes."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return 0
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / rate if rate > 0 else 60
+
+    def acquire(self, key, limit, ttl):
+        """Reserva uma vaga de concorrência. Retorna o ID da reserva ou None."""
+        now = time.monotonic()
+        with self._lock:
+            leases = {lid: exp for lid, exp in self._leases.get(key, {}).items() if exp > now}
+            if len(leases) >= limit:
+                self._leases[key] = leases
+                return None
+            lease_id = uuid.uuid4().hex
+            leases[lease_id] = now + ttl
+            self._leases[key] = leases
+            return lease_id
+
+    def release(self, key, lease_id):
+        with self._lock:
+            self._leases.get(key, {}).pop(lease_id, None)
+
+
+class SQLiteRateLimitBackend:
+    """Backend em SQLite, compartilhado entre os workers do gunicorn."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+            " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_leases ("
+            " id TEXT PRIMARY KEY, key TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_leases_key ON rate_limit_leases (key)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key, rate, burst, cost=1):
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            retry_after = 0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                retry_after = (cost - tokens) / rate if rate > 0 else 60
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return retry_after
+
+    def acquire(self, key, limit, ttl):
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Reservas expiradas (ex.: worker que morreu) são descartadas
+            conn.execute("DELETE FROM rate_limit_leases WHERE key = ? AND expires_at < ?", (key, now))
+            (active,) = conn.execute(
+                "SELECT COUNT(*) FROM rate_limit_leases WHERE key = ?", (key,)
+            ).fetchone()
+            lease_id = None
+            if active < limit:
+                lease_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO rate_limit_leases (id, key, expires_at) VALUES (?, ?, ?)",
+                    (lease_id, key, now + ttl),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return lease_id
+
+    def release(self, key, lease_id):
+        self._connect().execute("DELETE FROM rate_limit_leases WHERE id = ?", (lease_id,))
+
+
+def get_rate_limiter():
+    """Retorna o backend de limitação configurado (um por processo)."""
+    global rate_limiter_instance
+    if rate_limiter_instance is None:
+        config = current_app.config
+        if config.get('RATE_LIMIT_BACKEND', 'memory') == 'sqlite':
+            path = config['RATE_LIMIT_SQLITE_PATH']
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            rate_limiter_instance = SQLiteRateLimitBackend(path)
+        else:
+            rate_limiter_instance = MemoryRateLimitBackend()
+    return rate_limiter_instance
+
+
+def reset_rate_limiter():
+    """Descarta o backend atual (usado em testes)."""
+    global rate_limiter_instance
+    rate_limiter_instance = None
+
+
+def get_limits_for(user):
+    """Resolve os limites do usuário: sobrescrita individual > papel."""
+    config = current_app.config
+    role = 'admin' if user is not None and user.is_admin else 'user'
+    limits = dict(config['RATE_LIMITS'][role])
+    if user is not None:
+        limits.update(config.get('RATE_LIMIT_USER_OVERRIDES', {}).get(user.id, {}))
+    return limits
+
+
+def get_rate_limit_stats():
+    """Decisões de limitação somadas entre todos os workers (Counter do Prometheus)."""
+    totals = get_counter_totals(rate_limit_decisions, 'result')
+    return {result: totals.get(result, 0) for result in RATE_LIMIT_RESULTS}
+
+
+def _too_many_requests(message, retry_after):
+    response = jsonify({"message": message, "retry_after": retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+class _LeaseSet:
+    """Vagas de concorrência reservadas por uma requisição."""
+
+    def __init__(self, limiter, key):
+        self.limiter = limiter
+        self.key = key
+        self.lease_ids = []
+        self.detached = False
+        self._lock = threading.Lock()
+
+    def add(self, lease_id):
+        self.lease_ids.append(lease_id)
+
+    def release(self):
+        with self._lock:
+            lease_ids, self.lease_ids = self.lease_ids, []
+        for lease_id in lease_ids:
+            self.limiter.release(self.key, lease_id)
+
+
+def reserve_concurrency(count):
+    """
+    Reserva até `count` vagas extras para a requisição atual (ex.: itens de um
+    lote gerados em paralelo), liberadas junto com a vaga principal.
+    Retorna quantas foram concedidas; sem limitação ativa, concede todas.
+    """
+    leases = g.get('rate_limit_leases')
+    if leases is None:
+        return count
+    ttl = current_app.config.get('RATE_LIMIT_LEASE_TTL', 300)
+    limit = get_limits_for(current_user)['max_concurrent']
+    granted = 0
+    while granted < count:
+        lease_id = leases.limiter.acquire(leases.key, limit, ttl)
+        if lease_id is None:
+            break
+        leases.add(lease_id)
+        granted += 1
+    return granted
+
+
+def detach_concurrency_leases():
+    """
+    Transfere as vagas da requisição atual para quem chamar: o decorador não as
+    libera mais ao fim da resposta. Retorna a função que as libera (ex.: ao fim
+    de um job em background). Sem limitação ativa, retorna uma função vazia.
+    """
+    leases = g.get('rate_limit_leases')
+    if leases is None:
+        return lambda: None
+    leases.detached = True
+    return leases.release
+
+
+def rate_limited(scope, concurrent=True, cost=None):
+    """
+    Decorador para rotas protegidas por JWT (aplicar abaixo de @jwt_required).
+    Aplica o token bucket e, se `concurrent`, o limite de streams simultâneos.
+    `cost` é uma função sem argumentos que calcula, a partir da requisição,
+    quantos tokens ela consome (padrão: 1).
+    Em respostas em streaming a vaga só é liberada quando o stream termina;
+    trabalho em background assume a vaga com detach_concurrency_leases().
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('RATE_LIMIT_ENABLED', True):
+                return view(*args, **kwargs)
+
+            # Principal já resolvido pelo user_lookup_loader (ver auth_service)
+            user = current_user
+            user_id = user.id
+            limits = get_limits_for(user)
+            limiter = get_rate_limiter()
+            key = f"{scope}:{user_id}"
+
+            tokens = cost() if cost else 1
+            if tokens > limits['burst']:
+                # Nunca caberia no bucket: esperar não adianta
+                _incr('limited_rate')
+                return _too_many_requests(
+                    f"A requisição consome {tokens} unidades; o limite por rajada é {limits['burst']}.",
+                    max(1, math.ceil(limits['burst'] / limits['rate'])) if limits['rate'] > 0 else 60,
+                )
+            retry_after = limiter.consume(key, limits['rate'], limits['burst'], tokens)
+            if retry_after > 0:
+                _incr('limited_rate')
+                return _too_many_requests(
+                    "Muitas requisições. Tente novamente em instantes.", max(1, math.ceil(retry_after))
+                )
+
+            if not concurrent:
+                _incr('allowed')
+                return view(*args, **kwargs)
+
+            ttl = current_app.config.get('RATE_LIMIT_LEASE_TTL', 300)
+            lease_id = limiter.acquire(key, limits['max_concurrent'], ttl)
+            if lease_id is None:
+                _incr('limited_concurrency')
+                return _too_many_requests("Limite de gerações simultâneas atingido.", 1)
+
+            _incr('allowed')
+            g.rate_limit_leases = leases = _LeaseSet(limiter, key)
+            leases.add(lease_id)
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except Exception:
+                leases.release()
+                raise
+
+            if response.is_streamed:
+                response.call_on_close(leases.release)
+            elif not leases.detached:
+                leases.release()
+            return response
+        return wrapper
+    return decorator
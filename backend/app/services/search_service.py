@@ -0,0 +1,177 @@
+import re
+from sqlalchemy import DDL, event, text
+from .. import db
+from ..models import GenerationHistory, Content
+
+# --- Busca Textual (Full-Text Search) ---
+#
+# SQLite: tabelas virtuais FTS5 em modo "external content", mantidas por
+# triggers de INSERT/UPDATE/DELETE (manutenção incremental do índice).
+# PostgreSQL: índices GIN sobre expressões to_tsvector, atualizados pelo
+# próprio banco a cada escrita.
+# As mesmas estruturas são criadas pela migração 0004 e, via eventos de
+# DDL abaixo, por db.create_all() (usado nos testes).
+# O histórico pode estar comprimido (ver app/compression.py): no SQLite o
+# índice usa como conteúdo a view `generation_history_search`, que expõe o
+# texto original via zlib_text().
+
+SQLITE_HISTORY_TEXT = "coalesce({row}.generated_content, zlib_text({row}.generated_content_z))"
+
+SQLITE_HISTORY_FTS_DDL = [
+    "CREATE VIEW IF NOT EXISTS generation_history_search AS"
+    " SELECT id, prompt, " + SQLITE_HISTORY_TEXT.format(row='generation_history') + " AS generated_content"
+    " FROM generation_history",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS generation_history_fts USING fts5("
+    " prompt, generated_content, content='generation_history_search', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_ai AFTER INSERT ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(rowid, prompt, generated_content)"
+    " VALUES (new.id, new.prompt, " + SQLITE_HISTORY_TEXT.format(row='new') + "); END",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_ad AFTER DELETE ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(generation_history_fts, rowid, prompt, generated_content)"
+    " VALUES ('delete', old.id, old.prompt, " + SQLITE_HISTORY_TEXT.format(row='old') + "); END",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_au"
+    " AFTER UPDATE OF prompt, generated_content, generated_content_z ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(generation_history_fts, rowid, prompt, generated_content)"
+    " VALUES ('delete', old.id, old.prompt, " + SQLITE_HISTORY_TEXT.format(row='old') + ");"
+    " INSERT INTO generation_history_fts(rowid, prompt, generated_content)"
+    " VALUES (new.id, new.prompt, " + SQLITE_HISTORY_TEXT.format(row='new') + "); END",
+]
+
+SQLITE_CONTENT_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5("
+    " title, body, content='content', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS content_fts_ai AFTER INSERT ON content BEGIN"
+    " INSERT INTO content_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS content_fts_ad AFTER DELETE ON content BEGIN"
+    " INSERT INTO content_fts(content_fts, rowid, title, body)"
+    " VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS content_fts_au AFTER UPDATE ON content BEGIN"
+    " INSERT INTO content_fts(content_fts, rowid, title, body)"
+    " VALUES ('delete', old.id, old.title, old.body);"
+    " INSERT INTO content_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+]
+
+POSTGRES_TS_CONFIG = 'portuguese'
+POSTGRES_HISTORY_VECTOR = (
+    f"to_tsvector('{POSTGRES_TS_CONFIG}', coalesce(generation_history.prompt, '') || ' ' || "
+    "coalesce(generation_history.generated_content, ''))"
+)
+POSTGRES_CONTENT_VECTOR = (
+    f"to_tsvector('{POSTGRES_TS_CONFIG}', coalesce(content.title, '') || ' ' || "
+    "coalesce(content.body, ''))"
+)
+POSTGRES_FTS_DDL = {
+    'generation_history': f"CREATE INDEX IF NOT EXISTS ix_generation_history_fts "
+                          f"ON generation_history USING GIN ({POSTGRES_HISTORY_VECTOR})",
+    'content': f"CREATE INDEX IF NOT EXISTS ix_content_fts ON content USING GIN ({POSTGRES_CONTENT_VECTOR})",
+}
+
+
+def _register_ddl(table, sqlite_statements, drop_statements, postgres_statement):
+    for statement in sqlite_statements:
+        event.listen(table, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    for statement in drop_statements:
+        event.listen(table, 'before_drop', DDL(statement).execute_if(dialect='sqlite'))
+    event.listen(table, 'after_create', DDL(postgres_statement).execute_if(dialect='postgresql'))
+
+
+_register_ddl(GenerationHistory.__table__, SQLITE_HISTORY_FTS_DDL,
+              ["DROP TABLE IF EXISTS generation_history_fts", "DROP VIEW IF EXISTS generation_history_search"],
+              POSTGRES_FTS_DDL['generation_history'])
+_register_ddl(Content.__table__, SQLITE_CONTENT_FTS_DDL, ["DROP TABLE IF EXISTS content_fts"],
+              POSTGRES_FTS_DDL['content'])
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _fts5_query(terms):
+    """Converte a busca do usuário em uma consulta FTS5 segura (termos com prefixo, AND implícito)."""
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _search_sqlite(kind, user_id, terms, limit):
+    match = _fts5_query(terms)
+    if kind == 'history':
+        sql = text(
+            "SELECT h.id AS id, h.prompt AS title, NULL AS collection_id, h.timestamp AS created_at,"
+            " snippet(generation_history_fts, 1, '<mark>', '</mark>', '…', 16) AS snippet,"
+            " bm25(generation_history_fts) AS score"
+            " FROM generation_history_fts"
+            " JOIN generation_history h ON h.id = generation_history_fts.rowid"
+            " WHERE generation_history_fts MATCH :match AND h.user_id = :user_id"
+            " ORDER BY score LIMIT :limit"
+        )
+    else:
+        sql = text(
+            "SELECT c.id AS id, c.title AS title, c.collection_id AS collection_id, c.created_at AS created_at,"
+            " snippet(content_fts, 1, '<mark>', '</mark>', '…', 16) AS snippet,"
+            " bm25(content_fts) AS score"
+            " FROM content_fts"
+            " JOIN content c ON c.id = content_fts.rowid"
+            " JOIN collection col ON col.id = c.collection_id"
+            " WHERE content_fts MATCH :match AND col.user_id = :user_id"
+            " ORDER BY score LIMIT :limit"
+        )
+    rows = db.session.execute(sql, {'match': match, 'user_id': user_id, 'limit': limit}).mappings().all()
+    # bm25 retorna valores menores para resultados melhores; invertemos para "maior é melhor"
+    return [dict(row, score=-row['score']) for row in rows]
+
+
+def _search_postgres(kind, user_id, terms, limit):
+    tsquery = " & ".join(f"{term}:*" for term in terms)
+    if kind == 'history':
+        vector = POSTGRES_HISTORY_VECTOR
+        sql = text(
+            f"SELECT generation_history.id AS id, generation_history.prompt AS title,"
+            f" NULL AS collection_id, generation_history.timestamp AS created_at,"
+            f" ts_headline('{POSTGRES_TS_CONFIG}', generation_history.generated_content, q,"
+            f" 'StartSel=<mark>, StopSel=</mark>, MaxFragments=1') AS snippet,"
+            f" ts_rank({vector}, q) AS score"
+            f" FROM generation_history, to_tsquery('{POSTGRES_TS_CONFIG}', :tsquery) q"
+            f" WHERE {vector} @@ q AND generation_history.user_id = :user_id"
+            f" ORDER BY score DESC LIMIT :limit"
+        )
+    else:
+        vector = POSTGRES_CONTENT_VECTOR
+        sql = text(
+            f"SELECT content.id AS id, content.title AS title, content.collection_id AS collection_id,"
+            f" content.created_at AS created_at,"
+            f" ts_headline('{POSTGRES_TS_CONFIG}', content.body, q,"
+            f" 'StartSel=<mark>, StopSel=</mark>, MaxFragments=1') AS snippet,"
+            f" ts_rank({vector}, q) AS score"
+            f" FROM content JOIN collection ON collection.id = content.collection_id,"
+            f" to_tsquery('{POSTGRES_TS_CONFIG}', :tsquery) q"
+            f" WHERE {vector} @@ q AND collection.user_id = :user_id"
+            f" ORDER BY score DESC LIMIT :limit"
+        )
+    rows = db.session.execute(sql, {'tsquery': tsquery, 'user_id': user_id, 'limit': limit}).mappings().all()
+    return [dict(row) for row in rows]
+
+
+def search(user_id, query, kinds=('history', 'content'), page=1, per_page=20):
+    """
+    Busca no histórico e/ou nos conteúdos do usuário, ordenando por relevância.
+    Retorna (resultados_da_página, há_próxima_página).
+    """
+    terms = _TOKEN_RE.findall(query.lower())
+    if not terms:
+        return [], False
+
+    dialect = db.engine.dialect.name
+    backend = _search_postgres if dialect == 'postgresql' else _search_sqlite
+    # Busca o suficiente de cada fonte para montar a página (+1 para saber se há próxima)
+    window = page * per_page + 1
+
+    results = []
+    for kind in kinds:
+        for row in backend(kind, user_id, terms, window):
+            row['type'] = kind
+            results.append(row)
+
+    results.sort(key=lambda r: r['score'], reverse=True)
+    start = (page - 1) * per_page
+    page_results = results[start:start + per_page]
+    return page_results, len(results) > start + per_page
@@ -0,0 +1,152 @@
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from typing import NamedTuple
+from flask import abort, current_app, request
+from werkzeug.http import is_resource_modified
+from werkzeug.wsgi import wrap_file
+from .http_compression import ENCODING_EXTENSIONS, negotiate_encoding
+
+# --- Arquivos do Frontend (SPA) ---
+#
+# O build do React é indexado uma única vez, ao iniciar o worker, em um
+# manifesto caminho -> (tamanho, mtime, hash, content-type). As requisições
+# consultam apenas o manifesto: nenhum os.stat/exists por requisição, e os
+# 304 saem sem abrir arquivo. Arquivos com hash no nome (ex.: main.3f2a9c1b.js)
+# são imutáveis e podem ficar em cache por um ano; os demais (index.html,
+# manifest.json) são revalidados pela ETag. O index.html fica em memória.
+# Após um novo build, reinicie os workers (ou chame reset_static_manifest()).
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+INDEX_FILE = 'index.html'
+
+static_manifest_instance = None
+_manifest_lock = threading.Lock()
+
+
+class StaticAsset(NamedTuple):
+    path: str  # caminho absoluto do arquivo
+    size: int
+    mtime: datetime
+    etag: str
+    mimetype: str
+    immutable: bool
+    data: bytes = None  # mantido em memória (index.html)
+
+
+class StaticManifest:
+    """Índice em memória do build do frontend, incluindo os irmãos .br/.gz."""
+
+    def __init__(self, directory, hashed_pattern, memory_files=(INDEX_FILE,)):
+        self.directory = directory
+        self.assets = {}  # (caminho relativo, codificação ou None) -> StaticAsset
+        if directory and os.path.isdir(directory):
+            self._scan(re.compile(hashed_pattern), set(memory_files))
+
+    def _scan(self, hashed_re, memory_files):
+        suffixes = {ext: enc for enc, ext in ENCODING_EXTENSIONS.items()}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                rel_path = os.path.relpath(full_path, self.directory).replace(os.sep, '/')
+                base, ext = os.path.splitext(rel_path)
+                encoding = suffixes.get(ext)
+                original = base if encoding else rel_path
+
+                with open(full_path, 'rb') as f:
+                    data = f.read()
+                stat = os.stat(full_path)
+                digest = hashlib.sha1(data).hexdigest()
+                self.assets[(original, encoding)] = StaticAsset(
+                    path=full_path,
+                    size=stat.st_size,
+                    mtime=datetime.fromtimestamp(int(stat.st_mtime), timezone.utc),
+                    etag=f'{digest}-{encoding}' if encoding else digest,
+                    mimetype=mimetypes.guess_type(original)[0] or 'application/octet-stream',
+                    immutable=bool(hashed_re.search(original)),
+                    data=data if original in memory_files else None,
+                )
+
+    def __len__(self):
+        return sum(1 for (_, encoding) in self.assets if encoding is None)
+
+    def lookup(self, rel_path):
+        """Retorna (StaticAsset, codificação) da melhor variante aceita pelo cliente, ou (None, None)."""
+        if (rel_path, None) not in self.assets:
+            return None, None
+        encodings = [enc for enc in ENCODING_EXTENSIONS if (rel_path, enc) in self.assets]
+        encoding = negotiate_encoding(encodings) if encodings else None
+        return self.assets[(rel_path, encoding)], encoding
+
+    def has_variants(self, rel_path):
+        return any((rel_path, enc) in self.assets for enc in ENCODING_EXTENSIONS)
+
+
+def build_static_manifest(app):
+    config = app.config
+    manifest = StaticManifest(app.static_folder, config['FRONTEND_HASHED_ASSET_PATTERN'])
+    if len(manifest):
+        app.logger.info(f"Manifesto do frontend: {len(manifest)} arquivos em {app.static_folder}.")
+    else:
+        app.logger.info(f"Build do frontend não encontrado em {app.static_folder}; apenas a API será servida.")
+    return manifest
+
+
+def get_static_manifest():
+    global static_manifest_instance
+    if static_manifest_instance is None:
+        with _manifest_lock:
+            if static_manifest_instance is None:
+                static_manifest_instance = build_static_manifest(current_app)
+    return static_manifest_instance
+
+
+def reset_static_manifest():
+    """Descarta o manifesto atual (usado em testes e após um novo build)."""
+    global static_manifest_instance
+    static_manifest_instance = None
+
+
+def serve_frontend(path):
+    """Serve um arquivo do build ou, para rotas do SPA, o index.html."""
+    manifest = get_static_manifest()
+    asset, encoding = manifest.lookup(path) if path else (None, None)
+    if asset is None:
+        path = INDEX_FILE
+        asset, encoding = manifest.lookup(INDEX_FILE)
+        if asset is None:
+            abort(404)
+
+    # Revalidação: responde 304 sem abrir o arquivo
+    if not is_resource_modified(request.environ, etag=asset.etag, last_modified=asset.mtime):
+        response = current_app.response_class(status=304)
+    elif asset.data is not None:
+        response = current_app.response_class(asset.data, mimetype=asset.mimetype)
+    else:
+        response = current_app.response_class(
+            wrap_file(request.environ, open(asset.path, 'rb')),
+            mimetype=asset.mimetype, direct_passthrough=True,
+        )
+        response.content_length = asset.size
+
+    if encoding and response.status_code != 304:
+        response.headers['Content-Encoding'] = encoding
+    if manifest.has_variants(path):
+        response.vary.add('Accept-Encoding')
+    response.set_etag(asset.etag)
+    response.last_modified = asset.mtime
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if asset.immutable else REVALIDATE_CACHE_CONTROL
+    if response.status_code == 304:
+        return response
+    return response.make_conditional(request, accept_ranges=True, complete_length=asset.size)
+
+
+def init_static_assets(app):
+    """Aponta static_folder para o build do frontend e o indexa. Chamado por create_app()."""
+    global static_manifest_instance
+    app.static_folder = app.config['FRONTEND_BUILD_DIR']
+    static_manifest_instance = build_static_manifest(app)
@@ -0,0 +1,24 @@
+import os
+import shutil
+import tempfile
+
+# Configuração do Gunicorn (carregada automaticamente a partir de backend/).
+# Habilita o modo multiprocesso do prometheus_client para que /metrics
+# agregue as métricas de todos os workers.
+
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'helpubliai-prometheus')
+)
+
+
+def on_starting(server):
+    # Remove métricas de execuções anteriores
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
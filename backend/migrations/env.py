@@ -6,7 +6,7 @@ from flask import current_app
 
 # Import db and models for manual metadata setting
 from app import db
-from app.models import User, Collection, Content, GenerationHistory, PasswordResetToken
+from app.models import User, Collection, Content, GenerationHistory, GenerationHistoryArchive, GenerationJob, PasswordResetToken
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -54,6 +54,14 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # Tabelas FTS5 (e suas tabelas-sombra) e índices GIN de busca textual são
+    # gerenciados manualmente pela migração 0004; o autogenerate os ignora.
+    if reflected and compare_to is None and name and '_fts' in name:
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -68,7 +76,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -96,10 +105,18 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        if connection.dialect.name == 'sqlite':
+            # O batch mode recria tabelas (DROP + RENAME); com as FKs ativas o DROP
+            # dispararia ON DELETE CASCADE nas tabelas filhas.
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            # Encerra a transação aberta pelo PRAGMA para o Alembic gerenciar a sua
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
@@ -0,0 +1,52 @@
+"""add composite indexes for hot query paths
+
+Revision ID: 0003_add_hot_path_indexes
+Revises: 0002_add_generation_job
+Create Date: 2025-09-22 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_add_hot_path_indexes'
+down_revision = '0002_add_generation_job'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('collection', schema=None) as batch_op:
+        batch_op.create_index('ix_collection_user_id_created_at', ['user_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('content', schema=None) as batch_op:
+        batch_op.create_index('ix_content_collection_id_created_at', ['collection_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('generation_history', schema=None) as batch_op:
+        batch_op.create_index('ix_generation_history_user_id_timestamp_id', ['user_id', 'timestamp', 'id'], unique=False)
+
+    with op.batch_alter_table('generation_job', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_generation_job_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('password_reset_token', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_password_reset_token_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_password_reset_token_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('password_reset_token', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_password_reset_token_user_id'))
+        batch_op.drop_index(batch_op.f('ix_password_reset_token_expires_at'))
+
+    with op.batch_alter_table('generation_job', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_generation_job_user_id'))
+
+    with op.batch_alter_table('generation_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_generation_history_user_id_timestamp_id')
+
+    with op.batch_alter_table('content', schema=None) as batch_op:
+        batch_op.drop_index('ix_content_collection_id_created_at')
+
+    with op.batch_alter_table('collection', schema=None) as batch_op:
+        batch_op.drop_index('ix_collection_user_id_created_at')
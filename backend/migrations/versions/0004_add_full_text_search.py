@@ -0,0 +1,87 @@
+"""add full-text search indexes
+
+Revision ID: 0004_add_full_text_search
+Revises: 0003_add_hot_path_indexes
+Create Date: 2025-09-29 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_add_full_text_search'
+down_revision = '0003_add_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+# Cópia das definições de app/services/search_service.py no momento desta
+# migração (migrações não devem depender do código atual da aplicação).
+SQLITE_STATEMENTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS generation_history_fts USING fts5("
+    " prompt, generated_content, content='generation_history', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_ai AFTER INSERT ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(rowid, prompt, generated_content)"
+    " VALUES (new.id, new.prompt, new.generated_content); END",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_ad AFTER DELETE ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(generation_history_fts, rowid, prompt, generated_content)"
+    " VALUES ('delete', old.id, old.prompt, old.generated_content); END",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_au AFTER UPDATE ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(generation_history_fts, rowid, prompt, generated_content)"
+    " VALUES ('delete', old.id, old.prompt, old.generated_content);"
+    " INSERT INTO generation_history_fts(rowid, prompt, generated_content)"
+    " VALUES (new.id, new.prompt, new.generated_content); END",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5("
+    " title, body, content='content', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS content_fts_ai AFTER INSERT ON content BEGIN"
+    " INSERT INTO content_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS content_fts_ad AFTER DELETE ON content BEGIN"
+    " INSERT INTO content_fts(content_fts, rowid, title, body)"
+    " VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS content_fts_au AFTER UPDATE ON content BEGIN"
+    " INSERT INTO content_fts(content_fts, rowid, title, body)"
+    " VALUES ('delete', old.id, old.title, old.body);"
+    " INSERT INTO content_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    # Indexa as linhas já existentes
+    "INSERT INTO generation_history_fts(generation_history_fts) VALUES ('rebuild')",
+    "INSERT INTO content_fts(content_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS content_fts_au",
+    "DROP TRIGGER IF EXISTS content_fts_ad",
+    "DROP TRIGGER IF EXISTS content_fts_ai",
+    "DROP TABLE IF EXISTS content_fts",
+    "DROP TRIGGER IF EXISTS generation_history_fts_au",
+    "DROP TRIGGER IF EXISTS generation_history_fts_ad",
+    "DROP TRIGGER IF EXISTS generation_history_fts_ai",
+    "DROP TABLE IF EXISTS generation_history_fts",
+]
+
+POSTGRES_STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS ix_generation_history_fts ON generation_history USING GIN ("
+    "to_tsvector('portuguese', coalesce(generation_history.prompt, '') || ' ' || "
+    "coalesce(generation_history.generated_content, '')))",
+    "CREATE INDEX IF NOT EXISTS ix_content_fts ON content USING GIN ("
+    "to_tsvector('portuguese', coalesce(content.title, '') || ' ' || coalesce(content.body, '')))",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_content_fts",
+    "DROP INDEX IF EXISTS ix_generation_history_fts",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    statements = {'sqlite': SQLITE_STATEMENTS, 'postgresql': POSTGRES_STATEMENTS}.get(dialect, [])
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    statements = {'sqlite': SQLITE_DOWNGRADE, 'postgresql': POSTGRES_DOWNGRADE}.get(dialect, [])
+    for statement in statements:
+        op.execute(statement)
@@ -0,0 +1,153 @@
+"""compress generation history text and add archive table
+
+Revision ID: 0005_compress_and_archive_history
+Revises: 0004_add_full_text_search
+Create Date: 2025-10-06 12:00:00.000000
+
+"""
+import zlib
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_compress_and_archive_history'
+down_revision = '0004_add_full_text_search'
+branch_labels = None
+depends_on = None
+
+# Os textos existentes são comprimidos depois, em lotes, pela manutenção do
+# histórico (app/services/history_service.py). Aqui só mudamos o esquema e
+# preenchemos a prévia.
+PREVIEW_LENGTH = 200
+
+SQLITE_HISTORY_TEXT = "coalesce({row}.generated_content, zlib_text({row}.generated_content_z))"
+
+SQLITE_DROP_FTS = [
+    "DROP TRIGGER IF EXISTS generation_history_fts_au",
+    "DROP TRIGGER IF EXISTS generation_history_fts_ad",
+    "DROP TRIGGER IF EXISTS generation_history_fts_ai",
+    "DROP TABLE IF EXISTS generation_history_fts",
+    "DROP VIEW IF EXISTS generation_history_search",
+]
+
+# O índice passa a ler o texto por uma view que descomprime via zlib_text()
+SQLITE_CREATE_FTS = [
+    "CREATE VIEW IF NOT EXISTS generation_history_search AS"
+    " SELECT id, prompt, " + SQLITE_HISTORY_TEXT.format(row='generation_history') + " AS generated_content"
+    " FROM generation_history",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS generation_history_fts USING fts5("
+    " prompt, generated_content, content='generation_history_search', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_ai AFTER INSERT ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(rowid, prompt, generated_content)"
+    " VALUES (new.id, new.prompt, " + SQLITE_HISTORY_TEXT.format(row='new') + "); END",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_ad AFTER DELETE ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(generation_history_fts, rowid, prompt, generated_content)"
+    " VALUES ('delete', old.id, old.prompt, " + SQLITE_HISTORY_TEXT.format(row='old') + "); END",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_au"
+    " AFTER UPDATE OF prompt, generated_content, generated_content_z ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(generation_history_fts, rowid, prompt, generated_content)"
+    " VALUES ('delete', old.id, old.prompt, " + SQLITE_HISTORY_TEXT.format(row='old') + ");"
+    " INSERT INTO generation_history_fts(rowid, prompt, generated_content)"
+    " VALUES (new.id, new.prompt, " + SQLITE_HISTORY_TEXT.format(row='new') + "); END",
+    "INSERT INTO generation_history_fts(generation_history_fts) VALUES ('rebuild')",
+]
+
+# Definição anterior (0004), restaurada no downgrade
+SQLITE_CREATE_FTS_0004 = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS generation_history_fts USING fts5("
+    " prompt, generated_content, content='generation_history', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_ai AFTER INSERT ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(rowid, prompt, generated_content)"
+    " VALUES (new.id, new.prompt, new.generated_content); END",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_ad AFTER DELETE ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(generation_history_fts, rowid, prompt, generated_content)"
+    " VALUES ('delete', old.id, old.prompt, old.generated_content); END",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_au AFTER UPDATE ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(generation_history_fts, rowid, prompt, generated_content)"
+    " VALUES ('delete', old.id, old.prompt, old.generated_content);"
+    " INSERT INTO generation_history_fts(rowid, prompt, generated_content)"
+    " VALUES (new.id, new.prompt, new.generated_content); END",
+    "INSERT INTO generation_history_fts(generation_history_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade():
+    is_sqlite = op.get_bind().dialect.name == 'sqlite'
+    if is_sqlite:
+        # A recriação da tabela pelo batch mode descartaria os triggers
+        for statement in SQLITE_DROP_FTS:
+            op.execute(statement)
+
+    with op.batch_alter_table('generation_history', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('generated_content_z', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('preview', sa.Text(), nullable=True))
+        batch_op.alter_column('generated_content', existing_type=sa.Text(), nullable=True)
+        batch_op.create_index('ix_generation_history_timestamp', ['timestamp'], unique=False)
+
+    op.execute(f"UPDATE generation_history SET preview = substr(generated_content, 1, {PREVIEW_LENGTH})")
+
+    op.create_table('generation_history_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('prompt', sa.Text(), nullable=False),
+    sa.Column('generated_content_z', sa.LargeBinary(), nullable=False),
+    sa.Column('preview', sa.Text(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('generation_history_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_generation_history_archive_user_id'), ['user_id'], unique=False)
+
+    if is_sqlite:
+        for statement in SQLITE_CREATE_FTS:
+            op.execute(statement)
+
+
+def downgrade():
+    bind = op.get_bind()
+    is_sqlite = bind.dialect.name == 'sqlite'
+    if is_sqlite:
+        for statement in SQLITE_DROP_FTS:
+            op.execute(statement)
+
+    # Descomprime no Python (funciona em qualquer banco) e devolve o arquivo à tabela principal
+    history = sa.table('generation_history',
+                       sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                       sa.column('prompt', sa.Text), sa.column('generated_content', sa.Text),
+                       sa.column('generated_content_z', sa.LargeBinary), sa.column('timestamp', sa.DateTime))
+    compressed = bind.execute(sa.select(history.c.id, history.c.generated_content_z)
+                              .where(history.c.generated_content_z.isnot(None))).fetchall()
+    for row_id, blob in compressed:
+        bind.execute(history.update().where(history.c.id == row_id)
+                     .values(generated_content=zlib.decompress(blob).decode('utf-8')))
+
+    archive = sa.table('generation_history_archive',
+                       sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                       sa.column('prompt', sa.Text), sa.column('generated_content_z', sa.LargeBinary),
+                       sa.column('timestamp', sa.DateTime))
+    archived = bind.execute(sa.select(archive.c.id, archive.c.user_id, archive.c.prompt,
+                                      archive.c.generated_content_z, archive.c.timestamp)).fetchall()
+    for row_id, user_id, prompt, blob, timestamp in archived:
+        bind.execute(history.insert().values(
+            id=row_id, user_id=user_id, prompt=prompt,
+            generated_content=zlib.decompress(blob).decode('utf-8'), timestamp=timestamp,
+        ))
+
+    with op.batch_alter_table('generation_history_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_generation_history_archive_user_id'))
+    op.drop_table('generation_history_archive')
+
+    with op.batch_alter_table('generation_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_generation_history_timestamp')
+        batch_op.alter_column('generated_content', existing_type=sa.Text(), nullable=False)
+        batch_op.drop_column('preview')
+        batch_op.drop_column('generated_content_z')
+
+    if is_sqlite:
+        for statement in SQLITE_CREATE_FTS_0004:
+            op.execute(statement)
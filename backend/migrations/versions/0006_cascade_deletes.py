@@ -0,0 +1,117 @@
+"""add ON DELETE CASCADE to foreign keys
+
+Revision ID: 0006_cascade_deletes
+Revises: 0005_compress_and_archive_history
+Create Date: 2025-10-13 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_cascade_deletes'
+down_revision = '0005_compress_and_archive_history'
+branch_labels = None
+depends_on = None
+
+# (tabela, coluna, tabela referenciada, coluna referenciada, ondelete)
+FOREIGN_KEYS = [
+    ('collection', 'user_id', 'users', 'id', 'CASCADE'),
+    ('content', 'collection_id', 'collection', 'id', 'CASCADE'),
+    ('generation_history', 'user_id', 'users', 'id', 'CASCADE'),
+    ('generation_history_archive', 'user_id', 'users', 'id', 'CASCADE'),
+    ('generation_job', 'user_id', 'users', 'id', 'CASCADE'),
+    ('generation_job', 'history_id', 'generation_history', 'id', 'SET NULL'),
+    ('password_reset_token', 'user_id', 'users', 'id', 'CASCADE'),
+]
+
+# As FKs originais não têm nome: no SQLite o batch mode as identifica por esta
+# convenção; no PostgreSQL valem os nomes padrão (<tabela>_<coluna>_fkey).
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+# A recriação das tabelas no SQLite descarta os triggers do índice de busca
+# (e a view do histórico impediria o RENAME); eles são recriados ao final.
+SQLITE_HISTORY_TEXT = "coalesce({row}.generated_content, zlib_text({row}.generated_content_z))"
+
+SQLITE_DROP_FTS = [
+    "DROP TRIGGER IF EXISTS generation_history_fts_au",
+    "DROP TRIGGER IF EXISTS generation_history_fts_ad",
+    "DROP TRIGGER IF EXISTS generation_history_fts_ai",
+    "DROP TABLE IF EXISTS generation_history_fts",
+    "DROP VIEW IF EXISTS generation_history_search",
+    "DROP TRIGGER IF EXISTS content_fts_au",
+    "DROP TRIGGER IF EXISTS content_fts_ad",
+    "DROP TRIGGER IF EXISTS content_fts_ai",
+    "DROP TABLE IF EXISTS content_fts",
+]
+
+SQLITE_CREATE_FTS = [
+    "CREATE VIEW IF NOT EXISTS generation_history_search AS"
+    " SELECT id, prompt, " + SQLITE_HISTORY_TEXT.format(row='generation_history') + " AS generated_content"
+    " FROM generation_history",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS generation_history_fts USING fts5("
+    " prompt, generated_content, content='generation_history_search', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_ai AFTER INSERT ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(rowid, prompt, generated_content)"
+    " VALUES (new.id, new.prompt, " + SQLITE_HISTORY_TEXT.format(row='new') + "); END",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_ad AFTER DELETE ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(generation_history_fts, rowid, prompt, generated_content)"
+    " VALUES ('delete', old.id, old.prompt, " + SQLITE_HISTORY_TEXT.format(row='old') + "); END",
+    "CREATE TRIGGER IF NOT EXISTS generation_history_fts_au"
+    " AFTER UPDATE OF prompt, generated_content, generated_content_z ON generation_history BEGIN"
+    " INSERT INTO generation_history_fts(generation_history_fts, rowid, prompt, generated_content)"
+    " VALUES ('delete', old.id, old.prompt, " + SQLITE_HISTORY_TEXT.format(row='old') + ");"
+    " INSERT INTO generation_history_fts(rowid, prompt, generated_content)"
+    " VALUES (new.id, new.prompt, " + SQLITE_HISTORY_TEXT.format(row='new') + "); END",
+    "INSERT INTO generation_history_fts(generation_history_fts) VALUES ('rebuild')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5("
+    " title, body, content='content', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS content_fts_ai AFTER INSERT ON content BEGIN"
+    " INSERT INTO content_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS content_fts_ad AFTER DELETE ON content BEGIN"
+    " INSERT INTO content_fts(content_fts, rowid, title, body)"
+    " VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS content_fts_au AFTER UPDATE ON content BEGIN"
+    " INSERT INTO content_fts(content_fts, rowid, title, body)"
+    " VALUES ('delete', old.id, old.title, old.body);"
+    " INSERT INTO content_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "INSERT INTO content_fts(content_fts) VALUES ('rebuild')",
+]
+
+
+def _existing_fk_name(is_sqlite, table, column, referred):
+    if is_sqlite:
+        return NAMING_CONVENTION['fk'] % {
+            'table_name': table, 'column_0_name': column, 'referred_table_name': referred
+        }
+    return f"{table}_{column}_fkey"
+
+
+def _replace_foreign_keys(with_ondelete):
+    is_sqlite = op.get_bind().dialect.name == 'sqlite'
+    if is_sqlite:
+        for statement in SQLITE_DROP_FTS:
+            op.execute(statement)
+
+    for table, column, referred, referred_column, ondelete in FOREIGN_KEYS:
+        name = _existing_fk_name(is_sqlite, table, column, referred)
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(
+                name, referred, [column], [referred_column],
+                ondelete=ondelete if with_ondelete else None
+            )
+
+    if is_sqlite:
+        for statement in SQLITE_CREATE_FTS:
+            op.execute(statement)
+
+
+def upgrade():
+    _replace_foreign_keys(with_ondelete=True)
+
+
+def downgrade():
+    _replace_foreign_keys(with_ondelete=False)
@@ -0,0 +1,77 @@
+"""add updated_at to collection and content
+
+Revision ID: 0007_add_updated_at
+Revises: 0006_cascade_deletes
+Create Date: 2025-10-20 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_add_updated_at'
+down_revision = '0006_cascade_deletes'
+branch_labels = None
+depends_on = None
+
+# DROP COLUMN recria a tabela `content` no SQLite e descarta os triggers do
+# índice de busca; o downgrade os recria (definições da revisão 0006).
+SQLITE_DROP_CONTENT_FTS = [
+    "DROP TRIGGER IF EXISTS content_fts_au",
+    "DROP TRIGGER IF EXISTS content_fts_ad",
+    "DROP TRIGGER IF EXISTS content_fts_ai",
+    "DROP TABLE IF EXISTS content_fts",
+]
+
+SQLITE_CREATE_CONTENT_FTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5("
+    " title, body, content='content', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS content_fts_ai AFTER INSERT ON content BEGIN"
+    " INSERT INTO content_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS content_fts_ad AFTER DELETE ON content BEGIN"
+    " INSERT INTO content_fts(content_fts, rowid, title, body)"
+    " VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS content_fts_au AFTER UPDATE ON content BEGIN"
+    " INSERT INTO content_fts(content_fts, rowid, title, body)"
+    " VALUES ('delete', old.id, old.title, old.body);"
+    " INSERT INTO content_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "INSERT INTO content_fts(content_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade():
+    # Apenas ADD COLUMN/CREATE INDEX: no SQLite o batch mode não recria as tabelas
+    with op.batch_alter_table('collection', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_collection_user_id_updated_at', ['user_id', 'updated_at'], unique=False)
+
+    with op.batch_alter_table('content', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    op.execute("UPDATE content SET updated_at = created_at")
+    # A coleção começa com a alteração mais recente entre ela e seus conteúdos
+    op.execute(
+        "UPDATE collection SET updated_at = coalesce("
+        "(SELECT max(content.created_at) FROM content WHERE content.collection_id = collection.id"
+        " AND content.created_at > collection.created_at), collection.created_at)"
+    )
+
+
+def downgrade():
+    is_sqlite = op.get_bind().dialect.name == 'sqlite'
+    if is_sqlite:
+        for statement in SQLITE_DROP_CONTENT_FTS:
+            op.execute(statement)
+
+    with op.batch_alter_table('content', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    if is_sqlite:
+        for statement in SQLITE_CREATE_CONTENT_FTS:
+            op.execute(statement)
+
+    with op.batch_alter_table('collection', schema=None) as batch_op:
+        batch_op.drop_index('ix_collection_user_id_updated_at')
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,26 @@
+"""add role_version to users
+
+Revision ID: 0008_add_user_role_version
+Revises: 0007_add_updated_at
+Create Date: 2025-10-24 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_add_user_role_version'
+down_revision = '0007_add_updated_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ADD COLUMN com default constante não recria a tabela no SQLite
+    op.add_column('users', sa.Column('role_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('role_version')
@@ -0,0 +1,24 @@
+"""add index on users.created_at
+
+Revision ID: 0009_add_users_created_at_index
+Revises: 0008_add_user_role_version
+Create Date: 2025-10-27 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_add_users_created_at_index'
+down_revision = '0008_add_user_role_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Listagem de /api/admin/users ordenada por created_at sem ordenar a tabela inteira
+    op.create_index('ix_users_created_at', 'users', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_created_at', table_name='users')
@@ -0,0 +1,27 @@
+"""drop generation_job.result (text lives in generation_history)
+
+Revision ID: 0010_drop_generation_job_result
+Revises: 0009_add_users_created_at_index
+Create Date: 2025-10-28 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_drop_generation_job_result'
+down_revision = '0009_add_users_created_at_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # O texto do job é lido pelo history_id; a cópia descomprimida sai da tabela
+    with op.batch_alter_table('generation_job', schema=None) as batch_op:
+        batch_op.drop_column('result')
+
+
+def downgrade():
+    with op.batch_alter_table('generation_job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('result', sa.Text(), nullable=True))
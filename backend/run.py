@@ -1,7 +1,6 @@
 import os
 import sys
 from dotenv import load_dotenv
-from flask import send_from_directory, current_app
 
 # Carrega variáveis de ambiente do arquivo .env
 load_dotenv()
@@ -13,10 +12,10 @@ sys.path.insert(0, BACKEND_DIR)
 # Importa a factory e a configuração DEPOIS de configurar o path
 from app import create_app, socketio, models
 from app.config import Config
-from app.routes import init_cache_cleaner
+from app.static_assets import serve_frontend
 
+# create_app() também aquece o cliente do modelo e inicia sua manutenção em background
 app = create_app(Config)
-init_cache_cleaner(app) # Inicia a limpeza de cache em background
 
 # Rota "catch-all" para servir o frontend (Single Page Application)
 # Esta rota garante que o React/Vue/Angular router funcione corretamente
@@ -24,15 +23,10 @@ init_cache_cleaner(app) # Inicia a limpeza de cache em background
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    # A pasta estática é definida em create_app() como 'frontend'
-    static_folder = current_app.static_folder
-    
-    # Se o caminho solicitado existir como um arquivo estático (css, js, img), sirva-o.
-    if path != "" and os.path.exists(os.path.join(static_folder, path)):
-        return send_from_directory(static_folder, path)
-    else:
-        # Caso contrário, sirva o index.html para que o roteador do frontend assuma.
-        return send_from_directory(static_folder, 'index.html')
+    # Arquivos do build (FRONTEND_BUILD_DIR) vêm do manifesto montado em create_app(),
+    # com o irmão .br/.gz gerado por `flask precompress-assets` quando existir.
+    # Caminhos desconhecidos recebem o index.html para que o roteador do frontend assuma.
+    return serve_frontend(path)
 
 if __name__ == '__main__':
     # A porta é definida pelo ambiente (para deploy) ou 5000 como padrão
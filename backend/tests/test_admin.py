@@ -0,0 +1,207 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app.config import TestingConfig
+from app import create_app, db
+from app.models import User, Collection, GenerationHistory, GenerationHistoryArchive
+from app.services.auth_service import invalidate_principal
+
+@pytest.fixture(scope='module')
+def test_app():
+    app = create_app(config_class=TestingConfig)
+    with app.app_context():
+        yield app
+
+@pytest.fixture(scope='module')
+def test_client(test_app):
+    return test_app.test_client()
+
+@pytest.fixture(scope='function')
+def init_database(test_app):
+    with test_app.app_context():
+        db.create_all()
+        yield db
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture(scope='function')
+def admin_headers(test_client, init_database, test_app):
+    """Cria um administrador, faz login e retorna os headers de autorização."""
+    with test_app.app_context():
+        admin = User(username='admin', email='admin@example.com', is_admin=True)
+        admin.set_password('password123')
+        db.session.add(admin)
+        db.session.commit()
+    response = test_client.post('/api/login', json={'email': 'admin@example.com', 'password': 'password123'})
+    return {'Authorization': f'Bearer {response.json["access_token"]}'}
+
+def _create_users(test_app, count):
+    """Cria `count` usuários; o usuário i tem i gerações e uma coleção se i for par."""
+    with test_app.app_context():
+        base = datetime(2024, 1, 1)
+        for i in range(count):
+            user = User(username=f'user{i:02d}', email=f'user{i:02d}@example.com', created_at=base + timedelta(days=i))
+            user.set_password('password123')
+            db.session.add(user)
+            db.session.flush()
+            if i % 2 == 0:
+                db.session.add(Collection(name='c', user_id=user.id))
+            for j in range(i):
+                db.session.add(GenerationHistory(user_id=user.id, prompt='p', generated_content='c',
+                                                 timestamp=base + timedelta(days=i, minutes=j)))
+        db.session.commit()
+
+def test_admin_users_pagination_and_stats(test_client, admin_headers, test_app):
+    """Testa a paginação e as estatísticas agregadas por usuário."""
+    _create_users(test_app, 5)
+
+    first = test_client.get('/api/admin/users?limit=2&sort=generation_count', headers=admin_headers).json
+    assert first['total'] == 6
+    assert first['next_page'] == 2
+    assert [u['username'] for u in first['items']] == ['user04', 'user03']
+    top = first['items'][0]
+    assert top['generation_count'] == 4
+    assert top['collection_count'] == 1
+    assert top['last_generation_at'] == datetime(2024, 1, 5, 0, 3).isoformat()
+
+    last = test_client.get('/api/admin/users?limit=2&page=3&sort=generation_count', headers=admin_headers).json
+    assert last['next_page'] is None
+    assert {u['generation_count'] for u in last['items']} == {0}
+
+def test_admin_users_stats_include_archived_history(test_client, admin_headers, test_app):
+    """Testa que contagem e última geração consideram também o histórico arquivado."""
+    _create_users(test_app, 2)
+    with test_app.app_context():
+        user = User.query.filter_by(username='user01').one()
+        db.session.add(GenerationHistoryArchive(id=1000, user_id=user.id, prompt='antigo', generated_content_z=b'',
+                                                timestamp=datetime(2025, 6, 1)))
+        db.session.commit()
+
+    items = test_client.get('/api/admin/users?sort=last_generation_at', headers=admin_headers).json['items']
+    assert items[0]['username'] == 'user01'
+    assert items[0]['generation_count'] == 2
+    assert items[0]['last_generation_at'] == datetime(2025, 6, 1).isoformat()
+
+def test_admin_users_prefix_filter_and_sort(test_client, admin_headers, test_app):
+    """Testa o filtro por prefixo de username/email e a ordenação."""
+    _create_users(test_app, 12)
+
+    response = test_client.get('/api/admin/users?q=user1&sort=username&order=asc', headers=admin_headers)
+    assert [u['username'] for u in response.json['items']] == ['user10', 'user11']
+    assert response.json['total'] == 2
+
+    response = test_client.get('/api/admin/users?q=admin@', headers=admin_headers)
+    assert [u['username'] for u in response.json['items']] == ['admin']
+
+    assert test_client.get('/api/admin/users?sort=password_hash', headers=admin_headers).status_code == 400
+
+def test_admin_users_runs_constant_queries(test_client, admin_headers, test_app):
+    """Testa que a listagem não faz uma consulta por usuário (N+1)."""
+    _create_users(test_app, 10)
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = test_client.get('/api/admin/users?limit=50', headers=admin_headers)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert len(response.json['items']) == 11
+    # O papel do admin é relido do banco; depois, só a contagem e a página
+    assert len(statements) == 3
+
+def test_admin_users_requires_admin(test_client, init_database):
+    """Testa que usuários comuns não acessam a listagem."""
+    test_client.post('/api/register', json={'username': 'comum', 'email': 'comum@example.com', 'password': 'password123'})
+    login = test_client.post('/api/login', json={'email': 'comum@example.com', 'password': 'password123'})
+    response = test_client.get('/api/admin/users', headers={'Authorization': f'Bearer {login.json["access_token"]}'})
+    assert response.status_code == 403
+
+def _login(test_client, email):
+    response = test_client.post('/api/login', json={'email': email, 'password': 'password123'})
+    return {'Authorization': f'Bearer {response.json["access_token"]}'}
+
+def test_profile_is_served_from_principal_cache(test_client, admin_headers):
+    """Testa que rotas autenticadas não consultam a tabela de usuários com o cache aquecido."""
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = test_client.get('/api/profile', headers=admin_headers)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert response.status_code == 200
+    assert response.json['is_admin'] is True
+    assert statements == []
+
+def test_role_change_revokes_existing_tokens(test_client, admin_headers, test_app):
+    """Testa que, após uma mudança de papel, tokens antigos são recusados e o novo papel vale."""
+    _create_users(test_app, 1)
+    with test_app.app_context():
+        user_id = User.query.filter_by(username='user00').one().id
+    old_headers = _login(test_client, 'user00@example.com')
+    assert test_client.get('/api/admin/users', headers=old_headers).status_code == 403
+
+    response = test_client.put(f'/api/admin/users/{user_id}', json={'is_admin': True}, headers=admin_headers)
+    assert response.status_code == 200
+
+    assert test_client.get('/api/profile', headers=old_headers).status_code == 401
+    new_headers = _login(test_client, 'user00@example.com')
+    assert test_client.get('/api/admin/users', headers=new_headers).status_code == 200
+
+    # Rebaixado de volta: o token de administrador deixa de valer
+    test_client.put(f'/api/admin/users/{user_id}', json={'is_admin': False}, headers=admin_headers)
+    assert test_client.get('/api/admin/users', headers=new_headers).status_code == 401
+
+def test_demoted_admin_loses_access_in_other_workers(test_client, admin_headers, test_app):
+    """Testa que admin_required não depende do cache: a mudança feita por outro worker vale na hora."""
+    assert test_client.get('/api/admin/users', headers=admin_headers).status_code == 200
+    assert test_client.get('/api/profile', headers=admin_headers).status_code == 200  # cache aquecido
+
+    with test_app.app_context():
+        # Simula outro worker: altera o papel sem invalidar o cache deste processo
+        admin = User.query.filter_by(username='admin').one()
+        admin.is_admin = False
+        admin.role_version += 1
+        db.session.commit()
+
+    assert test_client.get('/api/admin/users', headers=admin_headers).status_code == 401
+
+def _delete_user(test_app, user_id):
+    with test_app.app_context():
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+        invalidate_principal(user_id)
+
+def test_deleted_user_token_is_rejected(test_client, admin_headers, test_app):
+    """Testa que o token de um usuário removido deixa de ser aceito."""
+    _create_users(test_app, 1)
+    with test_app.app_context():
+        user_id = User.query.filter_by(username='user00').one().id
+    headers = _login(test_client, 'user00@example.com')
+    assert test_client.get('/api/profile', headers=headers).status_code == 200
+
+    _delete_user(test_app, user_id)
+    assert test_client.get('/api/profile', headers=headers).status_code == 401
+
+def test_socket_connect_with_revoked_token_stays_connected(test_client, admin_headers, test_app):
+    """Testa que o WebSocket aceita (como anônimo) um token de usuário removido, em vez de falhar."""
+    from app import socketio
+    _create_users(test_app, 1)
+    with test_app.app_context():
+        user_id = User.query.filter_by(username='user00').one().id
+    headers = _login(test_client, 'user00@example.com')
+    _delete_user(test_app, user_id)
+
+    client = socketio.test_client(test_app, headers=headers)
+    try:
+        assert client.is_connected()
+    finally:
+        client.disconnect()
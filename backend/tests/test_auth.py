@@ -8,6 +8,7 @@ from unittest.mock import patch
 from app.config import TestingConfig
 from app import create_app, db
 from app.models import User, PasswordResetToken
+from app.services.password_service import hash_password, verify_password, needs_rehash
 from datetime import datetime, timedelta
 
 @pytest.fixture(scope='module')
@@ -205,3 +206,36 @@ def test_reset_password_expired_token(mock_mail_send, test_client, init_database
     # Tenta logar com a nova senha (deve falhar, pois a senha não foi redefinida)
     login_response = test_client.post('/api/login', json={'email': 'reset3@example.com', 'password': 'newpassword'})
     assert login_response.status_code == 401
+
+def test_login_rehashes_password_with_outdated_parameters(test_client, init_database, test_app):
+    """Testa que um login bem-sucedido refaz o hash gravado com outro método/custo."""
+    with test_app.app_context():
+        user = User(username='legado', email='legado@example.com',
+                    password_hash=hash_password('password123', method='bcrypt:4'))
+        db.session.add(user)
+        db.session.commit()
+
+    response = test_client.post('/api/login', json={'email': 'legado@example.com', 'password': 'password123'})
+    assert response.status_code == 200
+
+    with test_app.app_context():
+        stored = User.query.filter_by(email='legado@example.com').one().password_hash
+        assert stored.startswith(test_app.config['PASSWORD_HASH_METHOD'] + '$')
+        assert verify_password(stored, 'password123')
+
+    # Senha errada não altera o hash
+    assert test_client.post('/api/login', json={'email': 'legado@example.com', 'password': 'errada'}).status_code == 401
+    with test_app.app_context():
+        assert User.query.filter_by(email='legado@example.com').one().password_hash == stored
+
+def test_needs_rehash_compares_algorithm_and_cost():
+    """Testa a detecção de hashes com parâmetros diferentes dos configurados."""
+    pbkdf2 = hash_password('segredo', method='pbkdf2:sha256:1000')
+    bcrypt_hash = hash_password('segredo', method='bcrypt:4')
+    assert not needs_rehash(pbkdf2, method='pbkdf2:sha256:1000')
+    assert not needs_rehash(pbkdf2, method='pbkdf2')
+    assert needs_rehash(pbkdf2, method='pbkdf2:sha256:2000')
+    assert needs_rehash(pbkdf2, method='bcrypt:4')
+    assert not needs_rehash(bcrypt_hash, method='bcrypt:4')
+    assert needs_rehash(bcrypt_hash, method='bcrypt:5')
+    assert needs_rehash(bcrypt_hash, method='pbkdf2:sha256:1000')
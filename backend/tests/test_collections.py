@@ -337,3 +337,153 @@ def test_delete_collection_content_forbidden(test_client, init_database):
     delete_res = test_client.delete(f'/api/collections/{collection_id}/contents/{content_id}', headers=headers2)
 
     assert delete_res.status_code == 404
+
+def test_collection_details_returns_preview_only(test_client, init_database, auth_headers, test_app):
+    """Testa que a listagem traz apenas a prévia e o corpo completo vem da rota do item."""
+    create_res = test_client.post('/api/collections', json={'name': 'Coleção'}, headers=auth_headers, mimetype='application/json')
+    collection_id = create_res.json['id']
+    long_body = 'x' * (test_app.config['PREVIEW_LENGTH'] * 3)
+    add_content_res = test_client.post(f'/api/collections/{collection_id}/contents', json={'title': 'Longo', 'body': long_body}, headers=auth_headers, mimetype='application/json')
+    content_id = add_content_res.json['id']
+
+    get_res = test_client.get(f'/api/collections/{collection_id}', headers=auth_headers)
+    item = get_res.json['contents'][0]
+    assert 'body' not in item
+    assert item['preview'] == long_body[:test_app.config['PREVIEW_LENGTH']]
+
+    detail_res = test_client.get(f'/api/collections/{collection_id}/contents/{content_id}', headers=auth_headers)
+    assert detail_res.status_code == 200
+    assert detail_res.json['body'] == long_body
+
+def test_collection_ndjson_import_and_export(test_client, init_database, auth_headers, test_app):
+    """Testa a importação em lote (com erros por linha) e a exportação NDJSON."""
+    import json
+    collection_id = test_client.post('/api/collections', json={'name': 'Lote'}, headers=auth_headers).json['id']
+    test_app.config['COLLECTION_IMPORT_BATCH_SIZE'] = 7
+    test_app.config['COLLECTION_EXPORT_BATCH_SIZE'] = 4
+    try:
+        lines = [json.dumps({'title': f'Item {i}', 'body': f'Corpo {i}'}) for i in range(20)]
+        lines.insert(3, '{"title": "Sem corpo"}')
+        lines.insert(8, 'não é json')
+        lines.insert(10, '')
+        response = test_client.post(
+            f'/api/collections/{collection_id}/import',
+            data='\n'.join(lines).encode('utf-8'),
+            headers={**auth_headers, 'Content-Type': 'application/x-ndjson'}
+        )
+        assert response.status_code == 200
+        assert response.json['imported'] == 20
+        assert response.json['failed'] == 2
+        assert [e['line'] for e in response.json['errors']] == [4, 9]
+
+        export = test_client.get(f'/api/collections/{collection_id}/export', headers=auth_headers)
+        assert export.status_code == 200
+        assert export.mimetype == 'application/x-ndjson'
+        rows = [json.loads(line) for line in export.get_data(as_text=True).splitlines()]
+    finally:
+        test_app.config['COLLECTION_IMPORT_BATCH_SIZE'] = TestingConfig.COLLECTION_IMPORT_BATCH_SIZE
+        test_app.config['COLLECTION_EXPORT_BATCH_SIZE'] = TestingConfig.COLLECTION_EXPORT_BATCH_SIZE
+    assert [row['title'] for row in rows] == [f'Item {i}' for i in range(20)]
+    assert rows[0]['body'] == 'Corpo 0'
+
+def test_collection_import_requires_ownership(test_client, init_database, auth_headers):
+    """Testa que não é possível importar para a coleção de outro usuário."""
+    collection_id = test_client.post('/api/collections', json={'name': 'Minha'}, headers=auth_headers).json['id']
+    test_client.post('/api/register', json={'username': 'intruso', 'email': 'intruso@test.com', 'password': 'password2'})
+    login = test_client.post('/api/login', json={'email': 'intruso@test.com', 'password': 'password2'})
+    headers = {'Authorization': f'Bearer {login.json["access_token"]}'}
+
+    response = test_client.post(f'/api/collections/{collection_id}/import',
+                                data=b'{"title": "x", "body": "y"}\n', headers=headers)
+    assert response.status_code == 404
+    assert test_client.get(f'/api/collections/{collection_id}/export', headers=headers).status_code == 404
+
+def test_delete_collection_cascades_in_database(test_client, init_database, auth_headers, test_app):
+    """Testa que a remoção da coleção apaga os conteúdos no banco, sem carregá-los."""
+    from sqlalchemy import event
+    from app.models import Content
+    collection_id = test_client.post('/api/collections', json={'name': 'Grande'}, headers=auth_headers).json['id']
+    with test_app.app_context():
+        db.session.execute(db.insert(Content), [
+            {'title': f'T{i}', 'body': 'B', 'collection_id': collection_id} for i in range(50)
+        ])
+        db.session.commit()
+
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = test_client.delete(f'/api/collections/{collection_id}', headers=auth_headers)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert response.status_code == 200
+    assert not any('FROM content' in s for s in statements)
+    with test_app.app_context():
+        assert Content.query.filter_by(collection_id=collection_id).count() == 0
+
+def test_delete_user_cascades_in_database(test_client, init_database, auth_headers, test_app):
+    """Testa que remover um usuário apaga, pelo banco, coleções, conteúdos, histórico, jobs e tokens."""
+    from datetime import datetime, timedelta
+    from app.models import Content, GenerationHistory, GenerationJob, PasswordResetToken
+    collection_id = test_client.post('/api/collections', json={'name': 'C'}, headers=auth_headers).json['id']
+    test_client.post(f'/api/collections/{collection_id}/contents', json={'title': 'T', 'body': 'B'}, headers=auth_headers)
+    with test_app.app_context():
+        user = User.query.filter_by(email='test@example.com').first()
+        user_id = user.id
+        db.session.add(GenerationHistory(user_id=user_id, prompt='p', generated_content='c'))
+        db.session.add(GenerationJob(id='job', user_id=user_id, prompt='p', status='completed'))
+        db.session.add(PasswordResetToken(user_id=user_id, token='tok', expires_at=datetime.utcnow() + timedelta(hours=1)))
+        db.session.commit()
+        db.session.expunge_all()
+
+        # Com passive_deletes o ORM emite só o DELETE do usuário; o resto é ON DELETE CASCADE
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+
+        assert db.session.get(User, user_id) is None
+        assert Collection.query.count() == 0
+        assert Content.query.count() == 0
+        assert GenerationHistory.query.count() == 0
+        assert GenerationJob.query.count() == 0
+        assert PasswordResetToken.query.count() == 0
+
+def test_collections_conditional_get(test_client, init_database, auth_headers):
+    """Testa ETag/304 na listagem e nos detalhes, e a invalidação ao alterar conteúdos."""
+    collection_id = test_client.post('/api/collections', json={'name': 'Polling'}, headers=auth_headers).json['id']
+
+    listing = test_client.get('/api/collections', headers=auth_headers)
+    assert listing.status_code == 200
+    assert listing.json[0]['item_count'] == 0
+    list_etag = listing.headers['ETag']
+    details = test_client.get(f'/api/collections/{collection_id}', headers=auth_headers)
+    assert details.json['contents'] == []
+    details_etag = details.headers['ETag']
+    assert details.headers['Cache-Control'] == 'private, no-cache'
+
+    cached = test_client.get('/api/collections', headers={**auth_headers, 'If-None-Match': list_etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    cached = test_client.get(f'/api/collections/{collection_id}', headers={**auth_headers, 'If-None-Match': details_etag})
+    assert cached.status_code == 304
+
+    # Adicionar um conteúdo muda a versão da coleção e da listagem
+    test_client.post(f'/api/collections/{collection_id}/contents', json={'title': 'T', 'body': 'B'}, headers=auth_headers)
+    listing = test_client.get('/api/collections', headers={**auth_headers, 'If-None-Match': list_etag})
+    assert listing.status_code == 200
+    assert listing.json[0]['item_count'] == 1
+    details = test_client.get(f'/api/collections/{collection_id}', headers={**auth_headers, 'If-None-Match': details_etag})
+    assert details.status_code == 200
+    assert len(details.json['contents']) == 1
+
+def test_collections_etag_changes_on_delete(test_client, init_database, auth_headers):
+    """Testa que remover uma coleção invalida o ETag da listagem."""
+    first = test_client.post('/api/collections', json={'name': 'A'}, headers=auth_headers).json['id']
+    test_client.post('/api/collections', json={'name': 'B'}, headers=auth_headers)
+    etag = test_client.get('/api/collections', headers=auth_headers).headers['ETag']
+
+    test_client.delete(f'/api/collections/{first}', headers=auth_headers)
+    response = test_client.get('/api/collections', headers={**auth_headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [c['name'] for c in response.json] == ['B']
@@ -0,0 +1,678 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import threading
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from app.config import TestingConfig
+from app import create_app, db
+from app.models import GenerationHistory, GenerationJob
+from app.services.cache_service import get_response_cache, reset_response_cache, make_cache_key, ResponseCache
+from app.services.ai_service import get_model_identifier
+from app.services.rate_limit_service import reset_rate_limiter, MemoryRateLimitBackend, SQLiteRateLimitBackend
+from app.services.ai_providers import StubProvider, ProviderError, create_provider
+from app.services.generation_service import ChunkCoalescer, generate_text, in_flight_generations, get_singleflight_stats
+
+@pytest.fixture(scope='module')
+def test_app():
+    app = create_app(config_class=TestingConfig)
+    with app.app_context():
+        yield app
+
+@pytest.fixture(scope='module')
+def test_client(test_app):
+    return test_app.test_client()
+
+@pytest.fixture(scope='function')
+def init_database(test_app):
+    with test_app.app_context():
+        db.create_all()
+        reset_response_cache()
+        reset_rate_limiter()
+        yield db
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture(scope='function')
+def auth_headers(test_client, init_database):
+    """Cria um usuário, faz login e retorna os headers de autorização."""
+    test_client.post('/api/register', json={
+        'username': 'genuser',
+        'email': 'gen@example.com',
+        'password': 'password123'
+    })
+    response = test_client.post('/api/login', json={
+        'email': 'gen@example.com',
+        'password': 'password123'
+    })
+    return {'Authorization': f'Bearer {response.json["access_token"]}'}
+
+def _fake_model(chunks):
+    """Cria um modelo falso que retorna os chunks informados em streaming."""
+    model = MagicMock()
+    model.stream.side_effect = lambda *args, **kwargs: iter(chunks)
+    return model
+
+@patch('app.routes.socketio.emit')
+def test_generate_content_success(mock_emit, test_client, auth_headers, test_app):
+    """Testa a geração em streaming e o registro no histórico."""
+    model = _fake_model(['Olá', ', ', 'mundo'])
+    with patch('app.services.generation_service.get_generative_model', return_value=model):
+        response = test_client.post('/api/generate', json={'prompt': 'Diga olá'}, headers=auth_headers)
+
+    assert response.status_code == 200
+    chunk_events = [c for c in mock_emit.call_args_list if c.args[0] == 'generated_content_chunk']
+    # O primeiro trecho sai imediatamente; os demais são agrupados em um frame
+    assert [c.args[1]['chunk'] for c in chunk_events] == ['Olá', ', mundo']
+    assert response.json['stream'] == {'chunks_received': 3, 'frames_sent': 2, 'chars': 10}
+    complete = [c for c in mock_emit.call_args_list if c.args[0] == 'generated_content_complete']
+    assert complete[0].args[1] == {'full_content': 'Olá, mundo'}
+
+    with test_app.app_context():
+        entry = GenerationHistory.query.first()
+        assert entry.generated_content == 'Olá, mundo'
+
+@patch('app.routes.socketio.emit')
+def test_generate_content_cache_hit(mock_emit, test_client, auth_headers, test_app):
+    """Testa que um prompt repetido é servido pelo cache sem chamar o modelo."""
+    model = _fake_model(['Resposta ', 'cacheada'])
+    with patch('app.services.generation_service.get_generative_model', return_value=model):
+        test_client.post('/api/generate', json={'prompt': 'Mesmo prompt'}, headers=auth_headers)
+        mock_emit.reset_mock()
+        # Espaços extras não alteram a chave normalizada
+        response = test_client.post('/api/generate', json={'prompt': '  Mesmo   prompt '}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert model.stream.call_count == 1
+    complete = [c for c in mock_emit.call_args_list if c.args[0] == 'generated_content_complete']
+    assert complete[0].args[1] == {'full_content': 'Resposta cacheada'}
+
+    with test_app.app_context():
+        assert GenerationHistory.query.count() == 2
+
+@patch('app.routes.socketio.emit')
+def test_generate_content_bypass_cache(mock_emit, test_client, auth_headers):
+    """Testa que o flag bypass_cache força uma nova chamada ao modelo."""
+    model = _fake_model(['Texto'])
+    with patch('app.services.generation_service.get_generative_model', return_value=model):
+        test_client.post('/api/generate', json={'prompt': 'Prompt'}, headers=auth_headers)
+        test_client.post('/api/generate', json={'prompt': 'Prompt', 'bypass_cache': True}, headers=auth_headers)
+
+    assert model.stream.call_count == 2
+
+def test_response_cache_disk_tier_shared(tmp_path, test_app):
+    """Testa que a camada em disco é compartilhada entre instâncias (workers)."""
+    disk_path = str(tmp_path / 'cache.db')
+    worker_a = ResponseCache(disk_path=disk_path)
+    worker_b = ResponseCache(disk_path=disk_path)
+
+    worker_a.set('prompt', 'gemini-pro', 'resposta')
+    disk_hits_before = worker_b.get_stats()['disk_hits']
+    assert worker_b.get('prompt', 'gemini-pro') == 'resposta'
+    assert worker_b.get_stats()['disk_hits'] == disk_hits_before + 1
+    # Modelos diferentes não compartilham entradas
+    assert make_cache_key('prompt', 'gemini-pro') != make_cache_key('prompt', 'outro')
+    assert worker_b.get('prompt', 'outro') is None
+
+def test_response_cache_disk_hit_keeps_remaining_ttl(tmp_path, test_app):
+    """Testa que a promoção do disco para a memória não renova o TTL da entrada."""
+    disk_path = str(tmp_path / 'cache.db')
+    worker_a = ResponseCache(disk_path=disk_path, ttl=60)
+    worker_b = ResponseCache(disk_path=disk_path, ttl=60)
+    worker_a.set('prompt', 'm', 'resposta')
+
+    # 50s depois, restam só 10s no disco
+    now = time.time()
+    with patch('app.services.cache_service.time.time', return_value=now + 50):
+        assert worker_b.get('prompt', 'm') == 'resposta'
+    # Passado o prazo original, a cópia em memória também expirou
+    with patch('app.services.cache_service.time.time', return_value=now + 61):
+        assert worker_b.memory.get(make_cache_key('prompt', 'm')) is None
+        assert worker_b.get('prompt', 'm') is None
+
+def test_response_cache_eviction(test_app):
+    """Testa a expiração por TTL e o limite de entradas do LRU."""
+    cache = ResponseCache(memory_max_entries=2, ttl=60)
+    cache.set('a', 'm', '1')
+    cache.set('b', 'm', '2')
+    cache.set('c', 'm', '3')
+    assert cache.get('a', 'm') is None
+    assert cache.get('c', 'm') == '3'
+
+    expired = ResponseCache(ttl=-1)
+    expired.set('a', 'm', '1')
+    assert expired.get('a', 'm') is None
+
+def _wait_for_job(test_client, job_id, headers, timeout=5):
+    """Consulta o status do job até que ele termine."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = test_client.get(f'/api/jobs/{job_id}', headers=headers)
+        if response.json['status'] in ('completed', 'failed'):
+            return response
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} não terminou em {timeout}s")
+
+def test_generation_job_completes(test_client, auth_headers, test_app):
+    """Testa que o job é criado imediatamente e concluído pelo pool de workers."""
+    model = _fake_model(['Texto ', 'do job'])
+    with patch('app.services.generation_service.get_generative_model', return_value=model):
+        response = test_client.post('/api/jobs', json={'prompt': 'Prompt assíncrono'}, headers=auth_headers)
+        assert response.status_code == 202
+        job_id = response.json['job_id']
+
+        status_response = _wait_for_job(test_client, job_id, auth_headers)
+
+    assert status_response.status_code == 200
+    assert status_response.json['status'] == 'completed'
+    assert status_response.json['result'] == 'Texto do job'
+
+    with test_app.app_context():
+        entry = GenerationHistory.query.first()
+        assert entry.generated_content == 'Texto do job'
+        job = db.session.get(GenerationJob, job_id)
+        assert job.history_id == entry.id
+        # Datas formatadas pelo provider JSON, como nas demais rotas
+        assert status_response.json['finished_at'] == job.finished_at.isoformat()
+
+def test_generation_job_failure(test_client, auth_headers):
+    """Testa que erros do modelo marcam o job como falho."""
+    model = MagicMock()
+    model.stream.side_effect = RuntimeError('modelo indisponível')
+    with patch('app.services.generation_service.get_generative_model', return_value=model):
+        response = test_client.post('/api/jobs', json={'prompt': 'Prompt com erro'}, headers=auth_headers)
+        status_response = _wait_for_job(test_client, response.json['job_id'], auth_headers)
+
+    assert status_response.json['status'] == 'failed'
+    assert 'modelo indisponível' in status_response.json['error']
+
+def test_generation_job_failure_after_generation(test_client, auth_headers):
+    """Testa que falhas fora da chamada ao modelo (ex.: ao gravar o histórico) também marcam o job como falho."""
+    model = _fake_model(['Texto'])
+    with patch('app.services.generation_service.get_generative_model', return_value=model), \
+            patch('app.services.job_service.timed_history_commit', side_effect=RuntimeError('disco cheio')):
+        response = test_client.post('/api/jobs', json={'prompt': 'Prompt sem histórico'}, headers=auth_headers)
+        status_response = _wait_for_job(test_client, response.json['job_id'], auth_headers)
+
+    assert status_response.json['status'] == 'failed'
+    assert 'disco cheio' in status_response.json['error']
+    assert status_response.json['history_id'] is None
+
+def test_generation_job_holds_concurrency_slot(test_client, auth_headers, test_app):
+    """Testa que um job em andamento ocupa a vaga de concorrência do usuário até terminar."""
+    release = threading.Event()
+
+    def slow_stream(*args, **kwargs):
+        release.wait(5)
+        return iter(['Texto lento'])
+
+    model = MagicMock()
+    model.stream.side_effect = slow_stream
+    original_limits = test_app.config['RATE_LIMITS']
+    test_app.config['RATE_LIMITS'] = {
+        'user': {'rate': 100, 'burst': 100, 'max_concurrent': 1},
+        'admin': original_limits['admin'],
+    }
+    try:
+        with patch('app.services.generation_service.get_generative_model', return_value=model):
+            first = test_client.post('/api/jobs', json={'prompt': 'Job lento'}, headers=auth_headers)
+            assert first.status_code == 202
+            second = test_client.post('/api/jobs', json={'prompt': 'Outro job'}, headers=auth_headers)
+            assert second.status_code == 429
+
+            release.set()
+            assert _wait_for_job(test_client, first.json['job_id'], auth_headers).json['status'] == 'completed'
+            # A vaga é liberada logo após o status final ser gravado
+            deadline = time.time() + 5
+            while True:
+                third = test_client.post('/api/jobs', json={'prompt': 'Depois do primeiro'}, headers=auth_headers)
+                if third.status_code != 429 or time.time() > deadline:
+                    break
+                time.sleep(0.05)
+            assert third.status_code == 202
+            _wait_for_job(test_client, third.json['job_id'], auth_headers)
+    finally:
+        release.set()
+        test_app.config['RATE_LIMITS'] = original_limits
+
+def test_reconcile_stale_jobs(test_app, init_database):
+    """Testa que jobs órfãos antigos são encerrados e os recentes (de outros workers) são mantidos."""
+    from datetime import datetime, timedelta
+    from app.models import User
+    from app.services.job_service import reconcile_stale_jobs
+    with test_app.app_context():
+        user = User(username='jobs', email='jobs@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        old = datetime.utcnow() - timedelta(hours=1)
+        db.session.add_all([
+            GenerationJob(id='orfao-pending', user_id=user.id, prompt='p', status='pending', created_at=old),
+            GenerationJob(id='orfao-running', user_id=user.id, prompt='p', status='running', created_at=old, started_at=old),
+            GenerationJob(id='recente', user_id=user.id, prompt='p', status='running', started_at=datetime.utcnow()),
+            GenerationJob(id='concluido', user_id=user.id, prompt='p', status='completed', created_at=old),
+        ])
+        db.session.commit()
+
+        assert reconcile_stale_jobs(max_age=600) == (2, 0)
+        statuses = {job.id: job.status for job in GenerationJob.query.all()}
+        assert statuses == {'orfao-pending': 'failed', 'orfao-running': 'failed', 'recente': 'running', 'concluido': 'completed'}
+
+        # Jobs terminados há mais que a retenção são removidos; os ativos ficam
+        db.session.query(GenerationJob).filter(GenerationJob.id == 'concluido').update({'finished_at': old})
+        db.session.commit()
+        assert reconcile_stale_jobs(max_age=600, retention=1800) == (0, 1)
+        assert {job.id for job in GenerationJob.query.all()} == {'orfao-pending', 'orfao-running', 'recente'}
+
+def test_generation_job_not_found(test_client, auth_headers):
+    """Testa que jobs inexistentes (ou de outro usuário) retornam 404."""
+    response = test_client.get('/api/jobs/nao-existe', headers=auth_headers)
+    assert response.status_code == 404
+
+def test_singleflight_coalesces_identical_prompts(test_app, init_database):
+    """Testa que requisições idênticas simultâneas compartilham um único stream."""
+    release = threading.Event()
+
+    def slow_stream(*args, **kwargs):
+        yield 'primeiro '
+        release.wait(timeout=5)
+        yield 'segundo'
+
+    model = MagicMock()
+    model.stream.side_effect = slow_stream
+    results = {}
+
+    def run(name):
+        with test_app.app_context():
+            received = []
+            results[name] = (generate_text('Prompt concorrente', on_chunk=received.append), received)
+
+    followers_before = get_singleflight_stats()['followers']
+    with patch('app.services.generation_service.get_generative_model', return_value=model):
+        leader = threading.Thread(target=run, args=('leader',))
+        leader.start()
+        deadline = time.time() + 5
+        while not in_flight_generations and time.time() < deadline:
+            time.sleep(0.01)
+        follower = threading.Thread(target=run, args=('follower',))
+        follower.start()
+        while get_singleflight_stats()['followers'] == followers_before and time.time() < deadline:
+            time.sleep(0.01)
+        release.set()
+        leader.join(timeout=5)
+        follower.join(timeout=5)
+
+    assert model.stream.call_count == 1
+    for name in ('leader', 'follower'):
+        (text, from_cache), received = results[name]
+        assert text == 'primeiro segundo'
+        assert received == ['primeiro ', 'segundo']
+    assert not in_flight_generations
+
+def test_singleflight_leader_disconnect_does_not_abort_followers(test_app, init_database):
+    """Testa que, se o primeiro cliente desiste, quem acompanha a mesma geração recebe o texto completo."""
+    from app.services.generation_service import GenerationStream
+    release = threading.Event()
+
+    def slow_stream(*args, **kwargs):
+        yield 'primeiro '
+        release.wait(timeout=5)
+        yield 'segundo'
+
+    model = MagicMock()
+    model.stream.side_effect = slow_stream
+    with patch('app.services.generation_service.get_generative_model', return_value=model):
+        with test_app.app_context():
+            leader = iter(GenerationStream('Prompt abandonado'))
+            assert next(leader) == 'primeiro '
+            follower = iter(GenerationStream('Prompt abandonado'))
+            assert next(follower) == 'primeiro '
+
+            leader.close()  # o primeiro cliente desconectou
+            release.set()
+            assert list(follower) == ['segundo']
+
+    assert model.stream.call_count == 1
+    assert not in_flight_generations
+
+def test_singleflight_cancels_upstream_when_all_consumers_leave(test_app, init_database):
+    """Testa que a geração é cancelada (e não vai para o cache) quando nenhum consumidor resta."""
+    from app.services.generation_service import GenerationStream
+    release = threading.Event()
+    closed = threading.Event()
+
+    def slow_stream(*args, **kwargs):
+        try:
+            yield 'primeiro '
+            release.wait(timeout=5)
+            yield 'segundo'
+            yield 'terceiro'
+        finally:
+            closed.set()
+
+    model = MagicMock()
+    model.stream.side_effect = slow_stream
+    with patch('app.services.generation_service.get_generative_model', return_value=model):
+        with test_app.app_context():
+            stream = iter(GenerationStream('Prompt cancelado'))
+            assert next(stream) == 'primeiro '
+            stream.close()
+            release.set()
+            assert closed.wait(timeout=5)
+
+            deadline = time.time() + 5
+            while in_flight_generations and time.time() < deadline:
+                time.sleep(0.01)
+            assert not in_flight_generations
+            assert get_response_cache().get('Prompt cancelado', get_model_identifier()) is None
+
+def test_stub_provider_is_deterministic():
+    """Testa que o provedor stub gera a mesma resposta para o mesmo prompt."""
+    config = {'STUB_TIME_TO_FIRST_TOKEN': 0, 'STUB_INTER_CHUNK_DELAY': 0, 'STUB_CHUNK_SIZE': 10, 'STUB_RESPONSE_LENGTH': 95}
+    provider = StubProvider(config)
+    chunks = list(provider.stream('prompt fixo'))
+
+    assert len(chunks) == 10
+    assert all(len(c) <= 10 for c in chunks)
+    assert "".join(chunks) == "".join(StubProvider(config).stream('prompt fixo'))
+    assert "".join(chunks) != "".join(provider.stream('outro prompt'))
+
+def test_stub_provider_error_rate():
+    """Testa que a taxa de erro configurada interrompe o stream."""
+    provider = StubProvider({'STUB_TIME_TO_FIRST_TOKEN': 0, 'STUB_INTER_CHUNK_DELAY': 0, 'STUB_ERROR_RATE': 1.0})
+    with pytest.raises(ProviderError):
+        list(provider.stream('prompt'))
+
+def test_create_provider_unknown():
+    """Testa que um provedor desconhecido é rejeitado."""
+    with pytest.raises(ValueError):
+        create_provider({'AI_PROVIDER': 'inexistente'})
+
+@patch('app.routes.socketio.emit')
+def test_generate_content_with_stub_provider(mock_emit, test_client, auth_headers, test_app):
+    """Testa o fluxo completo de /api/generate usando o provedor stub configurado."""
+    response = test_client.post('/api/generate', json={'prompt': 'Teste de carga'}, headers=auth_headers)
+
+    assert response.status_code == 200
+    complete = [c for c in mock_emit.call_args_list if c.args[0] == 'generated_content_complete']
+    assert len(complete[0].args[1]['full_content']) == test_app.config['STUB_RESPONSE_LENGTH']
+
+def test_chunk_coalescer_flushes_by_size_and_time():
+    """Testa os limites de tamanho e de tempo do agrupamento de trechos."""
+    frames = []
+    coalescer = ChunkCoalescer(frames.append, flush_chars=5, flush_interval=60)
+    for text in ['a', 'b', 'c', 'd', 'e', 'f', 'g']:
+        coalescer.add(text)
+    stats = coalescer.close()
+
+    assert frames == ['a', 'bcdef', 'g']
+    assert stats == {'chunks_received': 7, 'frames_sent': 3, 'chars': 7}
+
+    frames = []
+    coalescer = ChunkCoalescer(frames.append, flush_chars=1000, flush_interval=0)
+    for text in ['x', 'y', 'z']:
+        coalescer.add(text)
+    coalescer.close()
+    assert frames == ['x', 'y', 'z']
+
+def test_chunk_coalescer_flushes_on_deadline_when_upstream_stalls():
+    """Testa que o texto em buffer é enviado em até flush_interval, mesmo sem novos trechos."""
+    frames = []
+    started = time.monotonic()
+    coalescer = ChunkCoalescer(lambda frame: frames.append((time.monotonic() - started, frame)),
+                               flush_chars=1000, flush_interval=0.05)
+    coalescer.add('a' * 10)
+    coalescer.add('b' * 10)
+    time.sleep(0.5)  # o modelo pausa entre trechos
+    coalescer.add('c' * 10)
+    coalescer.close()
+
+    assert [frame for _, frame in frames] == ['a' * 10, 'b' * 10, 'c' * 10]
+    assert frames[1][0] < 0.3
+
+def _parse_sse(body):
+    """Converte o corpo text/event-stream em uma lista de (evento, payload)."""
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+def test_generate_content_sse(test_client, auth_headers, test_app):
+    """Testa o streaming via Server-Sent Events e o registro no histórico."""
+    model = _fake_model(['Olá', ' via ', 'SSE'])
+    with patch('app.services.generation_service.get_generative_model', return_value=model):
+        response = test_client.post('/api/generate/stream', json={'prompt': 'Prompt SSE'}, headers=auth_headers)
+        body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = _parse_sse(body)
+    assert [e for e, _ in events] == ['chunk', 'chunk', 'chunk', 'complete']
+    assert "".join(p['chunk'] for e, p in events if e == 'chunk') == 'Olá via SSE'
+
+    with test_app.app_context():
+        entry = db.session.get(GenerationHistory, events[-1][1]['history_id'])
+        assert entry.generated_content == 'Olá via SSE'
+
+def test_generate_content_sse_error(test_client, auth_headers, test_app):
+    """Testa que falhas do modelo viram um evento 'error' no stream."""
+    model = MagicMock()
+    model.stream.side_effect = RuntimeError('falha no upstream')
+    with patch('app.services.generation_service.get_generative_model', return_value=model):
+        response = test_client.post('/api/generate/stream', json={'prompt': 'Prompt SSE'}, headers=auth_headers)
+        events = _parse_sse(response.get_data(as_text=True))
+
+    assert events[-1][0] == 'error'
+    assert 'falha no upstream' in events[-1][1]['details']
+    with test_app.app_context():
+        assert GenerationHistory.query.count() == 0
+
+def test_model_refresh_swaps_only_after_success(test_app):
+    """Testa que a renovação mantém o cliente antigo se o novo falhar."""
+    from app.services import ai_service
+
+    old_provider = MagicMock()
+    with patch.object(ai_service, 'generative_model_cache', old_provider):
+        with patch.object(ai_service, 'create_provider', side_effect=RuntimeError('sem rede')):
+            assert ai_service.refresh_generative_model() is False
+            assert ai_service.generative_model_cache is old_provider
+
+        new_provider = MagicMock()
+        with patch.object(ai_service, 'create_provider', return_value=new_provider):
+            assert ai_service.refresh_generative_model() is True
+            assert ai_service.generative_model_cache is new_provider
+            # O novo cliente é conectado antes da troca
+            new_provider.warm_up.assert_called_once()
+
+def test_gemini_providers_configure_once_and_own_their_client():
+    """Testa que genai.configure roda uma vez por processo e cada provedor conecta o próprio cliente."""
+    from app.services import ai_providers
+    config = {'GOOGLE_API_KEY': 'chave', 'AI_MODEL_NAME': 'gemini-pro'}
+    with patch.object(ai_providers, '_configured_api_key', None), \
+            patch.object(ai_providers.genai, 'configure') as configure, \
+            patch.object(ai_providers.genai_client._client_manager, 'make_client', side_effect=lambda name: MagicMock()):
+        first = ai_providers.GeminiProvider(config)
+        second = ai_providers.GeminiProvider(config)
+        configure.assert_called_once_with(api_key='chave')
+        assert first.model._client is not second.model._client
+
+        second.warm_up()
+        second.model._client.count_tokens.assert_called_once()
+
+def test_model_lifecycle_is_skipped_for_cli_commands(test_app):
+    """Testa que comandos da CLI (ex.: `flask db upgrade`) não aquecem o modelo nem iniciam threads."""
+    import click
+    from app.services import ai_service
+    test_app.config.update(MODEL_WARMUP_ENABLED=True, MODEL_LIFECYCLE_ENABLED=True)
+    try:
+        with click.Context(click.Command('upgrade')), \
+                patch.object(ai_service, 'get_generative_model') as get_model, \
+                patch.object(ai_service.threading, 'Thread') as thread:
+            ai_service.init_model_lifecycle(test_app)
+        get_model.assert_not_called()
+        thread.assert_not_called()
+    finally:
+        test_app.config.update(MODEL_WARMUP_ENABLED=False, MODEL_LIFECYCLE_ENABLED=False)
+
+def test_model_health_check_failure_is_counted(test_app):
+    """Testa que falhas de health check são contabilizadas."""
+    from app.services import ai_service
+
+    provider = MagicMock()
+    provider.health_check.side_effect = RuntimeError('timeout')
+    failures_before = ai_service.get_model_client_stats()['health_check_failures']
+    with patch.object(ai_service, 'generative_model_cache', provider):
+        assert ai_service.check_generative_model_health() is False
+    assert ai_service.get_model_client_stats()['health_check_failures'] == failures_before + 1
+
+@patch('app.routes.socketio.emit')
+def test_generate_rate_limited_returns_429(mock_emit, test_client, auth_headers, test_app):
+    """Testa que rajadas acima do limite recebem 429 com Retry-After."""
+    original_limits = test_app.config['RATE_LIMITS']
+    test_app.config['RATE_LIMITS'] = {
+        'user': {'rate': 0.01, 'burst': 2, 'max_concurrent': 2},
+        'admin': original_limits['admin'],
+    }
+    try:
+        statuses = [
+            test_client.post('/api/generate', json={'prompt': f'Prompt {i}'}, headers=auth_headers).status_code
+            for i in range(3)
+        ]
+        limited = test_client.post('/api/generate', json={'prompt': 'Mais um'}, headers=auth_headers)
+    finally:
+        test_app.config['RATE_LIMITS'] = original_limits
+
+    assert statuses == [200, 200, 429]
+    assert limited.status_code == 429
+    assert int(limited.headers['Retry-After']) >= 1
+
+def test_memory_backend_concurrency_cap():
+    """Testa o limite de streams simultâneos e a liberação das vagas."""
+    backend = MemoryRateLimitBackend()
+    first = backend.acquire('generate:1', 2, 60)
+    second = backend.acquire('generate:1', 2, 60)
+    assert first and second
+    assert backend.acquire('generate:1', 2, 60) is None
+    # Outros usuários não são afetados
+    assert backend.acquire('generate:2', 2, 60) is not None
+
+    backend.release('generate:1', first)
+    assert backend.acquire('generate:1', 2, 60) is not None
+
+def test_sqlite_backend_is_shared_between_workers(tmp_path):
+    """Testa que o backend SQLite aplica os limites entre processos/instâncias."""
+    path = str(tmp_path / 'limits.db')
+    worker_a = SQLiteRateLimitBackend(path)
+    worker_b = SQLiteRateLimitBackend(path)
+
+    assert worker_a.consume('generate:1', 0.01, 1) == 0
+    assert worker_b.consume('generate:1', 0.01, 1) > 0
+
+    lease = worker_a.acquire('generate:1', 1, 60)
+    assert lease is not None
+    assert worker_b.acquire('generate:1', 1, 60) is None
+    worker_a.release('generate:1', lease)
+    assert worker_b.acquire('generate:1', 1, 60) is not None
+
+def test_generate_batch(test_client, auth_headers, test_app):
+    """Testa o lote: progresso por item, falhas isoladas e inserção única no histórico."""
+    def stream(prompt):
+        if prompt == 'falha':
+            raise RuntimeError('erro no item')
+        return iter([f'resposta para {prompt}'])
+
+    model = MagicMock()
+    model.stream.side_effect = stream
+    prompts = ['um', 'falha', 'dois', 'três']
+    with patch('app.services.generation_service.get_generative_model', return_value=model):
+        response = test_client.post('/api/generate/batch', json={'prompts': prompts}, headers=auth_headers)
+        events = _parse_sse(response.get_data(as_text=True))
+
+    items = {p['index']: p for e, p in events if e == 'item'}
+    assert len(items) == 4
+    assert items[1]['status'] == 'failed'
+    assert items[2]['content'] == 'resposta para dois'
+
+    event, summary = events[-1]
+    assert event == 'complete'
+    assert summary['completed'] == 3 and summary['failed'] == 1
+    assert summary['history_ids'][1] is None
+
+    with test_app.app_context():
+        entries = GenerationHistory.query.order_by(GenerationHistory.id).all()
+        assert [e.prompt for e in entries] == ['um', 'dois', 'três']
+
+def test_generate_batch_validation(test_client, auth_headers, test_app):
+    """Testa a validação do lote (lista vazia e limite de prompts)."""
+    response = test_client.post('/api/generate/batch', json={'prompts': []}, headers=auth_headers)
+    assert response.status_code == 400
+
+    too_many = ['p'] * (test_app.config['BATCH_MAX_PROMPTS'] + 1)
+    response = test_client.post('/api/generate/batch', json={'prompts': too_many}, headers=auth_headers)
+    assert response.status_code == 400
+
+def test_generate_batch_charges_one_token_per_prompt(test_client, auth_headers, test_app):
+    """Testa que o lote consome um token por prompt e limita o paralelismo às vagas livres do usuário."""
+    from app.services import generation_service
+    original_limits = test_app.config['RATE_LIMITS']
+    test_app.config['RATE_LIMITS'] = {
+        'user': {'rate': 0.01, 'burst': 3, 'max_concurrent': 2},
+        'admin': original_limits['admin'],
+    }
+    try:
+        over_budget = test_client.post('/api/generate/batch', json={'prompts': ['a', 'b', 'c', 'd']}, headers=auth_headers)
+        assert over_budget.status_code == 429
+
+        with patch('app.routes.generate_batch', wraps=generation_service.generate_batch) as batch:
+            response = test_client.post('/api/generate/batch', json={'prompts': ['a', 'b', 'c']}, headers=auth_headers)
+            assert response.status_code == 200
+            response.get_data()
+        # BATCH_MAX_CONCURRENCY é 4, mas o usuário só tem 2 vagas
+        assert batch.call_args.args[1] == 2
+
+        # Os 3 tokens da rajada foram consumidos pelo lote anterior
+        exhausted = test_client.post('/api/generate/batch', json={'prompts': ['e']}, headers=auth_headers)
+        assert exhausted.status_code == 429
+        assert int(exhausted.headers['Retry-After']) >= 1
+    finally:
+        test_app.config['RATE_LIMITS'] = original_limits
+
+def test_metrics_endpoint_exposes_generation_metrics(test_client, auth_headers):
+    """Testa que /metrics expõe os histogramas e contadores da geração."""
+    model = _fake_model(['métrica ', 'de teste'])
+    with patch('app.services.generation_service.get_generative_model', return_value=model):
+        test_client.post('/api/generate/stream', json={'prompt': 'Prompt métricas'}, headers=auth_headers).get_data()
+
+    response = test_client.get('/metrics')
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'generation_time_to_first_chunk_seconds_bucket{le="0.05",source="model"}' in body
+    assert 'generation_history_commit_seconds_count{endpoint="stream"}' in body
+    assert 'generation_chars_total{source="model"}' in body
+    assert 'rate_limit_decisions_total{result="allowed"}' in body
+    assert 'generation_singleflight_requests_total{role="leader"}' in body
+
+def test_response_cache_byte_budget(tmp_path, test_app):
+    """Testa que as duas camadas respeitam o orçamento em bytes, expulsando as entradas menos usadas."""
+    cache = ResponseCache(disk_path=str(tmp_path / 'cache.db'), memory_max_bytes=250, disk_max_bytes=250)
+    for prompt in ('a', 'b', 'c'):
+        cache.set(prompt, 'm', 'x' * 100)
+
+    assert cache.memory.total_bytes == 200
+    assert cache.disk.totals() == {'entries': 2, 'bytes': 200}
+    assert cache.disk.get(make_cache_key('a', 'm')) is None
+    assert cache.get('c', 'm') == 'x' * 100
+
+    # Sobrescrever uma chave não duplica o tamanho contabilizado
+    cache.set('c', 'm', 'y' * 50)
+    assert cache.disk.totals() == {'entries': 2, 'bytes': 150}
+    # Valores maiores que o orçamento inteiro não são armazenados
+    cache.set('enorme', 'm', 'z' * 1000)
+    assert cache.get('enorme', 'm') is None
+    assert cache.get('b', 'm') == 'x' * 100
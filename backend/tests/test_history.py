@@ -0,0 +1,188 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from datetime import datetime, timedelta
+from app.config import TestingConfig
+from app import create_app, db
+from app.models import User, GenerationHistory, GenerationHistoryArchive
+from app.services.history_service import compress_pending_history, archive_expired_history
+
+@pytest.fixture(scope='module')
+def test_app():
+    app = create_app(config_class=TestingConfig)
+    with app.app_context():
+        yield app
+
+@pytest.fixture(scope='module')
+def test_client(test_app):
+    return test_app.test_client()
+
+@pytest.fixture(scope='function')
+def init_database(test_app):
+    with test_app.app_context():
+        db.create_all()
+        yield db
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture(scope='function')
+def auth_headers(test_client, init_database):
+    """Cria um usuário, faz login e retorna os headers de autorização."""
+    test_client.post('/api/register', json={
+        'username': 'historyuser',
+        'email': 'history@example.com',
+        'password': 'password123'
+    })
+    response = test_client.post('/api/login', json={
+        'email': 'history@example.com',
+        'password': 'password123'
+    })
+    return {'Authorization': f'Bearer {response.json["access_token"]}'}
+
+def _create_history(test_app, count, same_timestamp_pairs=False):
+    """Cria `count` entradas de histórico para o usuário de teste."""
+    with test_app.app_context():
+        user = User.query.filter_by(email='history@example.com').first()
+        base = datetime(2024, 1, 1)
+        for i in range(count):
+            # Pares com o mesmo timestamp exercitam o desempate por id
+            offset = i // 2 if same_timestamp_pairs else i
+            db.session.add(GenerationHistory(
+                user_id=user.id,
+                prompt=f'prompt {i}',
+                generated_content=f'conteúdo {i}',
+                timestamp=base + timedelta(minutes=offset)
+            ))
+        db.session.commit()
+
+def test_history_keyset_pagination(test_client, auth_headers, test_app):
+    """Testa que as páginas cobrem todo o histórico, sem repetições, em ordem decrescente."""
+    _create_history(test_app, 7, same_timestamp_pairs=True)
+
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        url = '/api/history?limit=3' + (f'&cursor={cursor}' if cursor else '')
+        response = test_client.get(url, headers=auth_headers)
+        assert response.status_code == 200
+        seen.extend(item['prompt'] for item in response.json['items'])
+        pages += 1
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert seen == [f'prompt {i}' for i in reversed(range(7))]
+
+def test_history_default_page_size(test_client, auth_headers, test_app):
+    """Testa o tamanho de página padrão e o limite máximo."""
+    _create_history(test_app, test_app.config['HISTORY_PAGE_SIZE'] + 1)
+
+    response = test_client.get('/api/history', headers=auth_headers)
+    assert len(response.json['items']) == test_app.config['HISTORY_PAGE_SIZE']
+    assert response.json['next_cursor'] is not None
+
+    response = test_client.get('/api/history?limit=100000', headers=auth_headers)
+    assert len(response.json['items']) == test_app.config['HISTORY_PAGE_SIZE'] + 1
+    assert response.json['next_cursor'] is None
+
+def test_history_invalid_cursor(test_client, auth_headers):
+    """Testa que um cursor malformado retorna 400."""
+    response = test_client.get('/api/history?cursor=nao-e-um-cursor', headers=auth_headers)
+    assert response.status_code == 400
+
+def test_history_list_returns_preview_and_detail_returns_full_text(test_client, auth_headers, test_app):
+    """Testa a prévia na listagem e o texto completo em /api/history/<id>."""
+    long_text = 'y' * (test_app.config['PREVIEW_LENGTH'] * 2)
+    with test_app.app_context():
+        user = User.query.filter_by(email='history@example.com').first()
+        entry = GenerationHistory(user_id=user.id, prompt='longo', generated_content=long_text)
+        db.session.add(entry)
+        db.session.commit()
+        entry_id = entry.id
+
+    item = test_client.get('/api/history', headers=auth_headers).json['items'][0]
+    assert 'generated_content' not in item
+    assert item['preview'] == long_text[:test_app.config['PREVIEW_LENGTH']]
+
+    detail = test_client.get(f'/api/history/{entry_id}', headers=auth_headers)
+    assert detail.status_code == 200
+    assert detail.json['generated_content'] == long_text
+
+def test_history_detail_is_isolated(test_client, auth_headers, test_app):
+    """Testa que um usuário não acessa entradas de histórico de outro."""
+    with test_app.app_context():
+        other = User(username='outro', email='outro@example.com')
+        other.set_password('password123')
+        db.session.add(other)
+        db.session.flush()
+        entry = GenerationHistory(user_id=other.id, prompt='p', generated_content='c')
+        db.session.add(entry)
+        db.session.commit()
+        entry_id = entry.id
+
+    response = test_client.get(f'/api/history/{entry_id}', headers=auth_headers)
+    assert response.status_code == 404
+
+def test_long_history_text_is_stored_compressed(test_client, auth_headers, test_app):
+    """Testa que textos longos são gravados comprimidos e lidos de forma transparente."""
+    long_text = 'palavra única ' * test_app.config['HISTORY_COMPRESSION_MIN_SIZE']
+    with test_app.app_context():
+        user = User.query.filter_by(email='history@example.com').first()
+        entry = GenerationHistory(user_id=user.id, prompt='grande', generated_content=long_text)
+        db.session.add(entry)
+        db.session.commit()
+        entry_id = entry.id
+        raw, compressed = db.session.execute(db.text(
+            'SELECT generated_content, generated_content_z FROM generation_history WHERE id = :id'
+        ), {'id': entry_id}).one()
+        assert raw is None
+        assert len(compressed) < len(long_text)
+
+    assert test_client.get(f'/api/history/{entry_id}', headers=auth_headers).json['generated_content'] == long_text
+    item = test_client.get('/api/history', headers=auth_headers).json['items'][0]
+    assert item['preview'] == long_text[:test_app.config['PREVIEW_LENGTH']]
+    # O índice de busca enxerga o texto original
+    results = test_client.get('/api/search?q=unica', headers=auth_headers).json['items']
+    assert [r['id'] for r in results] == [entry_id]
+
+def test_compress_pending_history_backfills_plain_rows(test_client, auth_headers, test_app):
+    """Testa a compressão em lote de entradas gravadas em texto puro."""
+    long_text = 'z' * test_app.config['HISTORY_COMPRESSION_MIN_SIZE']
+    with test_app.app_context():
+        user = User.query.filter_by(email='history@example.com').first()
+        db.session.execute(db.text(
+            "INSERT INTO generation_history (user_id, prompt, generated_content, timestamp)"
+            " VALUES (:user_id, 'antigo', :text, :ts)"
+        ), {'user_id': user.id, 'text': long_text, 'ts': datetime(2024, 1, 1)})
+        db.session.commit()
+
+        assert compress_pending_history() == 1
+        assert compress_pending_history() == 0
+        entry = GenerationHistory.query.options(db.undefer_group('content')).one()
+        assert entry.generated_content_raw is None
+        assert entry.generated_content == long_text
+
+def test_archive_expired_history(test_client, auth_headers, test_app):
+    """Testa que entradas expiradas saem da tabela principal e seguem acessíveis pelo detalhe."""
+    with test_app.app_context():
+        user = User.query.filter_by(email='history@example.com').first()
+        old = GenerationHistory(user_id=user.id, prompt='velho', generated_content='conteúdo velho',
+                                timestamp=datetime.utcnow() - timedelta(days=400))
+        recent = GenerationHistory(user_id=user.id, prompt='novo', generated_content='conteúdo novo')
+        db.session.add_all([old, recent])
+        db.session.commit()
+        old_id = old.id
+
+        assert archive_expired_history(retention_days=30) == 1
+        assert archive_expired_history(retention_days=30) == 0
+        assert db.session.get(GenerationHistoryArchive, old_id).generated_content == 'conteúdo velho'
+
+    items = test_client.get('/api/history', headers=auth_headers).json['items']
+    assert [item['prompt'] for item in items] == ['novo']
+    detail = test_client.get(f'/api/history/{old_id}', headers=auth_headers)
+    assert detail.status_code == 200
+    assert detail.json['generated_content'] == 'conteúdo velho'
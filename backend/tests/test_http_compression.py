@@ -0,0 +1,89 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import gzip
+import pytest
+from app.config import TestingConfig
+from app import create_app, db
+from app.models import User, GenerationHistory
+from app.http_compression import precompress_directory
+
+@pytest.fixture(scope='module')
+def test_app():
+    app = create_app(config_class=TestingConfig)
+    with app.app_context():
+        yield app
+
+@pytest.fixture(scope='module')
+def test_client(test_app):
+    return test_app.test_client()
+
+@pytest.fixture(scope='function')
+def init_database(test_app):
+    with test_app.app_context():
+        db.create_all()
+        yield db
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture(scope='function')
+def auth_headers(test_client, init_database):
+    """Cria um usuário, faz login e retorna os headers de autorização."""
+    test_client.post('/api/register', json={
+        'username': 'gzipuser',
+        'email': 'gzip@example.com',
+        'password': 'password123'
+    })
+    response = test_client.post('/api/login', json={'email': 'gzip@example.com', 'password': 'password123'})
+    return {'Authorization': f'Bearer {response.json["access_token"]}'}
+
+def _create_history(test_app, count):
+    with test_app.app_context():
+        user = User.query.filter_by(email='gzip@example.com').first()
+        for i in range(count):
+            db.session.add(GenerationHistory(user_id=user.id, prompt=f'prompt {i}', generated_content='texto ' * 50))
+        db.session.commit()
+
+def test_large_json_is_gzipped(test_client, auth_headers, test_app):
+    """Testa que respostas JSON grandes são comprimidas quando o cliente aceita gzip."""
+    _create_history(test_app, 20)
+    plain = test_client.get('/api/history', headers=auth_headers)
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    response = test_client.get('/api/history', headers={**auth_headers, 'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    # A listagem é um array JSON em streaming: comprimida incrementalmente, sem Content-Length
+    assert 'Content-Length' not in response.headers
+    assert len(response.data) < len(plain.data)
+    assert gzip.decompress(response.data) == plain.data
+
+def test_small_json_is_not_compressed(test_client, auth_headers):
+    """Testa que respostas abaixo de COMPRESSION_MIN_SIZE seguem sem compressão."""
+    response = test_client.get('/api/profile', headers={**auth_headers, 'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+
+def test_compressed_response_keeps_conditional_get(test_client, auth_headers, test_app):
+    """Testa que a ETag vira fraca ao comprimir e continua validando o 304."""
+    for i in range(40):
+        test_client.post('/api/collections', json={'name': f'coleção número {i}'}, headers=auth_headers)
+    headers = {**auth_headers, 'Accept-Encoding': 'gzip'}
+    response = test_client.get('/api/collections', headers=headers)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'].startswith('W/')
+
+    cached = test_client.get('/api/collections', headers={**headers, 'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+
+def test_precompress_directory_writes_siblings_for_text_files(tmp_path):
+    """Testa a pré-compressão do build: apenas arquivos textuais e atualizados só quando mudam."""
+    (tmp_path / 'app.js').write_text('console.log("olá");\n' * 200)
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG' + b'\0' * 4096)
+    assert precompress_directory(str(tmp_path)) >= 1
+    assert gzip.decompress((tmp_path / 'app.js.gz').read_bytes()) == (tmp_path / 'app.js').read_bytes()
+    assert not (tmp_path / 'logo.png.gz').exists()
+    # Irmãos já atualizados não são reescritos
+    assert precompress_directory(str(tmp_path)) == 0
@@ -0,0 +1,55 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import pytest
+from datetime import datetime
+from app.config import TestingConfig
+from app import create_app
+from app.json_provider import streamed_json, STREAM_CHUNK_SIZE
+
+@pytest.fixture(scope='module')
+def test_app():
+    app = create_app(config_class=TestingConfig)
+    with app.app_context():
+        yield app
+
+def _body(response):
+    return b''.join(response.response)
+
+def test_provider_serializes_datetimes_as_iso_8601(test_app):
+    """Testa datas em ISO 8601 (sem .isoformat() nas rotas) e texto UTF-8 sem escapes."""
+    when = datetime(2024, 1, 5, 0, 3, 0, 123456)
+    with test_app.test_request_context():
+        response = test_app.json.response({'quando': when, 'título': 'coleção'})
+    assert json.loads(response.get_data()) == {'quando': when.isoformat(), 'título': 'coleção'}
+    assert 'coleção'.encode('utf-8') in response.get_data()
+
+def test_invalid_json_body_is_rejected(test_app):
+    """Testa que um corpo JSON malformado continua resultando em 400."""
+    response = test_app.test_client().post('/api/login', data='{"email": ', content_type='application/json')
+    assert response.status_code == 400
+
+def test_streamed_json_array_and_envelope(test_app):
+    """Testa os formatos do stream: array no topo e objeto com campos antes e depois dos itens."""
+    rows = [{'id': i, 'em': datetime(2024, 1, 1)} for i in range(3)]
+    with test_app.test_request_context():
+        assert json.loads(_body(streamed_json(iter(rows)))) == [{'id': i, 'em': '2024-01-01T00:00:00'} for i in range(3)]
+
+        page = {}
+        response = streamed_json(iter(rows), lambda r: {'id': r['id']}, key='items',
+                                 head={'page': 1}, tail=lambda: page)
+        page['next_cursor'] = 'abc'  # preenchido durante o stream
+        assert json.loads(_body(response)) == {'page': 1, 'items': [{'id': 0}, {'id': 1}, {'id': 2}], 'next_cursor': 'abc'}
+
+        assert json.loads(_body(streamed_json(iter([]), key='items'))) == {'items': []}
+
+def test_streamed_json_writes_in_chunks(test_app):
+    """Testa que listas grandes saem em vários trechos, sem montar o corpo inteiro."""
+    rows = ({'id': i, 'texto': 'x' * 100} for i in range(2000))
+    with test_app.test_request_context():
+        chunks = list(streamed_json(rows, key='items').response)
+    assert len(chunks) > 1
+    assert max(len(chunk) for chunk in chunks) < STREAM_CHUNK_SIZE + 200
+    assert len(json.loads(b''.join(chunks))['items']) == 2000
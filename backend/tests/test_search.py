@@ -0,0 +1,135 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from app.config import TestingConfig
+from app import create_app, db
+from app.models import User, Collection, Content, GenerationHistory
+
+@pytest.fixture(scope='module')
+def test_app():
+    app = create_app(config_class=TestingConfig)
+    with app.app_context():
+        yield app
+
+@pytest.fixture(scope='module')
+def test_client(test_app):
+    return test_app.test_client()
+
+@pytest.fixture(scope='function')
+def init_database(test_app):
+    with test_app.app_context():
+        db.create_all()
+        yield db
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture(scope='function')
+def auth_headers(test_client, init_database):
+    """Cria um usuário, faz login e retorna os headers de autorização."""
+    test_client.post('/api/register', json={
+        'username': 'searchuser',
+        'email': 'search@example.com',
+        'password': 'password123'
+    })
+    response = test_client.post('/api/login', json={
+        'email': 'search@example.com',
+        'password': 'password123'
+    })
+    return {'Authorization': f'Bearer {response.json["access_token"]}'}
+
+def _seed(test_app, email='search@example.com'):
+    """Cria histórico e conteúdos de exemplo para o usuário informado."""
+    with test_app.app_context():
+        user = User.query.filter_by(email=email).first()
+        db.session.add_all([
+            GenerationHistory(user_id=user.id, prompt='Poema sobre o mar',
+                              generated_content='As ondas do oceano quebram na praia.'),
+            GenerationHistory(user_id=user.id, prompt='Receita de bolo',
+                              generated_content='Misture farinha, ovos e açúcar.'),
+        ])
+        collection = Collection(name='Notas', user_id=user.id)
+        db.session.add(collection)
+        db.session.flush()
+        content = Content(title='Viagem ao litoral', body='Dias de sol e mar na praia.',
+                          collection_id=collection.id)
+        db.session.add(content)
+        db.session.commit()
+        return content.id
+
+def test_search_history_and_content(test_client, auth_headers, test_app):
+    """Testa que a busca encontra termos no histórico e nos conteúdos, com trecho destacado."""
+    _seed(test_app)
+
+    response = test_client.get('/api/search?q=praia', headers=auth_headers)
+    assert response.status_code == 200
+    items = response.json['items']
+    assert {item['type'] for item in items} == {'history', 'content'}
+    assert all('<mark>' in item['snippet'] for item in items)
+
+    response = test_client.get('/api/search?q=praia&type=content', headers=auth_headers)
+    assert [item['title'] for item in response.json['items']] == ['Viagem ao litoral']
+
+def test_search_ignores_accents_and_matches_prefixes(test_client, auth_headers, test_app):
+    """Testa a normalização de acentos e a busca por prefixo."""
+    _seed(test_app)
+
+    response = test_client.get('/api/search?q=acucar&type=history', headers=auth_headers)
+    assert [item['title'] for item in response.json['items']] == ['Receita de bolo']
+
+    response = test_client.get('/api/search?q=ocea', headers=auth_headers)
+    assert [item['title'] for item in response.json['items']] == ['Poema sobre o mar']
+
+def test_search_index_follows_updates_and_deletes(test_client, auth_headers, test_app):
+    """Testa que o índice acompanha edições e remoções de conteúdos."""
+    content_id = _seed(test_app)
+    with test_app.app_context():
+        content = db.session.get(Content, content_id)
+        content.body = 'Montanhas cobertas de neve.'
+        db.session.commit()
+
+    response = test_client.get('/api/search?q=neve', headers=auth_headers)
+    assert [item['id'] for item in response.json['items']] == [content_id]
+    response = test_client.get('/api/search?q=sol&type=content', headers=auth_headers)
+    assert response.json['items'] == []
+
+    with test_app.app_context():
+        db.session.delete(db.session.get(Content, content_id))
+        db.session.commit()
+    response = test_client.get('/api/search?q=neve', headers=auth_headers)
+    assert response.json['items'] == []
+
+def test_search_is_isolated_and_paginated(test_client, auth_headers, test_app):
+    """Testa o isolamento entre usuários e a paginação dos resultados."""
+    with test_app.app_context():
+        other = User(username='outro', email='outro@example.com')
+        other.set_password('password123')
+        db.session.add(other)
+        db.session.commit()
+    _seed(test_app, email='outro@example.com')
+
+    response = test_client.get('/api/search?q=praia', headers=auth_headers)
+    assert response.json['items'] == []
+
+    with test_app.app_context():
+        user = User.query.filter_by(email='search@example.com').first()
+        db.session.add_all([
+            GenerationHistory(user_id=user.id, prompt=f'item {i}', generated_content='texto repetido')
+            for i in range(5)
+        ])
+        db.session.commit()
+
+    first = test_client.get('/api/search?q=repetido&limit=3', headers=auth_headers).json
+    second = test_client.get('/api/search?q=repetido&limit=3&page=2', headers=auth_headers).json
+    assert len(first['items']) == 3 and first['next_page'] == 2
+    assert len(second['items']) == 2 and second['next_page'] is None
+    assert {i['id'] for i in first['items']}.isdisjoint(i['id'] for i in second['items'])
+
+def test_search_validation(test_client, auth_headers):
+    """Testa os erros de validação da busca."""
+    assert test_client.get('/api/search', headers=auth_headers).status_code == 400
+    assert test_client.get('/api/search?q=x&type=foo', headers=auth_headers).status_code == 400
+    response = test_client.get('/api/search?q=%22%29%2A', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['items'] == []
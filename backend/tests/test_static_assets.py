@@ -0,0 +1,89 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import gzip
+import pytest
+from unittest.mock import patch
+from app.config import TestingConfig
+from app import create_app
+from app.static_assets import serve_frontend, reset_static_manifest, IMMUTABLE_CACHE_CONTROL
+
+INDEX_HTML = '<!doctype html><html><body><div id="root"></div></body></html>'
+
+@pytest.fixture(scope='function')
+def build_dir(tmp_path):
+    """Simula o build do React com um arquivo com hash, um sem hash e o index.html."""
+    (tmp_path / 'static' / 'js').mkdir(parents=True)
+    (tmp_path / 'static' / 'js' / 'main.3f2a9c1b.js').write_text('console.log("app");\n' * 100)
+    (tmp_path / 'static' / 'js' / 'main.3f2a9c1b.js.gz').write_bytes(
+        gzip.compress((tmp_path / 'static' / 'js' / 'main.3f2a9c1b.js').read_bytes())
+    )
+    (tmp_path / 'manifest.json').write_text('{"name": "HelpubliAI"}')
+    (tmp_path / 'index.html').write_text(INDEX_HTML)
+    return tmp_path
+
+@pytest.fixture(scope='function')
+def test_app(build_dir):
+    class BuildConfig(TestingConfig):
+        FRONTEND_BUILD_DIR = str(build_dir)
+    app = create_app(config_class=BuildConfig)
+    app.add_url_rule('/', 'serve', serve_frontend, defaults={'path': ''})
+    app.add_url_rule('/<path:path>', 'serve', serve_frontend)
+    yield app
+    reset_static_manifest()
+
+@pytest.fixture(scope='function')
+def test_client(test_app):
+    return test_app.test_client()
+
+def test_hashed_asset_is_immutable_with_strong_etag(test_client):
+    """Testa cache imutável e ETag forte para arquivos com hash no nome."""
+    response = test_client.get('/static/js/main.3f2a9c1b.js')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+    etag, weak = response.get_etag()
+    assert etag and not weak
+    assert response.data == b'console.log("app");\n' * 100
+
+    cached = test_client.get('/static/js/main.3f2a9c1b.js', headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+def test_precompressed_variant_is_negotiated(test_client):
+    """Testa que o irmão .gz é servido quando o cliente aceita gzip, com ETag própria."""
+    plain = test_client.get('/static/js/main.3f2a9c1b.js')
+    response = test_client.get('/static/js/main.3f2a9c1b.js', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.headers['ETag'] != plain.headers['ETag']
+    assert gzip.decompress(response.data) == plain.data
+
+def test_unhashed_files_and_spa_routes_revalidate(test_client):
+    """Testa que index.html (inclusive para rotas do SPA) e arquivos sem hash são revalidados."""
+    manifest = test_client.get('/manifest.json')
+    assert manifest.headers['Cache-Control'] == 'public, no-cache'
+
+    index = test_client.get('/admin/usuarios')
+    assert index.status_code == 200
+    assert index.data.decode() == INDEX_HTML
+    assert index.headers['Cache-Control'] == 'public, no-cache'
+    assert test_client.get('/', headers={'If-None-Match': index.headers['ETag']}).status_code == 304
+
+def test_requests_do_not_touch_the_filesystem_metadata(test_client):
+    """Testa que o manifesto evita os.stat/os.path.exists por requisição."""
+    with patch('os.stat', side_effect=AssertionError('stat por requisição')):
+        assert test_client.get('/static/js/main.3f2a9c1b.js').status_code == 200
+        assert test_client.get('/login').status_code == 200
+        assert test_client.get('/nao/existe.js').status_code == 200
+
+def test_missing_build_returns_404(tmp_path):
+    """Testa o comportamento sem build do frontend (apenas a API)."""
+    class NoBuildConfig(TestingConfig):
+        FRONTEND_BUILD_DIR = str(tmp_path / 'inexistente')
+    app = create_app(config_class=NoBuildConfig)
+    app.add_url_rule('/<path:path>', 'serve', serve_frontend)
+    try:
+        assert app.test_client().get('/login').status_code == 404
+    finally:
+        reset_static_manifest()